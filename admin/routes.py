@@ -1,8 +1,19 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request
+from flask import (
+    Blueprint, render_template, flash, redirect, url_for, request, current_app, jsonify, abort,
+    Response, stream_with_context
+)
 from flask_login import login_required, current_user
 from utils import admin_required  
-from models import db, User, Business, Review, FlaggedReview, Interaction
-from forms import AdminDeleteBusinessForm, AdminDecisionForm, AdminAppealDecisionForm
+from models import db, User, Business, SiteStat, DailyStat, delete_businesses, delete_user_account
+from forms import AdminDeleteBusinessForm, AdminDecisionForm, AdminAppealDecisionForm, SearchBusinessForm
+from pagination import paginate
+from moderation import claim_batch, claimed_items, item_for_decision, release, release_claims
+import export
+from page_cache import page_cache
+from user_cache import user_cache
+from typeahead import typeahead
+from search_cache import search_cache
+from sql_metrics import sql_metrics
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -10,25 +21,64 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 @login_required
 @admin_required
 def dashboard():
-    user_count = User.query.count()
-    business_count = Business.query.count()
-    review_count = Review.query.count()
-
-    return render_template('admin/admin_dashboard.html', user_count=user_count,
-                           business_count=business_count, review_count=review_count)
+    stats = SiteStat.totals()
+    days, series = DailyStat.series(current_app.config['DASHBOARD_TREND_DAYS'])
+    return render_template('admin/admin_dashboard.html', stats=stats, days=days, series=series)
     
+@admin_bp.route('/page-cache')
+@login_required
+@admin_required
+def page_cache_stats():
+    return jsonify(page_cache.stats())
+
+@admin_bp.route('/user-cache')
+@login_required
+@admin_required
+def user_cache_stats():
+    return jsonify(user_cache.stats())
+
+@admin_bp.route('/search-cache')
+@login_required
+@admin_required
+def search_cache_stats():
+    return jsonify(search_cache.stats())
+
+@admin_bp.route('/sql-metrics')
+@login_required
+@admin_required
+def sql_metrics_stats():
+    return jsonify(sql_metrics.stats())
+
+@admin_bp.route('/export/<kind>.<fmt>')
+@login_required
+@admin_required
+def export_rows(kind, fmt):
+    """Stream businesses or reviews matching the search filters in the query string."""
+    if kind not in ('businesses', 'reviews') or fmt not in export.FORMATS:
+        abort(404)
+    form = SearchBusinessForm(request.args, meta={'csrf': False})
+    if request.args and not form.validate():
+        abort(400, description=f'Invalid filters: {form.errors}')
+
+    if kind == 'businesses':
+        query = export.business_query(form)
+    else:
+        query = export.review_query(form, request.args.get('business_id', type=int))
+    return Response(stream_with_context(export.generate(query, fmt)), mimetype=export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'})
+
 @admin_bp.route('/users')
 @login_required
 @admin_required
 def users():
-    users = User.query.all()
+    users = paginate(User.query, [User.id], request.args.get('cursor'), current_app.config['PAGE_SIZE'])
     return render_template('admin/admin_users.html', users=users)
 
 @admin_bp.route('/businesses')
 @login_required
 @admin_required
 def businesses():
-    businesses = Business.query.all()
+    businesses = paginate(Business.query, [Business.id], request.args.get('cursor'), current_app.config['PAGE_SIZE'])
     delete_business_form = AdminDeleteBusinessForm()
     return render_template('admin/admin_businesses.html', businesses=businesses, delete_business_form=delete_business_form)
 
@@ -36,9 +86,11 @@ def businesses():
 @login_required
 @admin_required
 def delete_business(business_id):
-    business = Business.query.get_or_404(business_id)  
-    db.session.delete(business)  
+    Business.query.get_or_404(business_id)  
+    delete_businesses([business_id])
     db.session.commit() 
+    page_cache.bump_business(business_id)
+    typeahead.remove_businesses([business_id])
     flash('Business successfully deleted.', 'success') 
     return redirect(url_for('admin.businesses')) 
 
@@ -46,27 +98,14 @@ def delete_business(business_id):
 @login_required
 @admin_required
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)  
+    User.query.get_or_404(user_id)  
 
     try:
-        Interaction.query.filter_by(user_id=user_id).delete(synchronize_session=False)
-        reviews = Review.query.filter_by(user_id=user_id).all()
-        for review in reviews:
-            FlaggedReview.query.filter_by(review_id=review.id).delete(synchronize_session=False)
-            Interaction.query.filter_by(review_id=review.id).delete(synchronize_session=False)
-            db.session.delete(review)
-
-        businesses = Business.query.filter_by(user_id=user_id).all()
-        for business in businesses:
-            business_reviews = Review.query.filter_by(business_id=business.id).all()
-            for business_review in business_reviews:
-                FlaggedReview.query.filter_by(review_id=business_review.id).delete(synchronize_session=False)
-                Interaction.query.filter_by(review_id=business_review.id).delete(synchronize_session=False)
-                db.session.delete(business_review)
-            db.session.delete(business)
-
-        db.session.delete(user)  
+        delete_user_account(user_id)
         db.session.commit()  
+        user_cache.invalidate(user_id)
+        page_cache.bump('site')
+        typeahead.invalidate()  # their businesses went with them
         flash('User successfully deleted.', 'success')  
     except Exception as e:
         db.session.rollback() 
@@ -75,11 +114,41 @@ def delete_user(user_id):
     return redirect(url_for('admin.users'))  
 
 
+QUEUE_PAGES = {'flags': 'admin.flagged_reviews', 'appeals': 'admin.appeals'}
+
+
+def moderation_queue(queue):
+    """A page of the current admin's claims; only the claim-batch POST takes new ones."""
+    return claimed_items(queue, current_user.id, request.args.get('cursor'), current_app.config['PAGE_SIZE'])
+
+@admin_bp.route('/claim-batch/<queue>', methods=['POST'])
+@login_required
+@admin_required
+def claim_queue_batch(queue):
+    if queue not in QUEUE_PAGES:
+        abort(404)
+    held = claim_batch(queue, current_user.id, current_app.config['MODERATION_BATCH_SIZE'],
+                       current_app.config['MODERATION_LEASE_SECONDS'])
+    db.session.commit()
+    flash(f'You hold {held} item(s) from the queue.', 'info')
+    return redirect(url_for(QUEUE_PAGES[queue]))
+
+@admin_bp.route('/release-claims/<queue>', methods=['POST'])
+@login_required
+@admin_required
+def release_queue_claims(queue):
+    if queue not in QUEUE_PAGES:
+        abort(404)
+    released = release_claims(queue, current_user.id)
+    db.session.commit()
+    flash(f'Released {released} item(s) back to the queue.', 'info')
+    return redirect(url_for('admin.dashboard'))
+
 @admin_bp.route('/flagged-reviews')
 @login_required
 @admin_required
 def flagged_reviews():
-    flagged_reviews = FlaggedReview.query.filter(FlaggedReview.admin_decision == "pending").all()
+    flagged_reviews = moderation_queue('flags')
     form = AdminDecisionForm()
     return render_template('admin/flagged_reviews.html', flagged_reviews=flagged_reviews, form=form)
 
@@ -88,20 +157,32 @@ def flagged_reviews():
 @login_required
 @admin_required
 def review_decision(flagged_review_id):
-    flagged_review = FlaggedReview.query.get_or_404(flagged_review_id)
+    # Showing the form only reads; the row is locked for the POST that records the decision
+    flagged_review, error = item_for_decision('flags', flagged_review_id, current_user.id,
+                                              lock=request.method == 'POST')
+    if error:
+        db.session.rollback()
+        flash(error, 'error')
+        return redirect(url_for('admin.flagged_reviews'))
     form = AdminDecisionForm()
     
     if request.method == 'POST' and form.validate_on_submit():
+        SiteStat.adjust(pending_flags=-1)
+        owner_id = flagged_review.review.business.user_id
+        User.adjust_open_cases(owner_id, -1)
+        release(flagged_review)
         flagged_review.admin_decision = request.form['decision']
         flagged_review.admin_notes = form.notes.data
 
         if request.form['decision'] == 'approve':
-            flagged_review.review.is_visible = False
+            flagged_review.review.set_visibility(False)
         elif request.form['decision'] == 'deny':
-            flagged_review.review.is_visible = True
+            flagged_review.review.set_visibility(True)
 
         try:
             db.session.commit()
+            page_cache.bump_business(flagged_review.review.business_id)
+            user_cache.invalidate(owner_id)
             flash('Decision has been saved successfully.', 'success')
             return redirect(url_for('admin.flagged_reviews'))
         except Exception as e:
@@ -115,7 +196,7 @@ def review_decision(flagged_review_id):
 @login_required
 @admin_required
 def appeals():
-    appeals = FlaggedReview.query.filter(FlaggedReview.appeal_decision == "pending").all()
+    appeals = moderation_queue('appeals')
     form = AdminAppealDecisionForm()
     return render_template('admin/appeals.html', appeals=appeals, form=form)
 
@@ -123,20 +204,31 @@ def appeals():
 @login_required
 @admin_required
 def process_appeal(flagged_review_id):
-    flagged_review = FlaggedReview.query.get_or_404(flagged_review_id)
+    flagged_review, error = item_for_decision('appeals', flagged_review_id, current_user.id,
+                                              lock=request.method == 'POST')
+    if error:
+        db.session.rollback()
+        flash(error, 'error')
+        return redirect(url_for('admin.appeals'))
     form = AdminAppealDecisionForm()
 
     if request.method == 'POST' and form.validate_on_submit():
+        SiteStat.adjust(pending_appeals=-1)
+        owner_id = flagged_review.review.business.user_id
+        User.adjust_open_cases(owner_id, -1)
+        release(flagged_review)
         flagged_review.appeal_decision = form.decision.data
         flagged_review.admin_notes = form.notes.data
 
         if form.decision.data == 'approve':
-            flagged_review.review.is_visible = False
+            flagged_review.review.set_visibility(False)
         elif form.decision.data == 'deny':
-            flagged_review.review.is_visible = True
+            flagged_review.review.set_visibility(True)
 
         try:
             db.session.commit()
+            page_cache.bump_business(flagged_review.review.business_id)
+            user_cache.invalidate(owner_id)
             flash('Appeal decision has been saved successfully.', 'success')
             return redirect(url_for('admin.appeals'))
         except Exception as e:
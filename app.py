@@ -1,7 +1,14 @@
-from flask import Flask, render_template, redirect, url_for, flash, request
-from flask_debugtoolbar import DebugToolbarExtension
+import os
+import weakref
+import click
+from flask import Flask, render_template, redirect, url_for, flash, request, current_app, jsonify
+from flask.cli import with_appcontext
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
+from flask_migrate import Migrate
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
+from werkzeug.datastructures import MultiDict
 
 from forms import (
     RegisterUserForm, LoginForm, RegisterBusinessForm, SearchBusinessForm,
@@ -9,51 +16,153 @@ from forms import (
     EditResponseForm, EditBusinessForm, LikeUnlikeForm, DeleteBusinessForm,
     DeleteUserForm, FlagReviewForm, AppealForm
 )
-from models import connect_db, db, User, Business, Review, Interaction, FlaggedReview
+from models import (
+    connect_db, dispose_engines, db, User, Business, Review, Interaction, FlaggedReview, SiteStat, DailyStat,
+    delete_businesses, delete_user_account, normalize_email
+)
 from admin.routes import admin_bp
 from business_helpers import (
-    get_business, get_reviews, get_average_rating, get_vote_counts,
-    has_user_reviewed_business, has_user_liked_business,
-    handle_response_form_submission, get_vote_forms, perform_search
+    get_business, get_reviews, get_review_page_context,
+    handle_response_form_submission, perform_search, search_args, business_hours_from_form
 )
+from pagination import paginate, paginate_partitions, page_url
+import export
+import geo
+import importer
+from page_cache import page_cache
+from hashing import password_hasher
+from user_cache import user_cache
+from sql_metrics import sql_metrics
+from replicas import replica_router
+from favorites import favorites_cache
+from typeahead import typeahead
+from search_cache import search_cache
+from geo import zip_centroid, distance_miles
+from config import Config
+
+login_manager = LoginManager()
+login_manager.login_view = 'login'
+login_manager.login_message = "Please log in to access this page."
+login_manager.login_message_category = "info"
+migrate = Migrate()
 
+# Views and CLI commands are declared at import time and attached to each app create_app builds
+_views = []
+_commands = []
+_apps = weakref.WeakSet()
+_default_app = None
 
-app = Flask(__name__)
-app.register_blueprint(admin_bp)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///validvouch'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = "Sharapova1"
-app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = False  
+def route(rule, **options):
+    def decorator(view):
+        _views.append((rule, view, options))
+        return view
+    return decorator
 
-toolbar = DebugToolbarExtension(app)
 
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-login_manager.login_message = "Please log in to access this page."
-login_manager.login_message_category = "info"
+def cli_command(name):
+    def decorator(f):
+        command = click.command(name)(with_appcontext(f))
+        _commands.append(command)
+        return command
+    return decorator
+
+
+def create_app(config=None):
+    """Build the app from Config, overridden by a config class or a mapping.
+
+    Nothing here touches the database; engines are created and connect on
+    first use, so a pre-fork server can build the app in its master process.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    if app.config['DEBUG_TOOLBAR']:
+        from flask_debugtoolbar import DebugToolbarExtension
+        DebugToolbarExtension(app)
+    app.add_template_global(page_url)
 
-with app.app_context():
     connect_db(app)
-    db.create_all()
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    page_cache.init_app(app)
+    password_hasher.init_app(app)
+    user_cache.init_app(app)
+    favorites_cache.init_app(app)
+    typeahead.init_app(app)
+    search_cache.init_app(app)
+    sql_metrics.init_app(app)
+    replica_router.init_app(app)
+    geo.init_app(app)
+
+    app.register_blueprint(admin_bp)
+    for rule, view, options in _views:
+        app.add_url_rule(rule, view_func=view, **options)
+    for command in _commands:
+        app.cli.add_command(command)
+
+    _apps.add(app)
+    return app
+
+
+def _dispose_engines_after_fork():
+    """Drop pooled connections inherited from the parent; the child opens its own."""
+    for app in list(_apps):
+        dispose_engines(app)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+
+def __getattr__(name):
+    """The default app is built on first access to ``app``, not on import."""
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _default_app is None:
+        _default_app = create_app()
+    return _default_app
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.load(int(user_id))
 
-@app.route('/', methods=['GET', 'POST'])
+@route('/', methods=['GET', 'POST'])
 def index():
     form = SearchBusinessForm(request.form)
     if request.method == 'POST' and form.validate():
-        results = perform_search(form)
-        return render_template('search_results.html', results=results, form=form)
+        return redirect(url_for('search_results', **search_args(form)))
     return render_template('index.html', form=form)
 
-@app.route('/search_results')
+@route('/search_results')
+@page_cache.cached('directory', unless=lambda: request.args.get('open_at') == 'now')
 def search_results():
-    return render_template('search_results.html')
-
-@app.route('/signup', methods=['GET', 'POST'])
+    form = SearchBusinessForm(request.args, meta={'csrf': False})
+    results, distances = None, {}
+    if request.args and form.validate():
+        results = perform_search(form, form.cursor.data, current_app.config['PAGE_SIZE'])
+        origin = zip_centroid(form.near_zip.data) if form.near_zip.data else None
+        if origin:
+            distances = {business.id: distance_miles(origin, (business.latitude, business.longitude))
+                         for business in results}
+    liked_ids = favorites_cache.ids(current_user.id) if current_user.is_authenticated else frozenset()
+    return render_template('search_results.html', results=results, form=form, liked_ids=liked_ids,
+                           distances=distances)
+
+@route('/typeahead')
+def typeahead_suggestions():
+    """JSON suggestions of business names, cities and categories starting with ?q=."""
+    query = request.args.get('q', '')
+    suggestions = typeahead.suggest(query, request.args.get('limit', type=int))
+    return jsonify(query=query, suggestions=suggestions)
+
+@route('/signup', methods=['GET', 'POST'])
 def signup():
     form = RegisterUserForm()
     if form.validate_on_submit():
@@ -79,6 +188,7 @@ def signup():
         )
         new_user.set_password(form.password.data)
         db.session.add(new_user)
+        SiteStat.adjust(users=1)
         try:
             db.session.commit()
             flash('Account created successfully!', 'success')
@@ -89,7 +199,7 @@ def signup():
             return render_template('signup.html', form=form)
     return render_template('signup.html', form=form)
 
-@app.route('/edit-profile', methods=['GET', 'POST'])
+@route('/edit-profile', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     form = EditProfileForm(obj=current_user)
@@ -99,11 +209,12 @@ def edit_profile():
             flash('Phone number already in use.', 'error')
             return render_template('edit_profile.html', form=form)
 
-        if (form.email.data != current_user.email and
-            User.query.filter_by(email=form.email.data).first()):
+        if (normalize_email(form.email.data) != current_user.email and
+            User.by_email(form.email.data)):
             flash('Email already in use.', 'error')
             return render_template('edit_profile.html', form=form)
 
+        name_changed = current_user.first_name != form.first_name.data
         current_user.first_name = form.first_name.data
         current_user.last_name = form.last_name.data
         current_user.dob = form.dob.data
@@ -118,6 +229,9 @@ def edit_profile():
             current_user.set_password(form.new_password.data)
 
         db.session.commit()
+        user_cache.invalidate(current_user.id)
+        if name_changed:
+            page_cache.bump('site')
         flash('Your profile has been updated.', 'success')
         return redirect(url_for('profile'))
     
@@ -134,13 +248,16 @@ def edit_profile():
     
     return render_template('edit_profile.html', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
+        user = User.by_email(form.email.data)
         if user and user.check_password(form.password.data):
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
             login_user(user)
             flash('You have been logged in!', 'success')
             return redirect(url_for('profile'))
@@ -148,13 +265,13 @@ def login():
             flash('Password or email incorrect, please try again', 'danger')
     return render_template('login.html', form=form)
             
-@app.route('/logout')
+@route('/logout')
 def logout():
     logout_user()
     flash('You have been logged out.', 'success')
     return redirect(url_for('index'))
         
-@app.route('/profile', methods=['GET', 'POST'])
+@route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     if not current_user.is_authenticated:
@@ -170,7 +287,7 @@ def profile():
     return render_template('profile.html', user=current_user, user_businesses=user_businesses,
                            delete_user_form=delete_user_form, delete_business_forms=delete_business_forms)
 
-@app.route('/register-business', methods=['GET', 'POST'])
+@route('/register-business', methods=['GET', 'POST'])
 @login_required
 def register_business():
     form = RegisterBusinessForm()
@@ -187,23 +304,7 @@ def register_business():
                 flash('This phone number is already associated with another user. Please use your registered phone number.', 'error')
                 return render_template('register_business.html', form=form)
 
-        def format_hours(day_open, day_close):
-            if day_open.closed.data == 'Closed' or day_close.closed.data == 'Closed':
-                return 'Closed'
-            else:
-                return f"{day_open.hour.data}:{day_open.minute.data} - {day_close.hour.data}:{day_close.minute.data}"
-
-        business_hours = {
-            'Monday': format_hours(form.monday_hours_open, form.monday_hours_close),
-            'Tuesday': format_hours(form.tuesday_hours_open, form.tuesday_hours_close),
-            'Wednesday': format_hours(form.wednesday_hours_open, form.wednesday_hours_close),
-            'Thursday': format_hours(form.thursday_hours_open, form.thursday_hours_close),
-            'Friday': format_hours(form.friday_hours_open, form.friday_hours_close),
-            'Saturday': format_hours(form.saturday_hours_open, form.saturday_hours_close),
-            'Sunday': format_hours(form.sunday_hours_open, form.sunday_hours_close)
-        }
-
-        business_hours_str = ', '.join([f"{day}: {hours}" for day, hours in business_hours.items()])
+        business_hours_str = business_hours_from_form(form)
 
         new_business = Business(
             business_name=form.business_name.data,
@@ -221,8 +322,11 @@ def register_business():
         )
         
         db.session.add(new_business)
+        SiteStat.adjust(businesses=1)
         try:
             db.session.commit()
+            page_cache.bump('directory')
+            typeahead.update_business(new_business)
             flash('Business registered successfully!', 'success')
             return redirect(url_for('business_details', business_id=new_business.id))
         except Exception as e:
@@ -232,7 +336,7 @@ def register_business():
 
     return render_template('register_business.html', form=form)
 
-@app.route('/edit-business/<int:business_id>', methods=['GET', 'POST'])
+@route('/edit-business/<int:business_id>', methods=['GET', 'POST'])
 @login_required
 def edit_business(business_id):
     business = Business.query.get_or_404(business_id)
@@ -259,25 +363,11 @@ def edit_business(business_id):
         business.business_website = form.business_website.data
         business.time_zone = form.time_zone.data
 
-        def format_hours(day_open, day_close):
-            if day_open.closed.data == 'Closed' or day_close.closed.data == 'Closed':
-                return 'Closed'
-            else:
-                return f"{day_open.hour.data}:{day_open.minute.data} - {day_close.hour.data}:{day_close.minute.data}"
-
-        business_hours = {
-            'Monday': format_hours(form.monday_hours_open, form.monday_hours_close),
-            'Tuesday': format_hours(form.tuesday_hours_open, form.tuesday_hours_close),
-            'Wednesday': format_hours(form.wednesday_hours_open, form.wednesday_hours_close),
-            'Thursday': format_hours(form.thursday_hours_open, form.thursday_hours_close),
-            'Friday': format_hours(form.friday_hours_open, form.friday_hours_close),
-            'Saturday': format_hours(form.saturday_hours_open, form.saturday_hours_close),
-            'Sunday': format_hours(form.sunday_hours_open, form.sunday_hours_close)
-        }
-
-        business.business_hours = ', '.join([f"{day}: {hours}" for day, hours in business_hours.items()])
+        business.business_hours = business_hours_from_form(form)
 
         db.session.commit()
+        page_cache.bump_business(business.id)
+        typeahead.update_business(business)
         flash('Business updated successfully!', 'success')
         return redirect(url_for('business_details', business_id=business.id))
 
@@ -295,47 +385,33 @@ def edit_business(business_id):
 
     return render_template('edit_business.html', form=form, business_id=business_id)
 
-@app.route('/business-details/<int:business_id>', methods=['GET', 'POST'])
+@route('/business-details/<int:business_id>', methods=['GET', 'POST'])
+@page_cache.cached('business:{business_id}')
 def business_details(business_id):
     business = get_business(business_id)
-    formatted_hours = Business.format_business_hours(business.business_hours)
-    leave_review_form = LeaveReviewForm()
     business_response_form = BusinessResponseForm()
-    like_unlike_form = LikeUnlikeForm()
-
-    reviews = get_reviews(business_id)
-    average_rating = get_average_rating(business_id)
-    vote_counts = get_vote_counts(reviews)
-
-    user_has_reviewed = has_user_reviewed_business(current_user.id, business_id) if current_user.is_authenticated else False
-    user_has_liked = has_user_liked_business(current_user.id, business_id) if current_user.is_authenticated else False
-
-    vote_forms = get_vote_forms(reviews)
-    
-    user_flagged_reviews = []
-    if current_user.is_authenticated:
-        user_flagged_reviews = [flag.review_id for flag in FlaggedReview.query.filter_by(user_id=current_user.id).all()]
 
     if request.method == 'POST' and business_response_form.validate_on_submit():
-        handle_response_form_submission(business, business_response_form, current_user)
+        handle_response_form_submission(business, business_response_form)
         return redirect(url_for('business_details', business_id=business_id))
 
+    formatted_hours = Business.format_business_hours(business.business_hours)
+    reviews = get_reviews(business_id, request.args.get('cursor'), current_app.config['PAGE_SIZE'])
+
     return render_template('business_details.html', business=business, formatted_hours=formatted_hours,
-                           leave_review_form=leave_review_form, like_unlike_form=like_unlike_form,
-                           average_rating=average_rating, business_response_form=business_response_form,
-                           reviews=reviews, user_has_reviewed=user_has_reviewed, user_has_liked=user_has_liked,
-                           vote_forms=vote_forms, vote_counts=vote_counts, user_flagged_reviews=user_flagged_reviews)
+                           leave_review_form=LeaveReviewForm(), like_unlike_form=LikeUnlikeForm(),
+                           business_response_form=business_response_form, reviews=reviews,
+                           **get_review_page_context(business, reviews))
 
-@app.route('/search-business', methods=['GET', 'POST'])
+@route('/search-business', methods=['GET', 'POST'])
 def search_business():
     form = SearchBusinessForm(request.form)
     if request.method == 'POST' and form.validate():
-        results = perform_search(form)
-        return render_template('search_results.html', results=results, form=form)
+        return redirect(url_for('search_results', **search_args(form)))
     
     return render_template('search_business.html', form=form)
 
-@app.route('/leave-review/<int:business_id>', methods=['GET', 'POST'])
+@route('/leave-review/<int:business_id>', methods=['GET', 'POST'])
 @login_required
 def leave_review(business_id):
     form = LeaveReviewForm()
@@ -363,8 +439,12 @@ def leave_review(business_id):
             business_id=business_id
         )
         db.session.add(new_review)
+        Business.adjust_rating_totals(business_id, new_review.rating, 1)
+        SiteStat.adjust(reviews=1)
+        DailyStat.record('reviews')
         try:
             db.session.commit()
+            page_cache.bump_business(business_id)
             flash('Your review has been posted!', 'success')
             return redirect(url_for('business_details', business_id=business_id))
         except Exception as e:
@@ -374,7 +454,7 @@ def leave_review(business_id):
         return redirect(url_for('business_details', business_id=business_id))
     return render_template('leave_review.html', form=form, business_id=business_id)
 
-@app.route('/edit-review/<int:review_id>', methods=['GET', 'POST'])
+@route('/edit-review/<int:review_id>', methods=['GET', 'POST'])
 @login_required
 def edit_review(review_id):
     review = Review.query.get_or_404(review_id)
@@ -386,44 +466,31 @@ def edit_review(review_id):
     form = EditReviewForm(obj=review)
     
     if form.validate_on_submit():
+        if review.is_visible and review.rating != form.rating.data:
+            Business.adjust_rating_totals(review.business_id, form.rating.data - review.rating, 0)
         review.content = form.content.data
         review.rating = form.rating.data
         db.session.commit()
+        page_cache.bump_business(review.business_id)
         flash('Your review has been updated.', 'success')
         return redirect(url_for('business_details', business_id=review.business_id))
     
     return render_template('edit_review.html', form=form, review=review)
 
-@app.route('/business-details/<int:business_id>/reviews', methods=['GET'])
+@route('/business-details/<int:business_id>/reviews', methods=['GET'])
+@page_cache.cached('business:{business_id}')
 def filter_reviews(business_id):
-    filter_by = request.args.get('filter_by', 'newest')
-    business = Business.query.get_or_404(business_id)
-    reviews_query = Review.query.filter_by(business_id=business_id)
-
-    if filter_by == 'oldest':
-        reviews_query = reviews_query.order_by(Review.created_at.asc())
-    elif filter_by == 'newest':
-        reviews_query = reviews_query.order_by(Review.created_at.desc())
-    elif filter_by == 'highest':
-        reviews_query = reviews_query.order_by(Review.rating.desc())
-    elif filter_by == 'lowest':
-        reviews_query = reviews_query.order_by(Review.rating.asc())
-
-    reviews = reviews_query.all()
-    average_rating = get_average_rating(business_id)
+    business = get_business(business_id)
+    reviews = get_reviews(business_id, request.args.get('cursor'), current_app.config['PAGE_SIZE'],
+                          request.args.get('filter_by', 'newest'))
     formatted_hours = Business.format_business_hours(business.business_hours)
-    vote_counts = get_vote_counts(reviews)
-    user_has_liked = has_user_liked_business(current_user.id, business_id) if current_user.is_authenticated else False
-    user_has_reviewed = has_user_reviewed_business(current_user.id, business_id) if current_user.is_authenticated else False
-    vote_forms = get_vote_forms(reviews)
 
     return render_template('business_details.html', business=business, formatted_hours=formatted_hours,
                            leave_review_form=LeaveReviewForm(), like_unlike_form=LikeUnlikeForm(),
-                           average_rating=average_rating, business_response_form=BusinessResponseForm(),
-                           reviews=reviews, user_has_reviewed=user_has_reviewed, user_has_liked=user_has_liked,
-                           vote_forms=vote_forms, vote_counts=vote_counts)
+                           business_response_form=BusinessResponseForm(), reviews=reviews,
+                           **get_review_page_context(business, reviews))
 
-@app.route('/respond-review/<int:review_id>', methods=['POST'])
+@route('/respond-review/<int:review_id>', methods=['POST'])
 @login_required
 def respond_review(review_id):
     form = BusinessResponseForm() 
@@ -432,13 +499,14 @@ def respond_review(review_id):
     if form.validate_on_submit():
         review.response = form.response.data
         db.session.commit()
+        page_cache.bump_business(review.business_id, directory=False)
         flash('Your response has been submitted.', 'success')
     else:
         flash('Failed to submit response. Please try again.', 'error')
     
     return redirect(url_for('business_details', business_id=review.business_id))
 
-@app.route('/edit-response/<int:review_id>', methods=['GET', 'POST'])
+@route('/edit-response/<int:review_id>', methods=['GET', 'POST'])
 @login_required
 def edit_response(review_id):
     review = Review.query.get_or_404(review_id)
@@ -453,6 +521,7 @@ def edit_response(review_id):
     if form.validate_on_submit():
         review.response = form.response.data
         db.session.commit()
+        page_cache.bump_business(review.business_id, directory=False)
         flash('Your response has been updated.', 'success')
         return redirect(url_for('business_details', business_id=review.business_id))
     
@@ -461,7 +530,7 @@ def edit_response(review_id):
 
     return render_template('edit_response.html', form=form, review_id=review_id)
 
-@app.route('/like-business/<int:business_id>', methods=['POST'])
+@route('/like-business/<int:business_id>', methods=['POST'])
 @login_required
 def like_business(business_id):
     business = Business.query.get(business_id)
@@ -485,11 +554,12 @@ def like_business(business_id):
         )
         db.session.add(new_interaction)
         db.session.commit()
+        favorites_cache.invalidate(current_user.id)
         flash('Business liked successfully!', 'success')
 
     return redirect(url_for('business_details', business_id=business_id))
 
-@app.route('/unlike-business/<int:business_id>', methods=['POST'])
+@route('/unlike-business/<int:business_id>', methods=['POST'])
 @login_required
 def unlike_business(business_id):
     business = Business.query.get(business_id)
@@ -506,59 +576,69 @@ def unlike_business(business_id):
     if like_interaction:
         db.session.delete(like_interaction)
         db.session.commit()
+        favorites_cache.invalidate(current_user.id)
         flash('Business unliked successfully!', 'success')
     else:
         flash('You have not liked this business.', 'info')
 
     return redirect(url_for('business_details', business_id=business_id))
 
-@app.route('/liked-businesses', methods=['GET', 'POST'])
+@route('/liked-businesses', methods=['GET', 'POST'])
 @login_required
 def liked_businesses():
-    liked_businesses = Business.query.join(Interaction).filter(
+    favorites = Business.query.join(Interaction).filter(
         Interaction.user_id == current_user.id,
         Interaction.interaction_type == 'favorite'
-    ).all()
-
-    categorized_businesses = {}
-    for business in liked_businesses:
-        if business.business_category not in categorized_businesses:
-            categorized_businesses[business.business_category] = []
-        categorized_businesses[business.business_category].append(business)
+    )
+    category_counts = favorites.with_entities(Business.business_category, func.count(Business.id)) \
+                               .group_by(Business.business_category).order_by(Business.business_category).all()
 
-    selected_category = request.args.get('category', None)
+    selected_category = request.args.get('category') or None
+    if selected_category:
+        favorites = favorites.filter(Business.business_category == selected_category)
+    page = paginate(favorites, [Business.business_category, Business.id],
+                    request.args.get('cursor'), current_app.config['PAGE_SIZE'])
 
-    return render_template('liked_businesses.html', 
-                           categorized_businesses=categorized_businesses,
+    return render_template('liked_businesses.html', category_counts=category_counts, page=page,
                            selected_category=selected_category)
 
-@app.route('/vote-review/<int:review_id>/<vote_type>', methods=['POST'])
+@route('/vote-review/<int:review_id>/<vote_type>', methods=['POST'])
 @login_required
 def vote_review(review_id, vote_type):
     review = Review.query.get_or_404(review_id)
     existing_interaction = Interaction.query.filter_by(user_id=current_user.id, review_id=review_id).first()
+    vote_deltas = {'up': 0, 'down': 0}
 
     if existing_interaction:
+        if existing_interaction.interaction_type in vote_deltas:
+            vote_deltas[existing_interaction.interaction_type] -= 1
         if existing_interaction.interaction_type == vote_type:
             db.session.delete(existing_interaction)
             flash('Your vote has been removed.', 'info')
         else:
             existing_interaction.interaction_type = vote_type
+            if vote_type in vote_deltas:
+                vote_deltas[vote_type] += 1
             flash('Your vote has been changed.', 'success')
     else:
         new_interaction = Interaction(user_id=current_user.id, review_id=review_id, interaction_type=vote_type)
         db.session.add(new_interaction)
+        if vote_type in vote_deltas:
+            vote_deltas[vote_type] += 1
+            DailyStat.record('votes')
         flash('Your vote has been recorded.', 'success')
 
+    Review.adjust_vote_counts(review_id, vote_deltas['up'], vote_deltas['down'])
     db.session.commit()
+    page_cache.bump_business(review.business_id, directory=False)
     return redirect(url_for('business_details', business_id=review.business_id))
 
-@app.route('/delete-business/<int:business_id>', methods=['POST'])
+@route('/delete-business/<int:business_id>', methods=['POST'])
 @login_required
 def delete_business(business_id):
     return redirect(url_for('confirm_delete_business', business_id=business_id))
 
-@app.route('/confirm_delete_business/<int:business_id>', methods=['GET', 'POST'])
+@route('/confirm_delete_business/<int:business_id>', methods=['GET', 'POST'])
 @login_required
 def confirm_delete_business(business_id):
     business = Business.query.get_or_404(business_id)
@@ -566,20 +646,10 @@ def confirm_delete_business(business_id):
 
     if form.validate_on_submit():
         try:
-            reviews = Review.query.filter_by(business_id=business_id).all()
-            
-            review_ids = [review.id for review in reviews]
-            
-            if review_ids:
-                FlaggedReview.query.filter(FlaggedReview.review_id.in_(review_ids)).delete(synchronize_session=False)
-                
-            if review_ids:
-                Interaction.query.filter(Interaction.review_id.in_(review_ids)).delete(synchronize_session=False)
-
-            Review.query.filter_by(business_id=business_id).delete(synchronize_session=False)
-
-            db.session.delete(business)
+            delete_businesses([business_id])
             db.session.commit()
+            page_cache.bump_business(business_id)
+            typeahead.remove_businesses([business_id])
             flash("Business and all associated reviews and interactions have been successfully deleted.", "success")
             return redirect(url_for('profile')) 
         except Exception as e:
@@ -590,7 +660,7 @@ def confirm_delete_business(business_id):
     return render_template('confirm_delete_business.html', form=form, business=business)
 
 
-@app.route('/delete-user', methods=['GET', 'POST'])
+@route('/delete-user', methods=['GET', 'POST'])
 @login_required
 def delete_user():
     form = DeleteUserForm()
@@ -602,9 +672,11 @@ def delete_user():
                 return redirect(url_for('profile'))
 
             try:
-                Interaction.query.filter_by(user_id=current_user.id).delete()
-                db.session.delete(current_user)
+                user_id = current_user.id
+                delete_user_account(user_id)
                 db.session.commit()
+                user_cache.invalidate(user_id)
+                page_cache.bump('site')
                 flash("Your account has been successfully deleted.", "success")
                 logout_user()  
                 return redirect(url_for('index'))
@@ -617,7 +689,7 @@ def delete_user():
 
     return render_template('confirm_delete_user.html', form=form)
 
-@app.route('/confirm-delete-user', methods=['GET', 'POST'])
+@route('/confirm-delete-user', methods=['GET', 'POST'])
 @login_required
 def confirm_delete_user():
     form = DeleteUserForm()
@@ -628,9 +700,11 @@ def confirm_delete_user():
                 return redirect(url_for('profile'))
 
             try:
-                Interaction.query.filter_by(user_id=current_user.id).delete()
-                db.session.delete(current_user)
+                user_id = current_user.id
+                delete_user_account(user_id)
                 db.session.commit()
+                user_cache.invalidate(user_id)
+                page_cache.bump('site')
                 flash("Your account has been successfully deleted.", "success")
                 logout_user()
                 return redirect(url_for('index'))
@@ -641,7 +715,7 @@ def confirm_delete_user():
             flash("Incorrect password. Please try again.", "error")
     return render_template('confirm_delete_user.html', form=form)
 
-@app.route('/flag-review/<int:review_id>', methods=['GET', 'POST'])
+@route('/flag-review/<int:review_id>', methods=['GET', 'POST'])
 @login_required
 def flag_review(review_id):
     form = FlagReviewForm()
@@ -666,41 +740,39 @@ def flag_review(review_id):
             admin_decision='pending'
         )
         db.session.add(new_flag)
+        SiteStat.adjust(pending_flags=1)
+        User.adjust_open_cases(review.business.user_id, 1)
+        DailyStat.record('flags')
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         flash('Your flag has been submitted for review by an administrator.', 'info')
         return redirect(url_for('business_details', business_id=review.business_id))
 
     return render_template('flag_review.html', form=form, review=review, user_flagged=user_flagged)
 
-@app.route('/my-cases', methods=['GET', 'POST'])
+@route('/my-cases', methods=['GET', 'POST'])
 @login_required
 def my_cases():
     """View for displaying flagged reviews for business owners."""
-    if not current_user.businesses:
+    cursors = {'pending': request.args.get('pending'), 'resolved': request.args.get('resolved'),
+               'appealed': request.args.get('appeals')}
+    cases = FlaggedReview.query.join(FlaggedReview.review).join(Review.business) \
+                               .filter(Business.user_id == current_user.id) \
+                               .options(contains_eager(FlaggedReview.review).contains_eager(Review.business),
+                                        contains_eager(FlaggedReview.review).joinedload(Review.user))
+    pages = paginate_partitions(cases, FlaggedReview.case_status,
+                                [FlaggedReview.flag_timestamp.desc(), FlaggedReview.id.desc()],
+                                cursors, current_app.config['PAGE_SIZE'])
+
+    if not any(pages.values()) and not any(cursors.values()) \
+            and not db.session.query(Business.query.filter_by(user_id=current_user.id).exists()).scalar():
         flash('You do not have any businesses registered.', 'error')
         return redirect(url_for('profile'))
 
-    business_ids = [business.id for business in current_user.businesses]
-
-    pending_reviews = FlaggedReview.query.join(Review).filter(
-        Review.business_id.in_(business_ids),
-        FlaggedReview.admin_decision == 'pending'
-    ).all()
+    return render_template('my_cases.html', pending_reviews=pages['pending'], resolved_reviews=pages['resolved'],
+                           my_appeals=pages['appealed'])
 
-    resolved_reviews = FlaggedReview.query.join(Review).filter(
-        Review.business_id.in_(business_ids),
-        (FlaggedReview.admin_decision == 'approve') |
-        ((FlaggedReview.admin_decision == 'deny') & (FlaggedReview.appeal_reason.is_(None)))
-    ).all()
-
-    my_appeals = FlaggedReview.query.join(Review).filter(
-        Review.business_id.in_(business_ids),
-        FlaggedReview.appeal_reason.isnot(None)
-    ).all()
-
-    return render_template('my_cases.html', pending_reviews=pending_reviews, resolved_reviews=resolved_reviews, my_appeals=my_appeals)
-
-@app.route('/appeal-flagged-review/<int:flagged_review_id>', methods=['GET', 'POST'])
+@route('/appeal-flagged-review/<int:flagged_review_id>', methods=['GET', 'POST'])
 @login_required
 def appeal_flagged_review(flagged_review_id):
     flagged_review = FlaggedReview.query.get_or_404(flagged_review_id)
@@ -713,13 +785,89 @@ def appeal_flagged_review(flagged_review_id):
     if form.validate_on_submit():
         flagged_review.appeal_reason = form.appeal_reason.data
         flagged_review.appeal_timestamp = datetime.utcnow()
-        flagged_review.appeal_decision = 'pending' 
+        if flagged_review.appeal_decision != 'pending':
+            SiteStat.adjust(pending_appeals=1)
+            User.adjust_open_cases(current_user.id, 1)
+        flagged_review.appeal_decision = 'pending'
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         flash('Your appeal has been submitted and is pending review.', 'success')
         return redirect(url_for('my_cases'))
     
     return render_template('appeal_flagged_review.html', form=form, flagged_review=flagged_review)
 
 
+@cli_command('rebuild-ratings')
+def rebuild_ratings():
+    """Recompute the stored business rating totals from the reviews table."""
+    Business.refresh_rating_totals()
+    db.session.commit()
+    print('Business rating totals rebuilt.')
+
+
+@cli_command('rebuild-vote-counts')
+def rebuild_vote_counts():
+    """Recompute the stored review vote counters from the interactions table."""
+    Review.refresh_vote_counts()
+    db.session.commit()
+    print('Review vote counters rebuilt.')
+
+
+@cli_command('geocode-businesses')
+def geocode_businesses():
+    """Recompute every business's coordinates from the ZIP centroid table."""
+    located = Business.refresh_coordinates()
+    db.session.commit()
+    page_cache.bump('directory')
+    print(f'Businesses geocoded; {located} ZIP codes found in the centroid table.')
+
+
+@cli_command('export')
+@click.argument('kind', type=click.Choice(['businesses', 'reviews']))
+@click.option('--format', 'fmt', type=click.Choice(list(export.FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', type=click.File('w'), default='-', help='File to write to (default: stdout).')
+@click.option('--business-id', type=int, help='Only the reviews of this business.')
+@click.option('--filter', 'filters', multiple=True, metavar='FIELD=VALUE',
+              help='A search form field, e.g. --filter business_state=CA. May be repeated.')
+def export_rows(kind, fmt, output, business_id, filters):
+    """Stream businesses or reviews as NDJSON or CSV."""
+    form = SearchBusinessForm(MultiDict(item.split('=', 1) for item in filters), meta={'csrf': False})
+    if filters and not form.validate():
+        raise click.UsageError(f'Invalid filters: {form.errors}')
+    query = export.business_query(form) if kind == 'businesses' else export.review_query(form, business_id)
+    for chunk in export.generate(query, fmt):
+        output.write(chunk)
+
+
+@cli_command('import')
+@click.argument('kind', type=click.Choice(importer.KINDS))
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'fmt', type=click.Choice(importer.FORMATS),
+              help='Input format (default: from the file extension, else ndjson).')
+@click.option('--batch-size', default=1000, show_default=True, help='Records validated and written per batch.')
+@click.option('--copy/--no-copy', 'use_copy', default=True, show_default=True,
+              help='Use COPY instead of executemany on PostgreSQL.')
+@click.option('--rounds', type=int, help='bcrypt cost for imported passwords; rehashed at the configured cost on login.')
+def import_rows(kind, source, fmt, batch_size, use_copy, rounds):
+    """Bulk load users, businesses or reviews from a CSV or NDJSON file."""
+    fmt = fmt or ('csv' if source.name.endswith('.csv') else 'ndjson')
+    result = importer.import_records(kind, importer.read_records(source, fmt), batch_size, use_copy, rounds)
+    for number, error in result.errors[:20]:
+        print(f'Record {number}: {error}')
+    print(f'Imported {result.inserted} {kind}; skipped {result.duplicates} duplicates '
+          f'and {len(result.errors)} invalid records.')
+
+
+@cli_command('reconcile-stats')
+@click.option('--days', default=30, show_default=True, help='How many trailing days of rollups to rebuild.')
+def reconcile_stats(days):
+    """Recompute the dashboard counters, owners' open case counts and recent daily rollups from the source tables."""
+    SiteStat.reconcile()
+    DailyStat.reconcile(days)
+    User.refresh_open_cases()
+    db.session.commit()
+    print('Dashboard statistics reconciled.')
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""Deterministic synthetic data for benchmarks.
+
+Generates users, businesses with opening hours, reviews, votes, favorites,
+flags and appeals from a seed, so two runs with the same arguments produce
+the same database. Rows get explicit ids and are bulk-written a chunk at a
+time (COPY on PostgreSQL). The stored aggregates are then rebuilt the way
+the maintenance commands do.
+
+Every user's password is ``password``; user 1 is an admin and the next
+``owners`` users own the businesses.
+
+    python benchmarks/dataset.py --database postgresql:///bench_db --users 2000 --businesses 500
+"""
+import argparse
+import os
+import random
+import sys
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from choices import BUSINESS_CATEGORIES, STATE_CHOICES, TIME_ZONE_CHOICES  # noqa: E402
+from hours import week_ranges, utc_offset_minutes  # noqa: E402
+from config import BUNDLED_ZIP_CENTROIDS_PATH  # noqa: E402
+from geo import load_centroids  # noqa: E402
+from importer import write_rows  # noqa: E402
+from models import db, User, Business, Review, Interaction, FlaggedReview, OpeningHours, SiteStat, DailyStat  # noqa: E402
+
+PASSWORD = 'password'
+CHUNK = 5000
+START = datetime(2024, 1, 1)
+# Downtown ZIP codes of big cities, so radius searches have neighbours to find
+METRO_ZIPS = [
+    '02108', '10001', '10007', '11201', '15222', '19103', '20001', '21201', '28202', '30303', '32801',
+    '33131', '33602', '37203', '43215', '44113', '46204', '48226', '53202', '55401', '60601', '63101',
+    '64106', '70112', '75201', '77002', '78205', '78701', '80202', '84101', '85004', '87102', '89101',
+    '90001', '90012', '90401', '92101', '94103', '95113', '95814', '96813', '97204', '98101', '99501',
+]
+CITIES = ['Austin', 'Boston', 'Denver', 'Fresno', 'Miami', 'Portland', 'Seattle', 'Tulsa']
+HOURS = [
+    'Monday: 9:0 - 17:0, Tuesday: 9:0 - 17:0, Wednesday: 9:0 - 17:0, Thursday: 9:0 - 17:0, '
+    'Friday: 9:0 - 17:0, Saturday: Closed, Sunday: Closed',
+    'Monday: 6:0 - 22:0, Tuesday: 6:0 - 22:0, Wednesday: 6:0 - 22:0, Thursday: 6:0 - 22:0, '
+    'Friday: 6:0 - 23:30, Saturday: 8:0 - 23:30, Sunday: 8:0 - 20:0',
+    'Monday: Closed, Tuesday: 17:0 - 2:0, Wednesday: 17:0 - 2:0, Thursday: 17:0 - 2:0, '
+    'Friday: 17:0 - 3:0, Saturday: 17:0 - 3:0, Sunday: 17:0 - 23:0',
+]
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 500
+    businesses: int = 100
+    owners: int = 50
+    reviews_per_business: int = 20
+    votes_per_review: int = 3
+    favorites_per_user: int = 5
+    flag_ratio: float = 0.05
+    appeal_ratio: float = 0.3
+    seed: int = 1
+
+
+def _write(table, rows):
+    """Write an iterable of row dicts a chunk at a time."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK))
+        if not chunk:
+            return
+        write_rows(table, chunk, use_copy=True)
+
+
+def _reset_sequences():
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ('users', 'businesses', 'reviews', 'interactions', 'flagged_reviews', 'opening_hours'):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"))
+
+
+def generate(spec, password_hash):
+    """Recreate the schema and fill it with the dataset described by spec."""
+    rng = random.Random(spec.seed)
+    user_ids = range(1, spec.users + 1)
+    owner_ids = range(2, 2 + spec.owners)
+    categories = [value for value, _ in BUSINESS_CATEGORIES if value]
+    states = [value for value, _ in STATE_CHOICES]
+    time_zones = [value for value, _ in TIME_ZONE_CHOICES]
+    centroids = load_centroids(BUNDLED_ZIP_CENTROIDS_PATH)
+    zip_codes = METRO_ZIPS
+
+    db.session.close()  # an open read transaction would block the DROPs
+    db.drop_all()
+    db.create_all()
+
+    _write(User.__table__, (dict(
+        id=user_id, first_name=f'User{user_id}', last_name='Bench', dob=date(1990, 1, 1), address='1 Main St',
+        city=CITIES[user_id % len(CITIES)], state='CA', zip='90001', phone_number=f'555{user_id:07d}',
+        email=f'user{user_id}@example.com', password_hash=password_hash, is_admin=user_id == 1
+    ) for user_id in user_ids))
+
+    businesses = []
+    for business_id in range(1, spec.businesses + 1):
+        zip_code = rng.choice(zip_codes)
+        businesses.append(dict(
+            id=business_id, business_name=f'Business {business_id}', business_category=rng.choice(categories),
+            business_address=f'{business_id} Market St', business_city=rng.choice(CITIES),
+            business_state=rng.choice(states), business_zip=zip_code,
+            business_description=f'Synthetic business number {business_id}', business_phone=None,
+            business_website=None, business_hours=rng.choice(HOURS), time_zone=rng.choice(time_zones),
+            created_at=START, user_id=owner_ids[(business_id - 1) % len(owner_ids)], review_count=0, rating_sum=0,
+            latitude=centroids[zip_code][0], longitude=centroids[zip_code][1]
+        ))
+    _write(Business.__table__, businesses)
+    _write(OpeningHours.__table__, (dict(
+        business_id=business['id'], start_minute=start, end_minute=end,
+        utc_offset=utc_offset_minutes(business['time_zone'])
+    ) for business in businesses for start, end in week_ranges(business['business_hours'])))
+
+    reviews, votes, flags = [], [], []
+    for business in businesses:
+        reviewers = rng.sample([user_id for user_id in user_ids if user_id != business['user_id']],
+                               min(spec.reviews_per_business, spec.users - 1))
+        for reviewer in reviewers:
+            review_id = len(reviews) + 1
+            created_at = START + timedelta(minutes=rng.randrange(365 * 24 * 60))
+            reviews.append(dict(
+                id=review_id, content=f'Review {review_id} of business {business["id"]}',
+                rating=rng.randint(1, 5), created_at=created_at, is_visible=True, up_count=0, down_count=0,
+                user_id=reviewer, business_id=business['id']
+            ))
+            for voter in rng.sample(user_ids, min(spec.votes_per_review, spec.users)):
+                if voter != reviewer:
+                    votes.append(dict(user_id=voter, review_id=review_id, business_id=None,
+                                      interaction_type=rng.choice(('up', 'up', 'down')),
+                                      created_at=created_at + timedelta(hours=1)))
+            if rng.random() < spec.flag_ratio:
+                appealed = rng.random() < spec.appeal_ratio
+                flags.append(dict(
+                    review_id=review_id, user_id=business['user_id'], flag_reason='Looks like a fake review',
+                    flag_timestamp=created_at + timedelta(days=1), admin_decision='deny' if appealed else 'pending',
+                    admin_notes=None, appeal_reason='Please look again' if appealed else None,
+                    appeal_timestamp=created_at + timedelta(days=2) if appealed else None,
+                    appeal_decision='pending' if appealed else None, claimed_by=None, claim_expires_at=None
+                ))
+    _write(Review.__table__, reviews)
+    _write(Interaction.__table__, votes)
+    _write(FlaggedReview.__table__, flags)
+    _write(Interaction.__table__, (dict(
+        user_id=user_id, review_id=None, business_id=business_id, interaction_type='favorite', created_at=START
+    ) for user_id in user_ids for business_id in rng.sample(range(1, spec.businesses + 1),
+                                                            min(spec.favorites_per_user, spec.businesses))))
+
+    _reset_sequences()
+    Business.refresh_rating_totals()
+    Review.refresh_vote_counts()
+    User.refresh_open_cases()
+    SiteStat.reconcile()
+    DailyStat.reconcile(days=400, today=START.date() + timedelta(days=400))
+    db.session.commit()
+
+
+def add_arguments(parser):
+    """The dataset options, shared with the route benchmark."""
+    defaults = DatasetSpec()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+
+
+def spec_from_args(args):
+    return DatasetSpec(**{name: getattr(args, name) for name in asdict(DatasetSpec())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='postgresql:///bench_db')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from app import create_app
+    from config import BenchConfig
+    app = create_app(BenchConfig)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+    with app.app_context():
+        from hashing import password_hasher
+        generate(spec_from_args(args), password_hasher.bcrypt.generate_password_hash(PASSWORD, 4).decode('utf-8'))
+    print(f'Generated {spec_from_args(args)} in {args.database}.')
+
+
+if __name__ == '__main__':
+    main()
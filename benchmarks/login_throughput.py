@@ -0,0 +1,82 @@
+"""Micro-benchmark: password checks per second at each bcrypt cost.
+
+Logins are dominated by one bcrypt verification, so this reports how many
+logins a single hashing worker can serve per second at each cost. It also
+reports the total throughput of a PasswordHasher pool when more client
+threads than workers hit it at once.
+
+    python benchmarks/login_throughput.py --costs 10 11 12 --workers 2 --clients 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hashing import PasswordHasher, HashingBusy  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def make_hasher(cost, workers, queue_limit):
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=cost, PASSWORD_HASH_WORKERS=workers,
+                      PASSWORD_HASH_QUEUE_LIMIT=queue_limit)
+    return PasswordHasher(app)
+
+
+def per_worker(hasher, pw_hash, seconds):
+    """Sequential checks on the calling thread, bypassing the pool."""
+    checks, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        hasher.bcrypt.check_password_hash(pw_hash, PASSWORD)
+        checks += 1
+    return checks / (time.perf_counter() - start)
+
+
+def pooled(hasher, pw_hash, clients, seconds):
+    """Concurrent checks through the bounded pool. Returns (checks/s, rejected)."""
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        done = rejected = 0
+        while time.perf_counter() < deadline:
+            try:
+                hasher.check(pw_hash, PASSWORD)
+                done += 1
+            except HashingBusy:
+                rejected += 1
+                time.sleep(0.001)
+        return done, rejected
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda _: client(), range(clients)))
+    elapsed = time.perf_counter() - start
+    return sum(done for done, _ in results) / elapsed, sum(rejected for _, rejected in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--costs', type=int, nargs='+', default=[10, 11, 12, 13])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--queue-limit', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'cost':>4}  {'ms/login':>8}  {'logins/s/worker':>15}  "
+          f"{'pool logins/s':>13}  {'rejected':>8}")
+    for cost in args.costs:
+        hasher = make_hasher(cost, args.workers, args.queue_limit)
+        pw_hash = hasher.hash(PASSWORD)
+        single = per_worker(hasher, pw_hash, args.seconds)
+        total, rejected = pooled(hasher, pw_hash, args.clients, args.seconds)
+        hasher.executor.shutdown()
+        print(f"{cost:>4}  {1000 / single:>8.1f}  {single:>15.1f}  {total:>13.1f}  {rejected:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+"""Per-route benchmark: latency, SQL statement counts and peak memory.
+
+Seeds a deterministic dataset (see dataset.py), then drives every route,
+reads and writes, through the Flask test client as the right kind of user.
+Each call of a write route gets fresh rows to act on, built outside the
+timing, so every call does the full write. For each
+route it reports p50/p95 latency, the number of SQL statements per request
+and the peak Python memory of one request. Results can be saved as a JSON
+baseline. A later run with --compare fails (exit status 1) when a route's
+p95 or peak memory grows by more than --threshold, or its statement count
+grows at all.
+
+    python benchmarks/routes.py --output baseline.json
+    python benchmarks/routes.py --compare baseline.json --threshold 0.25
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dataset  # noqa: E402
+from models import db, User, Business, Review, Interaction, FlaggedReview  # noqa: E402
+
+# A route to measure. `url` and every value of `data` are formatted with the ids of the seeded dataset,
+# plus whatever `fixture` returns: a fixture builds, before each call and outside the timing, the rows
+# that one call uses up (a business to delete, a claimed flag to decide...). `who` is 'anonymous', 'user',
+# 'owner' or 'admin', or 'fresh' for a new client per call, logged in as the fixture's `email` if any.
+Route = namedtuple('Route', 'name who method url data fixture', defaults=(None, None))
+
+RUN = uuid.uuid4().int % 10 ** 6  # keeps fixture names unique across --skip-seed runs
+_serial = itertools.count(1)
+
+BUSINESS_FORM = dict(
+    business_name='Business {business_id}', business_category='Fitness', business_address='1 Market St',
+    business_city='Boston', business_state='MA', business_zip='02108', business_description='Edited by the benchmark',
+    time_zone='UTC-05:00',
+    **{f'{day}_hours_{edge}-{field}': value
+       for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+       for edge, hour in (('open', '9'), ('close', '17'))
+       for field, value in (('hour', hour), ('minute', '0'), ('closed', 'Open'))},
+)
+DECISION_FORM = dict(decision='deny', notes='Checked by the benchmark')
+
+
+def _business(ids):
+    """A new business of the owner's."""
+    n = next(_serial)
+    business = Business(business_name=f'Fixture {RUN} {n}', business_category='Fitness',
+                        business_address='1 Fixture St', business_city='Boston', business_state='MA',
+                        business_zip='02108', business_description='Made by the benchmark',
+                        business_hours=dataset.HOURS[0], time_zone='UTC-05:00', user_id=ids['owner_id'])
+    db.session.add(business)
+    db.session.flush()
+    return business
+
+
+def _review(ids):
+    """A new review by the user of a new business of the owner's."""
+    business = _business(ids)
+    review = Review(content='Made by the benchmark', rating=4, user_id=ids['user_id'], business_id=business.id)
+    db.session.add(review)
+    Business.adjust_rating_totals(business.id, 4, 1)
+    db.session.flush()
+    return review
+
+
+def _flag(ids, **fields):
+    values = dict(flag_reason='Made by the benchmark', flag_timestamp=datetime.utcnow(), admin_decision='pending')
+    values.update(fields)
+    flag = FlaggedReview(review_id=_review(ids).id, user_id=ids['owner_id'], **values)
+    db.session.add(flag)
+    db.session.flush()
+    return flag
+
+
+def _claim(ids):
+    return dict(claimed_by=ids['admin_id'], claim_expires_at=datetime.utcnow() + timedelta(hours=1))
+
+
+def _user():
+    """A new user without businesses, who can log in with dataset.PASSWORD."""
+    n = next(_serial)
+    user = User(first_name='Fixture', last_name='Bench', dob=date(1990, 1, 1), address='1 Main St',
+                city='Austin', state='TX', zip='78701', phone_number=f'9{RUN:06d}{n:06d}',
+                email=f'fixture{RUN}x{n}@example.com', password_hash=User.query.get(1).password_hash)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def fresh_business(ids):
+    business_id = _business(ids).id
+    db.session.commit()
+    return {'fixture_business_id': business_id}
+
+
+def users_review(ids):
+    review_id = _review(ids).id
+    db.session.commit()
+    return {'fixture_review_id': review_id}
+
+
+def liked_business(ids):
+    business_id = _business(ids).id
+    db.session.add(Interaction(user_id=ids['user_id'], business_id=business_id, interaction_type='favorite'))
+    db.session.commit()
+    return {'fixture_business_id': business_id}
+
+
+def denied_flag(ids):
+    flag_id = _flag(ids, admin_decision='deny').id
+    db.session.commit()
+    return {'fixture_flag_id': flag_id}
+
+
+def claimed_flag(ids):
+    flag_id = _flag(ids, **_claim(ids)).id
+    User.adjust_open_cases(ids['owner_id'], 1)
+    db.session.commit()
+    return {'fixture_flag_id': flag_id}
+
+
+def claimed_appeal(ids):
+    flag_id = _flag(ids, admin_decision='deny', appeal_reason='Made by the benchmark',
+                    appeal_timestamp=datetime.utcnow(), appeal_decision='pending', **_claim(ids)).id
+    User.adjust_open_cases(ids['owner_id'], 1)
+    db.session.commit()
+    return {'fixture_flag_id': flag_id}
+
+
+def fresh_user(ids):
+    user = _user()
+    db.session.commit()
+    return {'fixture_user_id': user.id, 'email': user.email}
+
+
+def signed_in(ids):
+    return {'email': f"user{ids['user_id']}@example.com"}
+
+
+def serial(ids):
+    return {'n': f'{RUN:06d}{next(_serial):04d}'}
+
+
+# Every route of the app. Reads come first: the writes after them change the data, so reseed
+# (leave out --skip-seed) before runs whose results are compared.
+ROUTES = [
+    Route('index', 'anonymous', 'GET', '/'),
+    Route('search_by_name', 'anonymous', 'GET', '/search_results?search_business_name=Business'),
+    Route('search_highest_in_state', 'anonymous', 'GET', '/search_results?business_state=CA&sort_by=highest'),
+    Route('search_open_now', 'anonymous', 'GET', '/search_results?open_at=now'),
+    Route('search_near_zip', 'anonymous', 'GET', '/search_results?near_zip=90001&within_miles=50&sort_by=distance'),
+    Route('search_form', 'anonymous', 'GET', '/search-business'),
+    Route('typeahead', 'anonymous', 'GET', '/typeahead?q=Business%201'),
+    Route('business_details', 'anonymous', 'GET', '/business-details/{business_id}'),
+    Route('business_details_signed_in', 'user', 'GET', '/business-details/{business_id}'),
+    Route('filter_reviews_highest', 'user', 'GET', '/business-details/{business_id}/reviews?filter_by=highest'),
+    Route('signup_form', 'anonymous', 'GET', '/signup'),
+    Route('login_form', 'anonymous', 'GET', '/login'),
+    Route('liked_businesses', 'user', 'GET', '/liked-businesses'),
+    Route('profile', 'owner', 'GET', '/profile'),
+    Route('edit_profile_form', 'user', 'GET', '/edit-profile'),
+    Route('register_business_form', 'owner', 'GET', '/register-business'),
+    Route('edit_business_form', 'owner', 'GET', '/edit-business/{business_id}'),
+    Route('leave_review_form', 'user', 'GET', '/leave-review/{fixture_business_id}', fixture=fresh_business),
+    Route('edit_review_form', 'user', 'GET', '/edit-review/{fixture_review_id}', fixture=users_review),
+    Route('edit_response_form', 'owner', 'GET', '/edit-response/{review_id}'),
+    Route('flag_review_form', 'owner', 'GET', '/flag-review/{fixture_review_id}', fixture=users_review),
+    Route('appeal_form', 'owner', 'GET', '/appeal-flagged-review/{fixture_flag_id}', fixture=denied_flag),
+    Route('confirm_delete_business_form', 'owner', 'GET', '/confirm_delete_business/{business_id}'),
+    Route('confirm_delete_user_form', 'user', 'GET', '/confirm-delete-user'),
+    Route('delete_user_form', 'user', 'GET', '/delete-user'),
+    Route('my_cases', 'owner', 'GET', '/my-cases'),
+    Route('admin_dashboard', 'admin', 'GET', '/admin/dashboard'),
+    Route('admin_page_cache', 'admin', 'GET', '/admin/page-cache'),
+    Route('admin_user_cache', 'admin', 'GET', '/admin/user-cache'),
+    Route('admin_search_cache', 'admin', 'GET', '/admin/search-cache'),
+    Route('admin_sql_metrics', 'admin', 'GET', '/admin/sql-metrics'),
+    Route('admin_export_businesses', 'admin', 'GET', '/admin/export/businesses.ndjson'),
+    Route('admin_claim_flags', 'admin', 'POST', '/admin/claim-batch/flags'),
+    Route('admin_flagged_reviews', 'admin', 'GET', '/admin/flagged-reviews'),
+    Route('admin_review_decision_form', 'admin', 'GET', '/admin/review-decision/{fixture_flag_id}',
+          fixture=claimed_flag),
+    Route('admin_claim_appeals', 'admin', 'POST', '/admin/claim-batch/appeals'),
+    Route('admin_appeals', 'admin', 'GET', '/admin/appeals'),
+    Route('admin_process_appeal_form', 'admin', 'GET', '/admin/process-appeal/{fixture_flag_id}',
+          fixture=claimed_appeal),
+    Route('admin_users', 'admin', 'GET', '/admin/users'),
+    Route('admin_businesses', 'admin', 'GET', '/admin/businesses'),
+
+    Route('login', 'fresh', 'POST', '/login',
+          dict(email='user{user_id}@example.com', password=dataset.PASSWORD)),
+    Route('logout', 'fresh', 'GET', '/logout', fixture=signed_in),
+    Route('signup', 'fresh', 'POST', '/signup', dict(
+        first_name='New', last_name='Bench', dob='1990-01-01', address='1 Main St', city='Austin', state='TX',
+        zip='78701', phone_number='8{n}', email='new{n}@example.com', password=dataset.PASSWORD,
+        confirm_password=dataset.PASSWORD), fixture=serial),
+    Route('edit_profile', 'user', 'POST', '/edit-profile', dict(
+        first_name='User{user_id}', last_name='Bench', dob='1990-01-01', address='1 Main St', city='Austin',
+        state='CA', zip='90001', phone_number='555{user_id:07d}', email='user{user_id}@example.com')),
+    Route('vote_review', 'user', 'POST', '/vote-review/{review_id}/up'),
+    Route('like_business', 'user', 'POST', '/like-business/{fixture_business_id}', fixture=fresh_business),
+    Route('unlike_business', 'user', 'POST', '/unlike-business/{fixture_business_id}', fixture=liked_business),
+    Route('leave_review', 'user', 'POST', '/leave-review/{fixture_business_id}',
+          dict(content='Posted by the benchmark', rating='5', proof_of_purchase='y'), fixture=fresh_business),
+    Route('edit_review', 'user', 'POST', '/edit-review/{fixture_review_id}',
+          dict(content='Edited by the benchmark', rating='3'), fixture=users_review),
+    Route('respond_review', 'owner', 'POST', '/respond-review/{review_id}', dict(response='Thanks!')),
+    Route('respond_on_details_page', 'owner', 'POST', '/business-details/{business_id}',
+          dict(review_id='{review_id}', response='Thanks!')),
+    Route('edit_response', 'owner', 'POST', '/edit-response/{review_id}', dict(response='Thanks again!')),
+    Route('flag_review', 'owner', 'POST', '/flag-review/{fixture_review_id}',
+          dict(reason='Made up by a competitor'), fixture=users_review),
+    Route('appeal_flagged_review', 'owner', 'POST', '/appeal-flagged-review/{fixture_flag_id}',
+          dict(appeal_reason='Please look at this again'), fixture=denied_flag),
+    Route('register_business', 'owner', 'POST', '/register-business',
+          dict(BUSINESS_FORM, business_name='New {n}'), fixture=serial),
+    Route('edit_business', 'owner', 'POST', '/edit-business/{business_id}', BUSINESS_FORM),
+    Route('delete_business', 'owner', 'POST', '/delete-business/{fixture_business_id}', fixture=fresh_business),
+    Route('confirm_delete_business', 'owner', 'POST', '/confirm_delete_business/{fixture_business_id}',
+          dict(password=dataset.PASSWORD), fixture=fresh_business),
+    Route('delete_user', 'fresh', 'POST', '/delete-user', dict(password=dataset.PASSWORD), fixture=fresh_user),
+    Route('confirm_delete_user', 'fresh', 'POST', '/confirm-delete-user', dict(password=dataset.PASSWORD),
+          fixture=fresh_user),
+    Route('admin_review_decision', 'admin', 'POST', '/admin/review-decision/{fixture_flag_id}', DECISION_FORM,
+          fixture=claimed_flag),
+    Route('admin_process_appeal', 'admin', 'POST', '/admin/process-appeal/{fixture_flag_id}', DECISION_FORM,
+          fixture=claimed_appeal),
+    Route('admin_release_claims', 'admin', 'POST', '/admin/release-claims/flags'),
+    Route('admin_delete_business', 'admin', 'POST', '/admin/delete-business/{fixture_business_id}',
+          fixture=fresh_business),
+    Route('admin_delete_user', 'admin', 'POST', '/admin/delete-user/{fixture_user_id}', fixture=fresh_user),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def login(client, email):
+    client.post('/login', data=dict(email=email, password=dataset.PASSWORD))
+    return client
+
+
+def make_clients(app, ids):
+    """One test client per kind of user, logged in."""
+    clients = {'anonymous': app.test_client()}
+    for who in ('admin', 'owner', 'user'):
+        clients[who] = login(app.test_client(), f"user{ids[f'{who}_id']}@example.com")
+    return clients
+
+
+def prepare(clients, route, ids):
+    """Build the route's fixture and return a function making one call of it."""
+    values = dict(ids, **(route.fixture(ids) if route.fixture else {}))
+    if route.who == 'fresh':
+        client = clients['anonymous'].application.test_client()
+        if 'email' in values:
+            login(client, values['email'])
+    else:
+        client = clients[route.who]
+    url = route.url.format(**values)
+    data = {key: value.format(**values) for key, value in (route.data or {}).items()}
+    return lambda: client.open(url, method=route.method, data=data)
+
+
+def measure(db, clients, route, ids, iterations, warmup):
+    from sqlalchemy import event
+
+    for _ in range(warmup):
+        prepare(clients, route, ids)()
+
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    timings, counts, status = [], [], None
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        for _ in range(iterations):
+            call = prepare(clients, route, ids)
+            statements.clear()
+            start = time.perf_counter()
+            status = call().status_code
+            timings.append((time.perf_counter() - start) * 1000)
+            counts.append(len(statements))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    # Tracing slows everything down, so memory gets its own request
+    call = prepare(clients, route, ids)
+    tracemalloc.start()
+    try:
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'status': status, 'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2), 'statements': max(counts),
+            'peak_kib': round(peak / 1024, 1)}
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Return a description of every regression against the baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['statements'] > before['statements']:
+            regressions.append(f"{name}: {before['statements']} -> {result['statements']} SQL statements")
+        if result['p95_ms'] > before['p95_ms'] * (1 + threshold) \
+                and result['p95_ms'] - before['p95_ms'] > min_delta_ms:
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result['peak_kib'] > before['peak_kib'] * (1 + threshold):
+            regressions.append(f"{name}: peak memory {before['peak_kib']} -> {result['peak_kib']} KiB")
+    return regressions
+
+
+def run(app, db, spec, iterations=20, warmup=2, only=None):
+    """Benchmark every route (or those whose name contains `only`) and return the results."""
+    ids = {'business_id': 1, 'review_id': 1, 'admin_id': 1, 'owner_id': 2, 'user_id': spec.users}
+    clients = make_clients(app, ids)
+    return {route.name: measure(db, clients, route, ids, iterations, warmup)
+            for route in ROUTES if not only or only in route.name}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='postgresql:///bench_db')
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the data already in --database.')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--route', help='Only routes whose name contains this.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Fail on regressions against this JSON baseline.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed relative growth of p95 and memory.')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Ignore p95 growth smaller than this.')
+    dataset.add_arguments(parser)
+    args = parser.parse_args()
+    spec = dataset.spec_from_args(args)
+
+    from app import create_app, db
+    from config import BenchConfig
+    from hashing import password_hasher
+    app = create_app(BenchConfig)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database
+
+    with app.app_context():
+        if not args.skip_seed:
+            dataset.generate(spec, password_hasher.bcrypt.generate_password_hash(dataset.PASSWORD, 4).decode('utf-8'))
+        results = run(app, db, spec, args.iterations, args.warmup, args.route)
+
+    print(f"{'route':<28} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'SQL':>5} {'peak KiB':>9}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['status']:>6} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+              f"{result['statements']:>5} {result['peak_kib']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'dataset': vars(spec), 'routes': results}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['routes']
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Cold-start benchmark: import, create_app and the first response.
+
+Each run is a fresh interpreter, so nothing is cached in-process. The child
+times importing ``app``, building an app from BenchConfig and serving the
+first request through the test client, and prints the times as JSON. The
+parent reports the median and worst of each phase over --runs runs.
+
+    python benchmarks/startup.py --runs 10 --url /
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app as module
+imported = time.perf_counter()
+from config import BenchConfig
+app = module.create_app(BenchConfig)
+app.config['SQLALCHEMY_DATABASE_URI'] = {database!r}
+created = time.perf_counter()
+status = app.test_client().get({url!r}).status_code
+responded = time.perf_counter()
+print(json.dumps({{'status': status, 'import_ms': (imported - started) * 1000,
+                  'create_app_ms': (created - imported) * 1000,
+                  'first_response_ms': (responded - created) * 1000,
+                  'total_ms': (responded - started) * 1000}}))
+'''
+
+PHASES = ('import_ms', 'create_app_ms', 'first_response_ms', 'total_ms')
+
+
+def measure(url, database):
+    """Time one cold start in a new interpreter."""
+    output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT, url=url, database=database)],
+                            cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    return {phase: {'median': round(statistics.median(run[phase] for run in runs), 1),
+                    'max': round(max(run[phase] for run in runs), 1)} for phase in PHASES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--url', default='/', help='The first request; / needs no database.')
+    parser.add_argument('--database', default='postgresql:///bench_db')
+    args = parser.parse_args()
+
+    runs = [measure(args.url, args.database) for _ in range(args.runs)]
+    statuses = {run['status'] for run in runs}
+    print(f"{args.runs} cold starts, first response {', '.join(map(str, sorted(statuses)))}")
+    for phase, times in summarize(runs).items():
+        print(f"{phase:<18} median {times['median']:>8} ms   max {times['max']:>8} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,90 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, current_app
 from flask_login import current_user
-from models import db, Business, Review, Interaction
+from models import db, Business, Review, Interaction, FlaggedReview, OpeningHours
 from forms import VoteForm
+from choices import DAYS_OF_WEEK_CHOICES, TIME_ZONE_CHOICES
+from hours import DAYS, MINUTES_PER_DAY, utc_offset_minutes, local_week_minute
+from search import match_text, match_city
+from geo import zip_centroid, bounding_box, longitude_condition, distance_expression
+from pagination import paginate, paginate_keys, sort_keys
+from page_cache import page_cache
+from favorites import favorites_cache
+from search_cache import search_cache
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, case, and_, or_
+from sqlalchemy.orm import joinedload
 
 def get_business(business_id):
     return Business.query.get_or_404(business_id)
 
-def get_reviews(business_id):
-    return Review.query.filter_by(business_id=business_id, is_visible=True).all()
-
-def get_average_rating(business_id):
-    average_rating = db.session.query(func.avg(Review.rating)) \
-                               .filter(Review.business_id == business_id, Review.is_visible == True) \
-                               .scalar()
-    return round(average_rating, 1) if average_rating is not None else None
+REVIEW_ORDERINGS = {
+    'newest': [Review.created_at.desc(), Review.id.desc()],
+    'oldest': [Review.created_at.asc(), Review.id.asc()],
+    'highest': [Review.rating.desc(), Review.id.desc()],
+    'lowest': [Review.rating.asc(), Review.id.asc()],
+    'helpful': [Review.helpfulness.desc(), Review.id.desc()],
+}
+
+def get_reviews(business_id, cursor=None, per_page=25, filter_by='newest'):
+    query = Review.query.options(joinedload(Review.user)).filter_by(business_id=business_id, is_visible=True)
+    ordering = REVIEW_ORDERINGS.get(filter_by, REVIEW_ORDERINGS['newest'])
+    return paginate(query, ordering, cursor, per_page)
+
+def get_average_rating(business):
+    if not business.review_count:
+        return None
+    return round(business.rating_sum / business.review_count, 1)
+
+def get_vote_tallies(review_ids):
+    """Return up/down vote counts for the given review ids from a single grouped query."""
+    tallies = {review_id: {'up': 0, 'down': 0} for review_id in review_ids}
+    if not tallies:
+        return tallies
+
+    rows = db.session.query(
+        Interaction.review_id,
+        func.sum(case((Interaction.interaction_type == 'up', 1), else_=0)),
+        func.sum(case((Interaction.interaction_type == 'down', 1), else_=0))
+    ).filter(
+        Interaction.review_id.in_(list(tallies)),
+        Interaction.interaction_type.in_(['up', 'down'])
+    ).group_by(Interaction.review_id).all()
+
+    for review_id, up, down in rows:
+        tallies[review_id] = {'up': int(up), 'down': int(down)}
+    return tallies
 
 def get_vote_counts(reviews):
-    return {
-        review.id: {
-            'up': Interaction.query.filter_by(review_id=review.id, interaction_type='up').count(),
-            'down': Interaction.query.filter_by(review_id=review.id, interaction_type='down').count()
-        }
-        for review in reviews
-    }
+    if current_app.config.get('REVIEW_VOTE_COUNTERS'):
+        return {review.id: {'up': review.up_count, 'down': review.down_count} for review in reviews}
+    return get_vote_tallies([review.id for review in reviews])
 
 def has_user_reviewed_business(user_id, business_id):
     return Review.user_has_reviewed_business(user_id, business_id) if user_id else False
 
 def has_user_liked_business(user_id, business_id):
-    return Interaction.query.filter_by(user_id=user_id, business_id=business_id, interaction_type='favorite').first() is not None if user_id else False
+    return business_id in favorites_cache.ids(user_id)
+
+def get_user_flagged_review_ids(user_id, review_ids):
+    if not user_id or not review_ids:
+        return set()
+    rows = db.session.query(FlaggedReview.review_id) \
+                     .filter(FlaggedReview.user_id == user_id, FlaggedReview.review_id.in_(review_ids)) \
+                     .all()
+    return {review_id for (review_id,) in rows}
+
+def get_review_page_context(business, reviews):
+    """Everything business_details.html needs besides the forms, in a fixed number of queries."""
+    user_id = current_user.id if current_user.is_authenticated else None
+    review_ids = [review.id for review in reviews]
+    return {
+        'average_rating': get_average_rating(business),
+        'vote_counts': get_vote_counts(reviews),
+        'vote_forms': get_vote_forms(reviews),
+        'user_has_reviewed': has_user_reviewed_business(user_id, business.id),
+        'user_has_liked': has_user_liked_business(user_id, business.id),
+        'user_flagged_reviews': get_user_flagged_review_ids(user_id, review_ids),
+    }
 
 def handle_response_form_submission(business, form):
     review_id = request.form.get('review_id')
@@ -39,24 +93,39 @@ def handle_response_form_submission(business, form):
         review.response = form.response.data
         review.response_at = datetime.utcnow()
         db.session.commit()
+        page_cache.bump_business(business.id, directory=False)
         flash('Your response has been submitted.', 'success')
     else:
         flash('You are not authorized to respond to this review.', 'error')
 
+def business_hours_from_form(form):
+    """The stored 'Monday: 6:0 - 18:0, Tuesday: Closed, ...' string for a business form's hour fields."""
+    def format_hours(day_open, day_close):
+        if day_open.closed.data == 'Closed' or day_close.closed.data == 'Closed':
+            return 'Closed'
+        return f"{day_open.hour.data}:{day_open.minute.data} - {day_close.hour.data}:{day_close.minute.data}"
+
+    return ', '.join(
+        f"{day}: {format_hours(form[f'{day.lower()}_hours_open'], form[f'{day.lower()}_hours_close'])}"
+        for day in DAYS
+    )
+
 def get_vote_forms(reviews):
     return {review.id: VoteForm() for review in reviews}
 
-def perform_search(form):
+def build_search_query(form):
+    """Translate a SearchBusinessForm into a Business query and its ordering."""
     query = Business.query
+    rank = None
 
     if form.search_business_name.data:
-        query = query.filter(Business.business_name.ilike(f"%{form.search_business_name.data}%"))
+        query, rank = match_text(query, form.search_business_name.data)
 
     if form.search_business_category.data and form.search_business_category.data != '':
         query = query.filter(Business.business_category == form.search_business_category.data)
 
     if form.search_business_city.data:
-        query = query.filter(Business.business_city.ilike(f"%{form.search_business_city.data}%"))
+        query = match_city(query, form.search_business_city.data)
 
     if form.business_state.data:
         query = query.filter(Business.business_state == form.business_state.data)
@@ -64,17 +133,93 @@ def perform_search(form):
     if form.business_zip.data:
         query = query.filter(Business.business_zip == form.business_zip.data)
 
-    if form.min_rating.data:
-        min_rating = int(form.min_rating.data)
-        results = [business for business in query.all() if business.average_rating() >= min_rating]
-    else:
-        results = query.all()
+    distance = None
+    if form.near_zip.data:
+        query, distance = within_radius(query, zip_centroid(form.near_zip.data), int(form.within_miles.data or 25))
 
-    if form.sort_by.data == 'highest':
-        results = sorted(results, key=lambda b: b.average_rating(), reverse=True)
+    if form.min_rating.data:
+        query = query.filter(Business.rating_average >= int(form.min_rating.data))
+
+    if form.open_at.data == 'now':
+        query = query.filter(open_now_condition())
+    elif form.open_at.data == 'at' and form.open_day.data:
+        day = [value for value, _ in DAYS_OF_WEEK_CHOICES].index(form.open_day.data)
+        minute = day * MINUTES_PER_DAY + int(form.open_hour.data or 0) * 60 + int(form.open_minute.data or 0)
+        query = query.filter(open_at_condition(minute))
+
+    if form.sort_by.data == 'distance' and distance is not None:
+        ordering = [distance.asc(), Business.id.asc()]
+    elif form.sort_by.data == 'highest':
+        ordering = [Business.rating_average.desc(), Business.id.desc()]
     elif form.sort_by.data == 'lowest':
-        results = sorted(results, key=lambda b: b.average_rating())
+        ordering = [Business.rating_average.asc(), Business.id.asc()]
     elif form.sort_by.data == 'most_reviews':
-        results = sorted(results, key=lambda b: len(b.reviews), reverse=True)
-
-    return results
+        ordering = [Business.review_count.desc(), Business.id.desc()]
+    elif rank is not None:
+        ordering = [rank.desc(), Business.id.desc()]
+    else:
+        ordering = [Business.review_count.desc(), Business.id.desc()]
+
+    return query, ordering
+
+def within_radius(query, origin, miles):
+    """Keep businesses within miles of origin; returns the query and the SQL distance expression.
+
+    The bounding box lets ix_businesses_location narrow the rows before the
+    exact haversine distance is computed for the ones left.
+    """
+    distance = distance_expression(Business.latitude, Business.longitude, origin)
+    min_lat, max_lat, min_lon, max_lon = bounding_box(origin, miles)
+    query = query.filter(Business.latitude.between(min_lat, max_lat),
+                         longitude_condition(Business.longitude, min_lon, max_lon),
+                         distance <= miles)
+    return query, distance
+
+def open_at_condition(minute):
+    """Businesses open at a minute of the week in their own local time."""
+    open_ids = db.session.query(OpeningHours.business_id).filter(
+        OpeningHours.start_minute <= minute, OpeningHours.end_minute > minute)
+    return Business.id.in_(open_ids)
+
+def open_now_condition(now=None):
+    """Businesses open at this moment, checking each time zone against its own local minute."""
+    offsets = sorted({utc_offset_minutes(zone) for zone, _ in TIME_ZONE_CHOICES})
+    windows = []
+    for offset in offsets:
+        minute = local_week_minute(offset, now)
+        windows.append(and_(OpeningHours.utc_offset == offset,
+                            OpeningHours.start_minute <= minute, OpeningHours.end_minute > minute))
+    return Business.id.in_(db.session.query(OpeningHours.business_id).filter(or_(*windows)))
+
+def perform_search(form, cursor=None, per_page=25):
+    query, ordering = build_search_query(form)
+    if form.open_at.data != 'now':  # "open now" results change with the clock
+        keys = search_cache.keys(canonical_search_args(form), sort_keys(query, ordering))
+        if keys is not None:
+            return paginate_keys(query, ordering, keys, cursor, per_page)
+    return paginate(query, ordering, cursor, per_page)
+
+def canonical_search_args(form):
+    """search_args normalized further, so searches for the same results in the same order share a key."""
+    args = search_args(form)
+    for name in ('search_business_name', 'search_business_city'):
+        if name in args:
+            args[name] = ' '.join(args[name].split()).lower()  # both are matched case-insensitively
+    if args.get('sort_by') == 'relevance':
+        del args['sort_by']
+    return args
+
+def search_args(form, cursor=None):
+    """Query-string arguments for a search, so equal searches share one URL."""
+    args = {field.name: field.data.strip() if isinstance(field.data, str) else field.data
+            for field in form if field.name not in ('csrf_token', 'cursor')}
+    args = {name: value for name, value in args.items() if value not in (None, '')}
+    if not args.get('near_zip'):
+        args.pop('within_miles', None)
+    if args.get('open_at') != 'at':
+        # The day and time pickers always submit a value; they only matter for "open at"
+        for name in ('open_day', 'open_hour', 'open_minute'):
+            args.pop(name, None)
+    if cursor:
+        args['cursor'] = cursor
+    return args
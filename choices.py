@@ -76,3 +76,4 @@ DAYS_OF_WEEK_CHOICES = [
 HOUR_CHOICES = [(str(h), f'{h%12 if h != 12 and h != 0 else 12} {"AM" if h < 12 else "PM"}') for h in range(24)]
 MINUTE_CHOICES = [(str(m), f'{m:02d}') for m in range(0, 60, 15)] 
 
+DISTANCE_CHOICES = [(str(miles), f'{miles} miles') for miles in (5, 10, 25, 50, 100)]
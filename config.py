@@ -0,0 +1,69 @@
+"""Configurations for create_app.
+
+``Config`` is what the site runs with. ``TestConfig`` and ``BenchConfig``
+point at their own databases and turn off what would get in the way of the
+test suite and the benchmarks (CSRF, and the page and search caches for
+benchmarks).
+"""
+import os
+
+# Every US ZIP code's centroid, shipped with the app (see zip_centroids.LICENSE.txt for the source)
+BUNDLED_ZIP_CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zip_centroids.csv')
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = 'postgresql:///validvouch'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = "Sharapova1"
+    PAGE_SIZE = 25
+    DASHBOARD_TREND_DAYS = 14
+    MODERATION_BATCH_SIZE = 25
+    MODERATION_LEASE_SECONDS = 900
+    REVIEW_VOTE_COUNTERS = False
+    # 'memory' is per process: with several workers a write retires cached pages only in the worker that
+    # handled it, and the others serve theirs until PAGE_CACHE_TIMEOUT. Use 'filesystem' or 'redis' to share.
+    PAGE_CACHE_BACKEND = 'memory'
+    PAGE_CACHE_TIMEOUT = 300
+    BCRYPT_LOG_ROUNDS = 12
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE_LIMIT = 16
+    # Off unless shared: 'filesystem' or 'redis', never 'memory' (see user_cache.py)
+    USER_CACHE_BACKEND = None
+    USER_CACHE_TIMEOUT = 300
+    FAVORITES_CACHE_BACKEND = 'memory'
+    FAVORITES_CACHE_TIMEOUT = 300
+    SEARCH_CACHE_BACKEND = 'memory'
+    SEARCH_CACHE_TIMEOUT = 300
+    SEARCH_CACHE_MAX_ENTRIES = 512
+    SEARCH_CACHE_MAX_IDS = 1000
+    TYPEAHEAD_REFRESH_SECONDS = 300
+    TYPEAHEAD_MAX_LIMIT = 10
+    TYPEAHEAD_MAX_PREFIXES = 4096
+    SQL_METRICS_ENABLED = True
+    # ZIP centroid table used to geocode businesses and for "near me" search. The bundled table covers
+    # every US ZIP code; to use a newer one, e.g. the Census ZCTA gazetteer (2023_Gaz_zcta_national.txt from
+    # https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html), point
+    # VALIDVOUCH_ZIP_CENTROIDS at it, then run `flask geocode-businesses`.
+    ZIP_CENTROIDS_PATH = os.environ.get('VALIDVOUCH_ZIP_CENTROIDS', BUNDLED_ZIP_CENTROIDS_PATH)
+    # Reads of GET requests go to SQLALCHEMY_BINDS[REPLICA_BIND] when it is set, e.g.
+    # SQLALCHEMY_BINDS = {'replica': 'postgresql://replica-host/validvouch'}
+    REPLICA_BIND = 'replica'
+    REPLICA_MAX_LAG_SECONDS = 5
+    REPLICA_LAG_CHECK_SECONDS = 1
+    REPLICA_STICKY_SECONDS = 10
+    # The debug toolbar is for development only: opt in with VALIDVOUCH_DEBUG_TOOLBAR=1 (needs flask-debugtoolbar)
+    DEBUG_TOOLBAR = os.environ.get('VALIDVOUCH_DEBUG_TOOLBAR') == '1'
+    DEBUG_TB_INTERCEPT_REDIRECTS = False
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'postgresql:///test_db'
+    WTF_CSRF_ENABLED = False
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'postgresql:///bench_db'
+    WTF_CSRF_ENABLED = False
+    PAGE_CACHE_BACKEND = None  # measure the routes themselves, not cache hits
+    SEARCH_CACHE_BACKEND = None
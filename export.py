@@ -0,0 +1,109 @@
+"""Streaming NDJSON/CSV exports of the business directory and its reviews.
+
+Exports select plain columns (never ORM entities) through a server-side
+cursor and are written out as they are read, so memory stays flat however
+many rows there are. The filters are the search form's, applied by
+``build_search_query``; review exports cover the reviews of the matching
+businesses.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import func
+from models import db, Business, Review, Interaction
+from business_helpers import build_search_query, search_args
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 1000
+
+BUSINESS_COLUMNS = [
+    Business.id, Business.business_name, Business.business_category, Business.business_address,
+    Business.business_city, Business.business_state, Business.business_zip, Business.business_phone,
+    Business.business_website, Business.business_hours, Business.time_zone, Business.review_count,
+    Business.rating_average.label('rating_average'), Business.created_at,
+]
+
+
+def vote_columns():
+    """Up/down vote counts as columns of the review query itself."""
+    if current_app.config.get('REVIEW_VOTE_COUNTERS'):
+        return [Review.up_count.label('up_votes'), Review.down_count.label('down_votes')]
+
+    def votes(vote_type):
+        return db.session.query(func.count(Interaction.id)) \
+                         .filter(Interaction.review_id == Review.id, Interaction.interaction_type == vote_type) \
+                         .scalar_subquery()
+    return [votes('up').label('up_votes'), votes('down').label('down_votes')]
+
+
+def business_query(form):
+    """Matching businesses in search order."""
+    query, ordering = build_search_query(form)
+    return query.with_entities(*BUSINESS_COLUMNS).order_by(*ordering)
+
+
+def review_query(form, business_id=None):
+    """Visible reviews of the matching businesses (or of one business), with their vote counts."""
+    query = db.session.query(
+        Review.id, Review.business_id, Business.business_name.label('business_name'), Review.user_id,
+        Review.rating, Review.content, Review.created_at, Review.response, Review.response_at, *vote_columns()
+    ).join(Business, Review.business_id == Business.id).filter(Review.is_visible == True)
+
+    if business_id is not None:
+        query = query.filter(Review.business_id == business_id)
+    filters = search_args(form)
+    filters.pop('sort_by', None)
+    if filters:
+        businesses, _ = build_search_query(form)
+        query = query.filter(Review.business_id.in_(businesses.with_entities(Business.id)))
+    return query.order_by(Review.business_id, Review.created_at, Review.id)
+
+
+def stream_rows(query):
+    """Iterate a query's rows through a server-side cursor, YIELD_PER at a time."""
+    return query.execution_options(stream_results=True).yield_per(YIELD_PER)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps({key: _json_value(value) for key, value in row._mapping.items()}) + '\n'
+
+
+def _csv_lines(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_json_value(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate(query, fmt):
+    """Yield the export of a query as text chunks of roughly CHUNK_SIZE characters."""
+    rows = stream_rows(query)
+    if fmt == 'csv':
+        lines = _csv_lines(rows, [column['name'] for column in query.column_descriptions])
+    else:
+        lines = _ndjson_lines(rows)
+
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
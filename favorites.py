@@ -0,0 +1,83 @@
+"""Per-user set of favorited business ids.
+
+Pages that show a "liked" state for many businesses at once (search results,
+the details page) check membership in this set instead of querying per
+business. The set is loaded with one query, kept for the rest of the request
+and, in the shared tier, until the TTL runs out or the user likes or unlikes
+a business.
+"""
+from flask import g
+from models import db, Interaction
+from page_cache import create_backend
+
+
+class FavoritesCache:
+    """Flask extension with a per-request tier, an optional shared tier and hit counters."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = 300
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FAVORITES_CACHE_BACKEND', 'memory')
+        app.config.setdefault('FAVORITES_CACHE_TIMEOUT', 300)
+        self.backend = create_backend(app.config['FAVORITES_CACHE_BACKEND'], app, 'favorites')
+        self.timeout = app.config['FAVORITES_CACHE_TIMEOUT']
+        app.teardown_request(self._end_request)
+        app.extensions['favorites_cache'] = self
+
+    @staticmethod
+    def _end_request(exception=None):
+        g.pop('_favorite_ids', None)
+
+    @staticmethod
+    def _key(user_id):
+        return f'favorites:{user_id}'
+
+    def ids(self, user_id):
+        """The ids of the businesses a user has favorited, as a frozenset; empty for anonymous users."""
+        if not user_id:
+            return frozenset()
+        loaded = g.setdefault('_favorite_ids', {})
+        if user_id in loaded:
+            return loaded[user_id]
+
+        cached = self.backend.get(self._key(user_id)) if self.backend else None
+        if cached is not None:
+            self.hits += 1
+            ids = frozenset(cached)
+        else:
+            self.misses += 1
+            ids = frozenset(business_id for business_id, in db.session.query(Interaction.business_id).filter(
+                Interaction.user_id == user_id, Interaction.interaction_type == 'favorite'))
+            if self.backend is not None:
+                self.backend.set(self._key(user_id), sorted(ids), self.timeout)
+        loaded[user_id] = ids
+        return ids
+
+    def invalidate(self, user_id):
+        """Forget a user's set after they like or unlike a business."""
+        g.get('_favorite_ids', {}).pop(user_id, None)
+        if self.backend is not None:
+            self.backend.delete(self._key(user_id))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+favorites_cache = FavoritesCache()
@@ -1,7 +1,9 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SubmitField, TextAreaField, FormField, DateField, EmailField, PasswordField, HiddenField, RadioField, BooleanField, IntegerField
-from wtforms.validators import DataRequired, Length, URL, Optional, EqualTo, Email
-from choices import STATE_CHOICES, BUSINESS_CATEGORIES, TIME_ZONE_CHOICES, HOUR_CHOICES, MINUTE_CHOICES
+from wtforms.validators import DataRequired, Length, URL, Optional, EqualTo, Email, ValidationError
+from choices import STATE_CHOICES, BUSINESS_CATEGORIES, TIME_ZONE_CHOICES, HOUR_CHOICES, MINUTE_CHOICES, DAYS_OF_WEEK_CHOICES, DISTANCE_CHOICES
+import geo
+from geo import zip_centroid
 
 class RegisterUserForm(FlaskForm):
     first_name = StringField('First Name', validators=[DataRequired(), Length(max=20)])
@@ -99,13 +101,27 @@ class SearchBusinessForm(FlaskForm):
     search_business_city = StringField('City', validators=[Optional()])
     business_state = SelectField('State', choices=STATE_CHOICES, validators=[Optional()])
     business_zip = StringField('ZIP Code', validators=[Optional()])
+    near_zip = StringField('Near ZIP Code', validators=[Optional(), Length(min=5, max=5)])
+    within_miles = SelectField('Within', choices=DISTANCE_CHOICES, default='25', validators=[Optional()])
     min_rating = SelectField('Minimum Rating', choices=[('', 'Any')] + [(str(i), f'{i} Stars') for i in range(1, 6)], validators=[Optional()])
     sort_by = SelectField('Sort By', choices=[
         ('relevance', 'Relevance'),
         ('highest', 'Highest Reviews'),
         ('lowest', 'Lowest Reviews'),
-        ('most_reviews', 'Most Reviews')
+        ('most_reviews', 'Most Reviews'),
+        ('distance', 'Nearest')
     ], validators=[Optional()])
+    open_at = SelectField('Open', choices=[('', 'Any time'), ('now', 'Open now'), ('at', 'Open at')], validators=[Optional()])
+    open_day = SelectField('Open on', choices=DAYS_OF_WEEK_CHOICES, validators=[Optional()])
+    open_hour = SelectField('Open at hour', choices=HOUR_CHOICES, validators=[Optional()])
+    open_minute = SelectField('Open at minute', choices=MINUTE_CHOICES, validators=[Optional()])
+    cursor = HiddenField('Cursor', validators=[Optional()])
+
+    def validate_near_zip(self, field):
+        if not geo.available():
+            field.data = ''  # near-ZIP search is off: search everywhere instead
+        if field.data and zip_centroid(field.data) is None:
+            raise ValidationError('Unknown ZIP code.')
         
 class LeaveReviewForm(FlaskForm):
     content = TextAreaField('Review', validators=[DataRequired()])
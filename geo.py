@@ -0,0 +1,110 @@
+"""Offline geocoding of US ZIP codes and the distance math for "near me" search.
+
+Businesses are placed at the centroid of their ZIP code, looked up in a
+local table when they are written, so no request ever calls a geocoding
+service. The bundled zip_centroids.csv covers every US ZIP code (42,724 of
+them, from the MIT-licensed ``zipcodes`` package's 2021 data; see
+zip_centroids.LICENSE.txt). ``ZIP_CENTROIDS_PATH`` can name a newer table
+instead: the Census Bureau's ZCTA gazetteer file (tab separated,
+``GEOID``/``INTPTLAT``/``INTPTLONG``) or a CSV with ``zip,latitude,longitude``
+columns. If the table cannot be read the app still serves: it logs one
+warning, turns off near-ZIP search and stores businesses without coordinates.
+
+A radius search first keeps the rows inside the circle's bounding box, which
+the B-tree index on (latitude, longitude) can range-scan, and then compares
+the exact great-circle distance computed in SQL.
+"""
+import csv
+import logging
+import math
+from functools import lru_cache
+from flask import current_app
+from geopy import units
+from geopy.distance import EARTH_RADIUS, great_circle
+from sqlalchemy import func
+from config import BUNDLED_ZIP_CENTROIDS_PATH
+
+EARTH_RADIUS_MILES = units.miles(kilometers=EARTH_RADIUS)
+
+logger = logging.getLogger('validvouch.geo')
+
+
+@lru_cache(maxsize=4)
+def load_centroids(path):
+    """Map each ZIP code in a centroid table to its (latitude, longitude)."""
+    with open(path, newline='') as source:
+        dialect = 'excel-tab' if '\t' in source.readline() else 'excel'
+        source.seek(0)
+        reader = csv.reader(source, dialect)
+        header = [name.strip() for name in next(reader)]
+        if 'GEOID' in header:
+            columns = [header.index(name) for name in ('GEOID', 'INTPTLAT', 'INTPTLONG')]
+        else:
+            columns = [header.index(name) for name in ('zip', 'latitude', 'longitude')]
+        return {row[columns[0]].strip(): (float(row[columns[1]]), float(row[columns[2]]))
+                for row in reader if row}
+
+
+def centroids(app):
+    """The app's centroid table, or an empty one if it could not be read."""
+    if 'zip_centroids' not in app.extensions:
+        path = app.config.get('ZIP_CENTROIDS_PATH') or BUNDLED_ZIP_CENTROIDS_PATH
+        try:
+            app.extensions['zip_centroids'] = load_centroids(path)
+        except (OSError, ValueError, IndexError, StopIteration) as error:
+            logger.warning('Cannot read the ZIP centroid table %s (%s): near-ZIP search is off and '
+                           'businesses are stored without coordinates', path, error)
+            app.extensions['zip_centroids'] = {}
+    return app.extensions['zip_centroids']
+
+
+def init_app(app):
+    """Load the centroid table at startup rather than on the first request that needs it."""
+    app.extensions.pop('zip_centroids', None)
+    centroids(app)
+
+
+def available():
+    """Whether the current app has a centroid table to search near ZIP codes with."""
+    return bool(centroids(current_app))
+
+
+def zip_centroid(zip_code):
+    """The (latitude, longitude) of a ZIP code, or None if it is not in the table."""
+    return centroids(current_app).get((zip_code or '').strip())
+
+
+def distance_miles(origin, destination):
+    """Great-circle distance in miles between two (latitude, longitude) points."""
+    return great_circle(origin, destination).miles
+
+
+def bounding_box(origin, miles):
+    """(min_lat, max_lat, min_lon, max_lon) of a box holding every point within miles of origin."""
+    latitude, longitude = origin
+    angle = miles / EARTH_RADIUS_MILES
+    min_lat, max_lat = latitude - math.degrees(angle), latitude + math.degrees(angle)
+    if min_lat <= -90 or max_lat >= 90 or angle >= math.pi / 2:
+        # The circle reaches a pole: every longitude is in range
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+    spread = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    return min_lat, max_lat, longitude - spread, longitude + spread
+
+
+def longitude_condition(column, min_lon, max_lon):
+    """Longitude range test that also handles a box crossing the antimeridian."""
+    if min_lon < -180:
+        return (column >= min_lon + 360) | (column <= max_lon)
+    if max_lon > 180:
+        return (column >= min_lon) | (column <= max_lon - 360)
+    return column.between(min_lon, max_lon)
+
+
+def distance_expression(latitude, longitude, origin):
+    """SQL haversine distance in miles from origin to the point in two columns."""
+    lat0, lon0 = (math.radians(value) for value in origin)
+    half_dlat = (func.radians(latitude) - lat0) / 2
+    half_dlon = (func.radians(longitude) - lon0) / 2
+    chord = func.power(func.sin(half_dlat), 2) \
+        + math.cos(lat0) * func.cos(func.radians(latitude)) * func.power(func.sin(half_dlon), 2)
+    return 2 * EARTH_RADIUS_MILES * func.asin(func.sqrt(chord))
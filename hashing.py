@@ -0,0 +1,78 @@
+"""Bounded bcrypt hashing.
+
+bcrypt is deliberately slow and releases the GIL while it works, so a burst
+of logins can keep every worker thread busy hashing. Hashing runs in a small
+thread pool sized to the CPU budget, and a semaphore caps how many requests
+may wait for it. Once that cap is reached, new requests fail fast with a
+503 instead of queueing behind seconds of work.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from flask_bcrypt import Bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+
+class HashingBusy(ServiceUnavailable):
+    """Raised when the hashing queue is full. Flask renders it as a 503."""
+
+    description = 'The server is handling too many sign-ins right now. Please try again shortly.'
+
+
+class PasswordHasher:
+    """Flask extension that runs bcrypt on a bounded executor."""
+
+    def __init__(self, app=None):
+        self.bcrypt = Bcrypt()
+        self.executor = None
+        self.slots = None
+        self.retry_after = 1
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_LIMIT', 16)
+        app.config.setdefault('PASSWORD_HASH_RETRY_AFTER', 1)
+
+        self.bcrypt.init_app(app)
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)  # the previous app's pool; running hashes still finish
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE_LIMIT'])
+        self.retry_after = app.config['PASSWORD_HASH_RETRY_AFTER']
+        app.extensions['password_hasher'] = self
+
+    @property
+    def rounds(self):
+        return current_app.config['BCRYPT_LOG_ROUNDS']
+
+    def _run(self, function, *args):
+        if self.executor is None:
+            return function(*args)
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy(retry_after=self.retry_after)
+        try:
+            return self.executor.submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        """Hash a password at the configured cost."""
+        return self._run(self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        """Return True if the password matches the hash."""
+        return self._run(self.bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """True if a hash was made with a different cost than the configured one."""
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+
+password_hasher = PasswordHasher()
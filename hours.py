@@ -0,0 +1,76 @@
+"""Parsing of business hours into minute-of-week ranges.
+
+Hours are entered as ``"Monday: 6:0 - 18:0, Tuesday: Closed, ..."`` in the
+business's local time. For searching they are stored as half-open
+``[start_minute, end_minute)`` ranges counted from Monday 00:00, so "open at"
+becomes a plain range comparison that an index can serve. A range that runs
+past midnight on Sunday is split in two.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+_TIME_ZONE_RE = re.compile(r'^UTC([+-])(\d{1,2}):(\d{2})$')
+
+
+def utc_offset_minutes(time_zone):
+    """Minutes east of UTC for a 'UTC+05:30' style zone, 0 if unrecognised."""
+    match = _TIME_ZONE_RE.match((time_zone or '').strip())
+    if not match:
+        return 0
+    sign, hours, minutes = match.groups()
+    offset = int(hours) * 60 + int(minutes)
+    return -offset if sign == '-' else offset
+
+
+@lru_cache(maxsize=1024)
+def parse_hours(hours_str):
+    """Return ((day_index, open_minute, close_minute), ...) for the open days.
+
+    A closing time at or before the opening time means the business closes
+    the next day. Malformed or closed entries are skipped.
+    """
+    days = []
+    for part in (hours_str or '').split(', '):
+        day, _, hours = part.partition(': ')
+        if day not in DAYS or hours == 'Closed':
+            continue
+        try:
+            start, end = hours.split(' - ')
+            start_hour, start_minute = map(int, start.split(':'))
+            end_hour, end_minute = map(int, end.split(':'))
+        except ValueError:
+            continue
+        days.append((DAYS.index(day), start_hour * 60 + start_minute, end_hour * 60 + end_minute))
+    return tuple(days)
+
+
+def week_ranges(hours_str):
+    """Local minute-of-week ranges for an hours string."""
+    ranges = []
+    for day, open_minute, close_minute in parse_hours(hours_str):
+        if close_minute <= open_minute:
+            close_minute += MINUTES_PER_DAY
+        start = day * MINUTES_PER_DAY + open_minute
+        end = day * MINUTES_PER_DAY + close_minute
+        if end > MINUTES_PER_WEEK:
+            ranges.append((start, MINUTES_PER_WEEK))
+            ranges.append((0, end - MINUTES_PER_WEEK))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def week_minute(moment):
+    """Minute of the week (Monday 00:00 is 0) of a datetime."""
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def local_week_minute(utc_offset, now=None):
+    """Current minute of the week in a zone the given minutes east of UTC."""
+    now = now or datetime.utcnow()
+    return (week_minute(now) + utc_offset) % MINUTES_PER_WEEK
@@ -0,0 +1,300 @@
+"""Bulk import of users, businesses and reviews from CSV or NDJSON.
+
+Records are read lazily and handled a batch at a time. Every record is
+validated with the form its web route uses, and duplicates are resolved
+against the file so far and the database with one lookup per unique key per
+batch. The survivors are written with one executemany INSERT per table, or
+with ``COPY`` on PostgreSQL. Derived data (rating totals and the dashboard
+counters) is rebuilt once at the end instead of per row.
+
+Columns are the form field names. Reviews and businesses name their user by
+email (``email`` and ``owner_email``) and reviews name their business by
+``business_name``. Opening hours are either ``monday`` ... ``sunday`` columns
+holding ``9:00 - 17:30`` or ``Closed``, or a ``business_hours`` column in the
+stored ``Monday: 9:0 - 17:30, Tuesday: Closed, ...`` format.
+"""
+import csv
+import io
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import func, tuple_
+from werkzeug.datastructures import MultiDict
+from forms import RegisterUserForm, RegisterBusinessForm, LeaveReviewForm
+from models import db, User, Business, Review, OpeningHours, SiteStat, DailyStat, normalize_email
+from business_helpers import business_hours_from_form
+from hours import DAYS, week_ranges, utc_offset_minutes
+from geo import zip_centroid
+from hashing import password_hasher
+from page_cache import page_cache
+
+KINDS = ('users', 'businesses', 'reviews')
+FORMATS = ('csv', 'ndjson')
+
+_DAY_HOURS_RE = re.compile(r'^(\d{1,2}):(\d{1,2})\s*-\s*(\d{1,2}):(\d{1,2})$')
+
+
+class ImportResult:
+    """Counts and per-record errors of an import."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []
+        self.business_ids = set()
+        self.seen = {}
+
+    def error(self, number, errors):
+        if isinstance(errors, dict):
+            errors = '; '.join(f'{field}: {messages}' for field, messages in errors.items())
+        self.errors.append((number, errors))
+
+    def is_new(self, key, value):
+        """True the first time a value of a unique key is seen in this import."""
+        seen = self.seen.setdefault(key, set())
+        if value in seen:
+            self.duplicates += 1
+            return False
+        seen.add(value)
+        return True
+
+
+def read_records(stream, fmt):
+    """Yield the records of a CSV or NDJSON stream as dicts of strings."""
+    if fmt == 'csv':
+        records = csv.DictReader(stream)
+    else:
+        records = (json.loads(line) for line in stream if line.strip())
+    for record in records:
+        yield {key: '' if value is None else str(value).strip() for key, value in record.items()}
+
+
+def validate(form_class, data):
+    """Return a validated form for the record, or its errors."""
+    form = form_class(MultiDict(data), meta={'csrf': False})
+    return form if form.validate() else form.errors
+
+
+def hours_fields(record):
+    """Form data for a business form's day hour fields, plus any unreadable days."""
+    days = {}
+    for part in filter(None, record.get('business_hours', '').split(',')):
+        day, _, hours = part.partition(':')
+        days[day.strip().lower()] = hours.strip()
+    for day in DAYS:
+        if record.get(day.lower()):
+            days[day.lower()] = record[day.lower()]
+
+    data, errors = {}, []
+    for day in DAYS:
+        prefix = day.lower()
+        hours = days.get(prefix, 'Closed')
+        match = _DAY_HOURS_RE.match(hours)
+        if match:
+            open_hour, open_minute, close_hour, close_minute = (str(int(group)) for group in match.groups())
+            status = 'Open'
+        else:
+            if hours.lower() != 'closed':
+                errors.append(f'{day}: {hours!r}')
+            open_hour = open_minute = close_hour = close_minute = '0'
+            status = 'Closed'
+        data.update({
+            f'{prefix}_hours_open-hour': open_hour, f'{prefix}_hours_open-minute': open_minute,
+            f'{prefix}_hours_open-closed': status,
+            f'{prefix}_hours_close-hour': close_hour, f'{prefix}_hours_close-minute': close_minute,
+            f'{prefix}_hours_close-closed': status,
+        })
+    return data, errors
+
+
+def users_by_email(emails):
+    """Map lower-cased emails to user ids in one query."""
+    if not emails:
+        return {}
+    return dict(db.session.query(func.lower(User.email), User.id).filter(func.lower(User.email).in_(emails)))
+
+
+def _copy_field(value):
+    """A COPY CSV field: every value quoted, so only an unquoted empty field loads as NULL."""
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def write_rows(table, rows, use_copy):
+    """Insert rows in one statement: COPY on PostgreSQL when allowed, else executemany."""
+    if not rows:
+        return
+    if use_copy and db.engine.dialect.name == 'postgresql':
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(','.join(_copy_field(row[column]) for column in columns) + '\n')
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        db.session.execute(table.insert(), rows)
+
+
+def hash_passwords(passwords, rounds=None):
+    """bcrypt a batch of passwords across every core; the import is not serving requests."""
+    bcrypt, rounds = password_hasher.bcrypt, rounds or password_hasher.rounds
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+        hashes = pool.map(lambda password: bcrypt.generate_password_hash(password, rounds), passwords)
+        return [pw_hash.decode('utf-8') for pw_hash in hashes]
+
+
+def import_users(batch, result, use_copy, rounds=None):
+    forms = []
+    for number, record in batch:
+        record.setdefault('confirm_password', record.get('password', ''))
+        form = validate(RegisterUserForm, record)
+        if isinstance(form, dict):
+            result.error(number, form)
+        elif result.is_new('email', form.email.data.lower()) and result.is_new('phone', form.phone_number.data):
+            forms.append(form)
+
+    emails = set(users_by_email({form.email.data.lower() for form in forms}))
+    phones = {phone for phone, in db.session.query(User.phone_number)
+              .filter(User.phone_number.in_({form.phone_number.data for form in forms}))}
+    new = [form for form in forms if form.email.data.lower() not in emails and form.phone_number.data not in phones]
+    result.duplicates += len(forms) - len(new)
+
+    hashes = hash_passwords([form.password.data for form in new], rounds)
+    write_rows(User.__table__, [
+        dict(first_name=form.first_name.data, last_name=form.last_name.data, dob=form.dob.data,
+             address=form.address.data, city=form.city.data, state=form.state.data, zip=form.zip.data,
+             phone_number=form.phone_number.data, email=normalize_email(form.email.data), password_hash=pw_hash, is_admin=False)
+        for form, pw_hash in zip(new, hashes)
+    ], use_copy)
+    result.inserted += len(new)
+
+
+def import_businesses(batch, result, use_copy, rounds=None):
+    valid = []
+    for number, record in batch:
+        hours, bad_days = hours_fields(record)
+        form = validate(RegisterBusinessForm, {**record, **hours})
+        if bad_days:
+            result.error(number, f"unreadable hours for {', '.join(bad_days)}")
+        elif isinstance(form, dict):
+            result.error(number, form)
+        elif result.is_new('business_name', form.business_name.data):
+            valid.append((number, record.get('owner_email', '').lower(), form))
+
+    owners = users_by_email({owner for _, owner, _ in valid})
+    names = {name for name, in db.session.query(Business.business_name)
+             .filter(Business.business_name.in_({form.business_name.data for _, _, form in valid}))}
+    phone_owners = dict(db.session.query(User.phone_number, User.id).filter(
+        User.phone_number.in_({form.business_phone.data for _, _, form in valid if form.business_phone.data})))
+
+    rows, now = [], datetime.utcnow()
+    for number, owner, form in valid:
+        if form.business_name.data in names:
+            result.duplicates += 1
+            continue
+        if owner not in owners:
+            result.error(number, f'owner_email: no user with email {owner!r}')
+            continue
+        if phone_owners.get(form.business_phone.data, owners[owner]) != owners[owner]:
+            result.error(number, 'business_phone: already associated with another user')
+            continue
+        latitude, longitude = zip_centroid(form.business_zip.data) or (None, None)
+        rows.append(dict(
+            business_name=form.business_name.data, business_category=form.business_category.data,
+            business_address=form.business_address.data, business_city=form.business_city.data,
+            business_state=form.business_state.data, business_zip=form.business_zip.data,
+            business_description=form.business_description.data, business_phone=form.business_phone.data or None,
+            business_website=form.business_website.data or None, business_hours=business_hours_from_form(form),
+            time_zone=form.time_zone.data, created_at=now, user_id=owners[owner], review_count=0, rating_sum=0,
+            latitude=latitude, longitude=longitude
+        ))
+    write_rows(Business.__table__, rows, use_copy)
+    result.inserted += len(rows)
+
+    # The searchable opening hours of the new businesses, from one id lookup
+    if rows:
+        ids = dict(db.session.query(Business.business_name, Business.id)
+                   .filter(Business.business_name.in_([row['business_name'] for row in rows])))
+        write_rows(OpeningHours.__table__, [
+            dict(business_id=ids[row['business_name']], start_minute=start, end_minute=end,
+                 utc_offset=utc_offset_minutes(row['time_zone']))
+            for row in rows for start, end in week_ranges(row['business_hours'])
+        ], use_copy)
+
+
+def import_reviews(batch, result, use_copy, rounds=None):
+    valid = []
+    for number, record in batch:
+        form = validate(LeaveReviewForm, {'proof_of_purchase': 'y', **record})
+        if isinstance(form, dict):
+            result.error(number, form)
+            continue
+        try:
+            created_at = datetime.fromisoformat(record['created_at']) if record.get('created_at') else None
+        except ValueError:
+            result.error(number, f"created_at: not an ISO date {record['created_at']!r}")
+            continue
+        valid.append((number, record.get('email', '').lower(), record.get('business_name', ''), created_at, form))
+
+    users = users_by_email({email for _, email, _, _, _ in valid})
+    businesses = {name: (business_id, owner_id) for name, business_id, owner_id in db.session.query(
+        Business.business_name, Business.id, Business.user_id
+    ).filter(Business.business_name.in_({name for _, _, name, _, _ in valid}))}
+
+    resolved = []
+    for number, email, name, created_at, form in valid:
+        if email not in users:
+            result.error(number, f'email: no user with email {email!r}')
+        elif name not in businesses:
+            result.error(number, f'business_name: no business named {name!r}')
+        elif businesses[name][1] == users[email]:
+            result.error(number, 'email: owners cannot review their own business')
+        elif result.is_new('review', (users[email], businesses[name][0])):
+            resolved.append((users[email], businesses[name][0], created_at, form))
+
+    pairs = [(user_id, business_id) for user_id, business_id, _, _ in resolved]
+    existing = set(db.session.query(Review.user_id, Review.business_id)
+                   .filter(tuple_(Review.user_id, Review.business_id).in_(pairs))) if pairs else set()
+
+    rows, now = [], datetime.utcnow()
+    for user_id, business_id, created_at, form in resolved:
+        if (user_id, business_id) in existing:
+            result.duplicates += 1
+            continue
+        rows.append(dict(content=form.content.data, rating=form.rating.data, created_at=created_at or now,
+                         is_visible=True, up_count=0, down_count=0, user_id=user_id, business_id=business_id))
+        result.business_ids.add(business_id)
+    write_rows(Review.__table__, rows, use_copy)
+    result.inserted += len(rows)
+
+
+IMPORTERS = {'users': import_users, 'businesses': import_businesses, 'reviews': import_reviews}
+
+
+def import_records(kind, records, batch_size=1000, use_copy=True, rounds=None):
+    """Import an iterable of records of one kind, committing once per batch."""
+    result = ImportResult()
+    numbered = enumerate(records, 1)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            break
+        IMPORTERS[kind](batch, result, use_copy, rounds)
+        db.session.commit()
+
+    if result.business_ids:
+        Business.refresh_rating_totals(sorted(result.business_ids))
+    SiteStat.reconcile()
+    DailyStat.reconcile()
+    db.session.commit()
+    for business_id in sorted(result.business_ids):
+        page_cache.bump_business(business_id, directory=False)
+    page_cache.bump('directory')
+    return result
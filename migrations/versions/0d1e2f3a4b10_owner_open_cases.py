@@ -0,0 +1,36 @@
+"""owner open cases
+
+Revision ID: 0d1e2f3a4b10
+Revises: 9c0d1e2f3a09
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d1e2f3a4b10'
+down_revision = '9c0d1e2f3a09'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('open_cases', sa.Integer(), server_default='0', nullable=False))
+
+    # Flags and appeals awaiting an admin, per owner of the flagged review's business
+    op.execute("""
+        UPDATE users SET open_cases = counts.open_cases
+        FROM (SELECT businesses.user_id, count(*) AS open_cases
+              FROM flagged_reviews
+              JOIN reviews ON reviews.id = flagged_reviews.review_id
+              JOIN businesses ON businesses.id = reviews.business_id
+              WHERE flagged_reviews.admin_decision = 'pending' OR flagged_reviews.appeal_decision = 'pending'
+              GROUP BY businesses.user_id) AS counts
+        WHERE users.id = counts.user_id
+    """)
+
+
+def downgrade():
+    op.drop_column('users', 'open_cases')
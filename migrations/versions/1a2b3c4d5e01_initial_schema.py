@@ -0,0 +1,107 @@
+"""initial schema
+
+Revision ID: 1a2b3c4d5e01
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+Databases created before migrations were introduced (via db.create_all())
+already match this revision and should be marked with
+``flask db stamp 1a2b3c4d5e01`` before running ``flask db upgrade``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a2b3c4d5e01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.String(length=20), nullable=False),
+        sa.Column('last_name', sa.String(length=20), nullable=False),
+        sa.Column('dob', sa.Date(), nullable=False),
+        sa.Column('address', sa.String(length=40), nullable=False),
+        sa.Column('city', sa.String(length=20), nullable=False),
+        sa.Column('state', sa.String(length=12), nullable=False),
+        sa.Column('zip', sa.String(length=5), nullable=False),
+        sa.Column('phone_number', sa.String(length=15), nullable=False),
+        sa.Column('email', sa.String(length=40), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('phone_number')
+    )
+    op.create_table('businesses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_name', sa.String(length=30), nullable=False),
+        sa.Column('business_category', sa.String(length=50), nullable=False),
+        sa.Column('business_address', sa.String(length=40), nullable=False),
+        sa.Column('business_city', sa.String(length=25), nullable=False),
+        sa.Column('business_state', sa.String(length=2), nullable=False),
+        sa.Column('business_zip', sa.String(length=5), nullable=False),
+        sa.Column('business_description', sa.Text(), nullable=False),
+        sa.Column('business_phone', sa.String(length=15), nullable=True),
+        sa.Column('business_website', sa.String(length=100), nullable=True),
+        sa.Column('business_hours', sa.String(length=300), nullable=False),
+        sa.Column('time_zone', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('business_name')
+    )
+    op.create_table('reviews',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('response_at', sa.DateTime(), nullable=True),
+        sa.Column('is_visible', sa.Boolean(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('interactions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=True),
+        sa.Column('review_id', sa.Integer(), nullable=True),
+        sa.Column('interaction_type', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ),
+        sa.ForeignKeyConstraint(['review_id'], ['reviews.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('flagged_reviews',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('review_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('flag_reason', sa.Text(), nullable=False),
+        sa.Column('flag_timestamp', sa.DateTime(), nullable=False),
+        sa.Column('admin_decision', sa.String(length=10), nullable=True),
+        sa.Column('admin_notes', sa.Text(), nullable=True),
+        sa.Column('appeal_reason', sa.Text(), nullable=True),
+        sa.Column('appeal_timestamp', sa.DateTime(), nullable=True),
+        sa.Column('appeal_decision', sa.String(length=10), nullable=True),
+        sa.ForeignKeyConstraint(['review_id'], ['reviews.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('flagged_reviews')
+    op.drop_table('interactions')
+    op.drop_table('reviews')
+    op.drop_table('businesses')
+    op.drop_table('users')
@@ -0,0 +1,29 @@
+"""business location
+
+Revision ID: 1e2f3a4b5c11
+Revises: 0d1e2f3a4b10
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1e2f3a4b5c11'
+down_revision = '0d1e2f3a4b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled in from the ZIP centroid table by `flask geocode-businesses`
+    op.add_column('businesses', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('businesses', sa.Column('longitude', sa.Float(), nullable=True))
+    op.create_index('ix_businesses_location', 'businesses', ['latitude', 'longitude'])
+
+
+def downgrade():
+    op.drop_index('ix_businesses_location', table_name='businesses')
+    op.drop_column('businesses', 'longitude')
+    op.drop_column('businesses', 'latitude')
@@ -0,0 +1,55 @@
+"""rating and vote totals
+
+Revision ID: 2b3c4d5e6f02
+Revises: 1a2b3c4d5e01
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b3c4d5e6f02'
+down_revision = '1a2b3c4d5e01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('businesses') as batch_op:
+        batch_op.add_column(sa.Column('review_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.add_column(sa.Column('up_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('down_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+        UPDATE businesses SET
+            review_count = (SELECT count(reviews.id) FROM reviews
+                            WHERE reviews.business_id = businesses.id AND reviews.is_visible),
+            rating_sum = (SELECT coalesce(sum(reviews.rating), 0) FROM reviews
+                          WHERE reviews.business_id = businesses.id AND reviews.is_visible)
+    """)
+    op.execute("""
+        UPDATE reviews SET
+            up_count = (SELECT count(interactions.id) FROM interactions
+                        WHERE interactions.review_id = reviews.id AND interactions.interaction_type = 'up'),
+            down_count = (SELECT count(interactions.id) FROM interactions
+                          WHERE interactions.review_id = reviews.id AND interactions.interaction_type = 'down')
+    """)
+
+    op.create_index('ix_businesses_rating_average', 'businesses',
+                    [sa.text('coalesce(rating_sum * 1.0 / nullif(review_count, 0), 0)')])
+    op.create_index('ix_businesses_review_count', 'businesses', ['review_count'])
+
+
+def downgrade():
+    op.drop_index('ix_businesses_review_count', table_name='businesses')
+    op.drop_index('ix_businesses_rating_average', table_name='businesses')
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.drop_column('down_count')
+        batch_op.drop_column('up_count')
+    with op.batch_alter_table('businesses') as batch_op:
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('review_count')
@@ -0,0 +1,38 @@
+"""unique lower-cased email
+
+Revision ID: 2f3a4b5c6d12
+Revises: 1e2f3a4b5c11
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f3a4b5c6d12'
+down_revision = '1e2f3a4b5c11'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    duplicates = connection.execute(sa.text(
+        "SELECT email FROM users WHERE lower(trim(email)) IN "
+        "(SELECT lower(trim(email)) FROM users GROUP BY lower(trim(email)) HAVING count(*) > 1) "
+        "ORDER BY lower(trim(email)), id"
+    )).scalars().all()
+    if duplicates:
+        # Which account keeps the address is for an admin to decide, not a migration
+        raise RuntimeError('These accounts share an email address up to case; change or merge them '
+                           'before upgrading: ' + ', '.join(duplicates))
+    op.execute("UPDATE users SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    # Emails stay lower-cased
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')])
@@ -0,0 +1,28 @@
+"""double precision rating average index
+
+Revision ID: 3a4b5c6d7e13
+Revises: 2f3a4b5c6d12
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a4b5c6d7e13'
+down_revision = '2f3a4b5c6d12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_businesses_rating_average', table_name='businesses')
+    op.create_index('ix_businesses_rating_average', 'businesses',
+                    [sa.text('coalesce(CAST(rating_sum AS FLOAT) / nullif(review_count, 0), 0)')])
+
+
+def downgrade():
+    op.drop_index('ix_businesses_rating_average', table_name='businesses')
+    op.create_index('ix_businesses_rating_average', 'businesses',
+                    [sa.text('coalesce(rating_sum * 1.0 / nullif(review_count, 0), 0)')])
@@ -0,0 +1,79 @@
+"""business full-text search
+
+Revision ID: 3c4d5e6f7a03
+Revises: 2b3c4d5e6f02
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c4d5e6f7a03'
+down_revision = '2b3c4d5e6f02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("""
+            ALTER TABLE businesses ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(business_name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(business_category, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(business_city, '')), 'C') ||
+                setweight(to_tsvector('english', coalesce(business_description, '')), 'D')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX ix_businesses_search_vector ON businesses USING GIN (search_vector)")
+        op.execute("CREATE INDEX ix_businesses_city_prefix ON businesses (lower(business_city) text_pattern_ops)")
+        has_trigram = bind.execute(
+            sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        ).first() is not None
+        if has_trigram:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            op.execute("CREATE INDEX ix_businesses_name_trgm ON businesses USING GIN (business_name gin_trgm_ops)")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE businesses_fts USING fts5(
+                business_name, business_category, business_city, business_description,
+                content='businesses', content_rowid='id'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER businesses_fts_insert AFTER INSERT ON businesses BEGIN
+                INSERT INTO businesses_fts(rowid, business_name, business_category, business_city, business_description)
+                VALUES (new.id, new.business_name, new.business_category, new.business_city, new.business_description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER businesses_fts_delete AFTER DELETE ON businesses BEGIN
+                INSERT INTO businesses_fts(businesses_fts, rowid, business_name, business_category, business_city, business_description)
+                VALUES ('delete', old.id, old.business_name, old.business_category, old.business_city, old.business_description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER businesses_fts_update AFTER UPDATE ON businesses BEGIN
+                INSERT INTO businesses_fts(businesses_fts, rowid, business_name, business_category, business_city, business_description)
+                VALUES ('delete', old.id, old.business_name, old.business_category, old.business_city, old.business_description);
+                INSERT INTO businesses_fts(rowid, business_name, business_category, business_city, business_description)
+                VALUES (new.id, new.business_name, new.business_category, new.business_city, new.business_description);
+            END
+        """)
+        op.execute("INSERT INTO businesses_fts(businesses_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_businesses_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_businesses_city_prefix")
+        op.execute("DROP INDEX IF EXISTS ix_businesses_search_vector")
+        op.execute("ALTER TABLE businesses DROP COLUMN IF EXISTS search_vector")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS businesses_fts_insert")
+        op.execute("DROP TRIGGER IF EXISTS businesses_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS businesses_fts_update")
+        op.execute("DROP TABLE IF EXISTS businesses_fts")
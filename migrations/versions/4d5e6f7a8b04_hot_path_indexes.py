@@ -0,0 +1,48 @@
+"""hot path indexes
+
+Revision ID: 4d5e6f7a8b04
+Revises: 3c4d5e6f7a03
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d5e6f7a8b04'
+down_revision = '3c4d5e6f7a03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')])
+    op.create_index('ix_businesses_user_id', 'businesses', ['user_id'])
+    op.create_index('ix_reviews_business_visible_created', 'reviews', ['business_id', 'is_visible', 'created_at'])
+    op.create_index('ix_reviews_user_business', 'reviews', ['user_id', 'business_id'])
+    op.create_index('ix_interactions_user_business_type', 'interactions', ['user_id', 'business_id', 'interaction_type'])
+    op.create_index('ix_interactions_review_type', 'interactions', ['review_id', 'interaction_type'])
+    op.create_index('ix_flagged_reviews_review_id', 'flagged_reviews', ['review_id'])
+    op.create_index('ix_flagged_reviews_user_id', 'flagged_reviews', ['user_id'])
+    op.create_index('ix_flagged_reviews_admin_decision', 'flagged_reviews', ['admin_decision', 'flag_timestamp'])
+    op.create_index('ix_flagged_reviews_pending', 'flagged_reviews', ['flag_timestamp', 'id'],
+                    postgresql_where=sa.text("admin_decision = 'pending'"),
+                    sqlite_where=sa.text("admin_decision = 'pending'"))
+    op.create_index('ix_flagged_reviews_appeal_pending', 'flagged_reviews', ['appeal_timestamp', 'id'],
+                    postgresql_where=sa.text("appeal_decision = 'pending'"),
+                    sqlite_where=sa.text("appeal_decision = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_flagged_reviews_appeal_pending', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_pending', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_admin_decision', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_user_id', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_review_id', table_name='flagged_reviews')
+    op.drop_index('ix_interactions_review_type', table_name='interactions')
+    op.drop_index('ix_interactions_user_business_type', table_name='interactions')
+    op.drop_index('ix_reviews_user_business', table_name='reviews')
+    op.drop_index('ix_reviews_business_visible_created', table_name='reviews')
+    op.drop_index('ix_businesses_user_id', table_name='businesses')
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,55 @@
+"""opening hours
+
+Revision ID: 5e6f7a8b9c05
+Revises: 4d5e6f7a8b04
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from hours import week_ranges, utc_offset_minutes
+
+
+# revision identifiers, used by Alembic.
+revision = '5e6f7a8b9c05'
+down_revision = '4d5e6f7a8b04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    opening_hours = op.create_table(
+        'opening_hours',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('business_id', sa.Integer(), nullable=False),
+        sa.Column('start_minute', sa.Integer(), nullable=False),
+        sa.Column('end_minute', sa.Integer(), nullable=False),
+        sa.Column('utc_offset', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Parse the existing free-text hours into ranges
+    connection = op.get_bind()
+    businesses = connection.execute(sa.text('SELECT id, business_hours, time_zone FROM businesses'))
+    rows = [
+        {'business_id': business_id, 'start_minute': start, 'end_minute': end,
+         'utc_offset': utc_offset_minutes(time_zone)}
+        for business_id, hours_str, time_zone in businesses
+        for start, end in week_ranges(hours_str)
+    ]
+    if rows:
+        op.bulk_insert(opening_hours, rows)
+
+    op.create_index('ix_opening_hours_business_id', 'opening_hours', ['business_id'])
+    op.create_index('ix_opening_hours_window', 'opening_hours', ['start_minute', 'end_minute', 'business_id'])
+    op.create_index('ix_opening_hours_offset_window', 'opening_hours',
+                    ['utc_offset', 'start_minute', 'end_minute', 'business_id'])
+
+
+def downgrade():
+    op.drop_index('ix_opening_hours_offset_window', table_name='opening_hours')
+    op.drop_index('ix_opening_hours_window', table_name='opening_hours')
+    op.drop_index('ix_opening_hours_business_id', table_name='opening_hours')
+    op.drop_table('opening_hours')
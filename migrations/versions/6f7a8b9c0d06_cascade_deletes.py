@@ -0,0 +1,42 @@
+"""cascade deletes
+
+Revision ID: 6f7a8b9c0d06
+Revises: 5e6f7a8b9c05
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6f7a8b9c0d06'
+down_revision = '5e6f7a8b9c05'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table) for every foreign key that should cascade
+FOREIGN_KEYS = [
+    ('businesses', 'user_id', 'users'),
+    ('reviews', 'user_id', 'users'),
+    ('reviews', 'business_id', 'businesses'),
+    ('interactions', 'user_id', 'users'),
+    ('interactions', 'business_id', 'businesses'),
+    ('interactions', 'review_id', 'reviews'),
+    ('flagged_reviews', 'review_id', 'reviews'),
+    ('flagged_reviews', 'user_id', 'users'),
+]
+
+
+def _recreate_foreign_keys(ondelete):
+    for table, column, referred in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _recreate_foreign_keys(None)
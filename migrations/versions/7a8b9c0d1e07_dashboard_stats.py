@@ -0,0 +1,56 @@
+"""dashboard stats
+
+Revision ID: 7a8b9c0d1e07
+Revises: 6f7a8b9c0d06
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a8b9c0d1e07'
+down_revision = '6f7a8b9c0d06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'site_stats',
+        sa.Column('name', sa.String(length=30), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table(
+        'daily_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('name', sa.String(length=30), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'name')
+    )
+
+    # Seed the counters and the full history of daily rollups
+    op.execute("""
+        INSERT INTO site_stats (name, value)
+        SELECT 'users', count(*) FROM users
+        UNION ALL SELECT 'businesses', count(*) FROM businesses
+        UNION ALL SELECT 'reviews', count(*) FROM reviews
+        UNION ALL SELECT 'pending_flags', count(*) FROM flagged_reviews WHERE admin_decision = 'pending'
+        UNION ALL SELECT 'pending_appeals', count(*) FROM flagged_reviews WHERE appeal_decision = 'pending'
+    """)
+    op.execute("""
+        INSERT INTO daily_stats (day, name, value)
+        SELECT date(created_at), 'reviews', count(*) FROM reviews GROUP BY date(created_at)
+        UNION ALL
+        SELECT date(created_at), 'votes', count(*) FROM interactions
+        WHERE interaction_type IN ('up', 'down') AND created_at IS NOT NULL GROUP BY date(created_at)
+        UNION ALL
+        SELECT date(flag_timestamp), 'flags', count(*) FROM flagged_reviews GROUP BY date(flag_timestamp)
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_stats')
+    op.drop_table('site_stats')
@@ -0,0 +1,39 @@
+"""flag claims
+
+Revision ID: 8b9c0d1e2f08
+Revises: 7a8b9c0d1e07
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b9c0d1e2f08'
+down_revision = '7a8b9c0d1e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('flagged_reviews', sa.Column('claimed_by', sa.Integer(), nullable=True))
+    op.add_column('flagged_reviews', sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+    op.create_foreign_key('flagged_reviews_claimed_by_fkey', 'flagged_reviews', 'users',
+                          ['claimed_by'], ['id'], ondelete='SET NULL')
+    op.create_index('ix_flagged_reviews_claimed_by', 'flagged_reviews', ['claimed_by', 'claim_expires_at'])
+    op.create_index('ix_flagged_reviews_claim_expires_at', 'flagged_reviews', ['claim_expires_at'])
+    op.create_index('ix_flagged_reviews_unclaimed', 'flagged_reviews', ['flag_timestamp', 'id'],
+                    postgresql_where=sa.text("admin_decision = 'pending' AND claimed_by IS NULL"))
+    op.create_index('ix_flagged_reviews_appeal_unclaimed', 'flagged_reviews', ['appeal_timestamp', 'id'],
+                    postgresql_where=sa.text("appeal_decision = 'pending' AND claimed_by IS NULL"))
+
+
+def downgrade():
+    op.drop_index('ix_flagged_reviews_appeal_unclaimed', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_unclaimed', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_claim_expires_at', table_name='flagged_reviews')
+    op.drop_index('ix_flagged_reviews_claimed_by', table_name='flagged_reviews')
+    op.drop_constraint('flagged_reviews_claimed_by_fkey', 'flagged_reviews', type_='foreignkey')
+    op.drop_column('flagged_reviews', 'claim_expires_at')
+    op.drop_column('flagged_reviews', 'claimed_by')
@@ -0,0 +1,36 @@
+"""review helpfulness
+
+Revision ID: 9c0d1e2f3a09
+Revises: 8b9c0d1e2f08
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c0d1e2f3a09'
+down_revision = '8b9c0d1e2f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('reviews', sa.Column('helpfulness', sa.Float(), server_default='0', nullable=False))
+
+    # Wilson lower bound of the stored vote counters at z = 1.96 (see models.wilson_lower_bound)
+    op.execute("""
+        UPDATE reviews SET helpfulness =
+            (up_count + 1.9208 - 1.96 * sqrt(up_count * down_count::float / (up_count + down_count) + 0.9604))
+            / (up_count + down_count + 3.8416)
+        WHERE up_count + down_count > 0
+    """)
+
+    op.create_index('ix_reviews_business_visible_helpfulness', 'reviews',
+                    ['business_id', 'is_visible', sa.text('helpfulness DESC'), sa.text('id DESC')])
+
+
+def downgrade():
+    op.drop_index('ix_reviews_business_visible_helpfulness', table_name='reviews')
+    op.drop_column('reviews', 'helpfulness')
@@ -1,12 +1,24 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+import math
+from flask_sqlalchemy import get_state
+from datetime import datetime, timedelta
 from flask_login import UserMixin
-from flask_bcrypt import Bcrypt
-from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import Float, String, case, cast, column, func, literal, update, values
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
+from hours import week_ranges, utc_offset_minutes
+from geo import zip_centroid
+from hashing import password_hasher
+from replicas import RoutingSQLAlchemy
 
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+db = RoutingSQLAlchemy()
+
+def normalize_email(email):
+    """The stored form of an email address: one account per address, however it is typed."""
+    return email.strip().lower()
+
 
 class User(db.Model, UserMixin):
     """Table for registering users"""
@@ -25,24 +37,55 @@ class User(db.Model, UserMixin):
     email = db.Column(db.String(40), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
-
+    # Flags and appeals on this user's businesses still awaiting an admin, kept in step by the moderation routes
+    open_cases = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
-    businesses = db.relationship('Business', backref='owner', lazy=True)
+    businesses = db.relationship('Business', backref='owner', lazy=True, passive_deletes=True)
     
+    @validates('email')
+    def lower_email(self, key, value):
+        """Store emails lower-cased so lookups and the unique index agree on case."""
+        return normalize_email(value)
+
     def set_password(self, password):
         """Set the password hash for the user."""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Check if the given password matches the hashed password."""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash was made at a different bcrypt cost than configured."""
+        return password_hasher.needs_rehash(self.password_hash)
 
     @classmethod
     def is_phone_number_email_duplicate(cls, phone_number, email):
         """Check if the phone number or email already exists in the database independently."""
-        existing_user = cls.query.filter((cls.phone_number == phone_number) | (cls.email == email)).first()
+        existing_user = cls.query.filter((cls.phone_number == phone_number) |
+                                         (func.lower(cls.email) == normalize_email(email))).first()
         return existing_user is not None
+
+    @classmethod
+    def by_email(cls, email):
+        """The user with this email address, in any case."""
+        return cls.query.filter(func.lower(cls.email) == normalize_email(email)).first()
+
+    @classmethod
+    def adjust_open_cases(cls, user_id, delta):
+        """Atomically add a delta to an owner's open case counter."""
+        cls.query.filter(cls.id == user_id).update({cls.open_cases: cls.open_cases + delta},
+                                                   synchronize_session=False)
+
+    @classmethod
+    def refresh_open_cases(cls):
+        """Recount every owner's open cases from the flagged reviews."""
+        count_q = db.session.query(func.count(FlaggedReview.id)).select_from(FlaggedReview).join(Review).join(Business) \
+                            .filter(Business.user_id == cls.id, FlaggedReview.is_open).scalar_subquery()
+        cls.query.update({cls.open_cases: count_q}, synchronize_session=False)
     
+
+db.Index('ix_users_email_lower', func.lower(User.email), unique=True)
     
 class Business(db.Model):
     """Model for businesses"""
@@ -62,18 +105,85 @@ class Business(db.Model):
     business_hours = db.Column(db.String(300), nullable=False)
     time_zone = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)  
+    # Running totals over visible reviews, kept in step by the review write paths
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Centroid of business_zip from the bundled ZIP table; NULL for ZIP codes it doesn't know
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    opening_hours = db.relationship('OpeningHours', cascade='all, delete-orphan', passive_deletes=True, lazy=True)
+
+    @validates('business_hours', 'time_zone')
+    def sync_opening_hours(self, key, value):
+        """Rebuild the searchable opening hour ranges whenever the hours or zone change."""
+        if value != getattr(self, key):
+            hours_str = value if key == 'business_hours' else self.business_hours
+            time_zone = value if key == 'time_zone' else self.time_zone
+            self.opening_hours = OpeningHours.from_hours(hours_str, time_zone)
+        return value
+
+    @validates('business_zip')
+    def geocode(self, key, value):
+        """Place the business at its ZIP code's centroid whenever the ZIP changes."""
+        self.latitude, self.longitude = zip_centroid(value) or (None, None)
+        return value
 
     def full_address(self):
         """Return the full address as a single formatted string."""
         return f"{self.business_address}, {self.business_city}, {self.business_state}, {self.business_zip}"
     
-    def average_rating(self):
-        if self.reviews:
-            return sum(review.rating for review in self.reviews) / len(self.reviews)
+    @hybrid_property
+    def rating_average(self):
+        """Average rating of visible reviews, 0 when there are none."""
+        if self.review_count:
+            return self.rating_sum / self.review_count
         return 0
+
+    @rating_average.expression
+    def rating_average(cls):
+        # Double precision, so cursors round-trip through Python floats exactly
+        return func.coalesce(cast(cls.rating_sum, Float) / func.nullif(cls.review_count, 0), 0)
+
+    def average_rating(self):
+        return self.rating_average
+
+    @classmethod
+    def adjust_rating_totals(cls, business_id, rating_delta, count_delta):
+        """Atomically apply a change to the stored rating totals of a business."""
+        cls.query.filter(cls.id == business_id).update({
+            cls.rating_sum: cls.rating_sum + rating_delta,
+            cls.review_count: cls.review_count + count_delta
+        }, synchronize_session=False)
+
+    @classmethod
+    def refresh_rating_totals(cls, business_ids=None):
+        """Recompute the stored rating totals from the reviews table."""
+        visible = (Review.business_id == cls.id) & (Review.is_visible == True)
+        count_q = db.session.query(func.count(Review.id)).filter(visible).scalar_subquery()
+        sum_q = db.session.query(func.coalesce(func.sum(Review.rating), 0)).filter(visible).scalar_subquery()
+        query = cls.query
+        if business_ids is not None:
+            if not business_ids:
+                return
+            query = query.filter(cls.id.in_(business_ids))
+        query.update({cls.review_count: count_q, cls.rating_sum: sum_q}, synchronize_session=False)
     
+    @classmethod
+    def refresh_coordinates(cls):
+        """Re-geocode every business from the ZIP centroid table, in two statements."""
+        zip_codes = [zip_code for zip_code, in db.session.query(cls.business_zip).distinct()]
+        known = [(zip_code, *zip_centroid(zip_code)) for zip_code in zip_codes if zip_centroid(zip_code)]
+        cls.query.update({cls.latitude: None, cls.longitude: None}, synchronize_session=False)
+        if known:
+            centroids = values(column('zip', String), column('latitude', Float), column('longitude', Float),
+                               name='centroids').data(known)
+            db.session.execute(update(cls.__table__).where(cls.business_zip == centroids.c.zip)
+                               .values(latitude=centroids.c.latitude, longitude=centroids.c.longitude))
+        return len(known)
+
     @staticmethod
+    @lru_cache(maxsize=1024)
     def format_business_hours(hours_str):
         """Format business hours from a string into a more readable form."""
         days_order = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
@@ -100,6 +210,63 @@ class Business(db.Model):
             print(f"Error formatting business hours: {e}")
             return "Hours format error"
 
+db.Index('ix_businesses_rating_average', Business.rating_average)
+db.Index('ix_businesses_review_count', Business.review_count)
+db.Index('ix_businesses_user_id', Business.user_id)
+db.Index('ix_businesses_location', Business.latitude, Business.longitude)
+
+class OpeningHours(db.Model):
+    """A span of a business's week during which it is open.
+
+    Minutes are counted from Monday 00:00 in the business's local time, and
+    each row carries the business's UTC offset so "open now" can be answered
+    with one index range per offset.
+    """
+
+    __tablename__ = 'opening_hours'
+
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('businesses.id', ondelete='CASCADE'), nullable=False)
+    start_minute = db.Column(db.Integer, nullable=False)
+    end_minute = db.Column(db.Integer, nullable=False)
+    utc_offset = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def from_hours(cls, hours_str, time_zone):
+        """Build the rows for a business_hours string in the given time zone."""
+        offset = utc_offset_minutes(time_zone)
+        return [cls(start_minute=start, end_minute=end, utc_offset=offset)
+                for start, end in week_ranges(hours_str)]
+
+db.Index('ix_opening_hours_business_id', OpeningHours.business_id)
+db.Index('ix_opening_hours_window', OpeningHours.start_minute, OpeningHours.end_minute, OpeningHours.business_id)
+db.Index('ix_opening_hours_offset_window', OpeningHours.utc_offset, OpeningHours.start_minute,
+         OpeningHours.end_minute, OpeningHours.business_id)
+
+WILSON_Z = 1.96  # 95% confidence
+
+
+def wilson_lower_bound(up, down, z=WILSON_Z):
+    """Lower bound of the Wilson score interval for the share of up votes; 0 without votes.
+
+    A review with 10 up and 1 down outranks one with a single up vote, which
+    sorting by the plain ratio would not do.
+    """
+    total = up + down
+    if not total:
+        return 0.0
+    return (up + z * z / 2 - z * math.sqrt(up * down / total + z * z / 4)) / (total + z * z)
+
+
+def helpfulness_expression(up, down, z=WILSON_Z):
+    """wilson_lower_bound as a SQL expression over up and down vote count expressions."""
+    total = cast(up + down, Float)
+    return case(
+        (up + down == 0, 0.0),
+        else_=(up + z * z / 2 - z * func.sqrt(up * cast(down, Float) / total + z * z / 4)) / (total + z * z)
+    )
+
+
 class Review(db.Model):
     __tablename__ = 'reviews'
     
@@ -110,16 +277,55 @@ class Review(db.Model):
     response = db.Column(db.Text, nullable=True)
     response_at = db.Column(db.DateTime, nullable=True)
     is_visible = db.Column(db.Boolean, default=True, nullable=False) 
+    up_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    down_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    helpfulness = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    business_id = db.Column(db.Integer, db.ForeignKey('businesses.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    business_id = db.Column(db.Integer, db.ForeignKey('businesses.id', ondelete='CASCADE'), nullable=False)
     
-    user = db.relationship('User', backref=db.backref('reviews', lazy=True))
-    business = db.relationship('Business', backref=db.backref('reviews', lazy=True))
+    user = db.relationship('User', backref=db.backref('reviews', lazy=True, passive_deletes=True))
+    business = db.relationship('Business', backref=db.backref('reviews', lazy=True, passive_deletes=True))
 
     def __repr__(self):
         return f'<Review {self.id} by User {self.user_id} on Business {self.business_id}>'
 
+    def set_visibility(self, is_visible):
+        """Show or hide the review, keeping the business rating totals in step."""
+        if self.is_visible == is_visible:
+            return
+        self.is_visible = is_visible
+        sign = 1 if is_visible else -1
+        Business.adjust_rating_totals(self.business_id, sign * self.rating, sign)
+
+    @classmethod
+    def adjust_vote_counts(cls, review_id, up_delta, down_delta):
+        """Atomically apply a change to the stored vote counters and helpfulness of a review."""
+        if not up_delta and not down_delta:
+            return
+        cls.query.filter(cls.id == review_id).update({
+            cls.up_count: cls.up_count + up_delta,
+            cls.down_count: cls.down_count + down_delta,
+            cls.helpfulness: helpfulness_expression(cls.up_count + up_delta, cls.down_count + down_delta)
+        }, synchronize_session=False)
+
+    @classmethod
+    def refresh_vote_counts(cls, review_ids=None):
+        """Recompute the stored vote counters and helpfulness from the interactions table."""
+        def tally(vote_type):
+            return db.session.query(func.count(Interaction.id)) \
+                             .filter(Interaction.review_id == cls.id,
+                                     Interaction.interaction_type == vote_type) \
+                             .scalar_subquery()
+        query = cls.query
+        if review_ids is not None:
+            if not review_ids:
+                return
+            query = query.filter(cls.id.in_(review_ids))
+        query.update({cls.up_count: tally('up'), cls.down_count: tally('down'),
+                      cls.helpfulness: helpfulness_expression(tally('up'), tally('down'))},
+                     synchronize_session=False)
+
     @classmethod
     def user_has_reviewed_business(cls, user_id, business_id):
         """
@@ -133,6 +339,11 @@ class Review(db.Model):
         existing_review = cls.query.filter_by(user_id=user_id, business_id=business_id).first()
         return existing_review is not None
 
+db.Index('ix_reviews_business_visible_created', Review.business_id, Review.is_visible, Review.created_at)
+db.Index('ix_reviews_business_visible_helpfulness', Review.business_id, Review.is_visible,
+         Review.helpfulness.desc(), Review.id.desc())
+db.Index('ix_reviews_user_business', Review.user_id, Review.business_id)
+
     
 class Interaction(db.Model):
     """Table to store user interactions with businesses and reviews"""
@@ -140,26 +351,29 @@ class Interaction(db.Model):
     __tablename__ = 'interactions'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    business_id = db.Column(db.Integer, db.ForeignKey('businesses.id'), nullable=True) 
-    review_id = db.Column(db.Integer, db.ForeignKey('reviews.id'), nullable=True)  
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    business_id = db.Column(db.Integer, db.ForeignKey('businesses.id', ondelete='CASCADE'), nullable=True) 
+    review_id = db.Column(db.Integer, db.ForeignKey('reviews.id', ondelete='CASCADE'), nullable=True)  
     interaction_type = db.Column(db.String(10), nullable=False) 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     
-    user = db.relationship('User', backref=db.backref('interactions', lazy='dynamic'))
-    business = db.relationship('Business', backref=db.backref('interactions', lazy='dynamic'))
-    review = db.relationship('Review', backref=db.backref('interactions', lazy='dynamic'))
+    user = db.relationship('User', backref=db.backref('interactions', lazy='dynamic', passive_deletes=True))
+    business = db.relationship('Business', backref=db.backref('interactions', lazy='dynamic', passive_deletes=True))
+    review = db.relationship('Review', backref=db.backref('interactions', lazy='dynamic', passive_deletes=True))
 
     def __repr__(self):
         return f'<Interaction user_id={self.user_id} business_id={self.business_id} review_id={self.review_id} type={self.interaction_type}>'
 
+db.Index('ix_interactions_user_business_type', Interaction.user_id, Interaction.business_id, Interaction.interaction_type)
+db.Index('ix_interactions_review_type', Interaction.review_id, Interaction.interaction_type)
+
 class FlaggedReview(db.Model):
     __tablename__ = 'flagged_reviews'
     
     id = db.Column(db.Integer, primary_key=True)
-    review_id = db.Column(db.Integer, db.ForeignKey('reviews.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False) 
+    review_id = db.Column(db.Integer, db.ForeignKey('reviews.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False) 
     flag_reason = db.Column(db.Text, nullable=False)
     flag_timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     admin_decision = db.Column(db.String(10), nullable=True)  
@@ -167,21 +381,246 @@ class FlaggedReview(db.Model):
     appeal_reason = db.Column(db.Text, nullable=True)
     appeal_timestamp = db.Column(db.DateTime, nullable=True)
     appeal_decision = db.Column(db.String(10), nullable=True)  
+    claimed_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    claim_expires_at = db.Column(db.DateTime, nullable=True)
 
-    review = db.relationship('Review', backref=db.backref('flagged_review', uselist=False))
-    user = db.relationship('User', backref=db.backref('flagged_reviews', lazy=True))  # New relationship
+    review = db.relationship('Review', backref=db.backref('flagged_review', uselist=False, passive_deletes=True))
+    user = db.relationship('User', foreign_keys=[user_id],
+                           backref=db.backref('flagged_reviews', lazy=True, passive_deletes=True))  # New relationship
+
+    @hybrid_property
+    def case_status(self):
+        """Which section of the owner's My Cases page the flag belongs to."""
+        if self.appeal_reason is not None:
+            return 'appealed'
+        if self.admin_decision == 'pending':
+            return 'pending'
+        return 'resolved'
+
+    @case_status.expression
+    def case_status(cls):
+        return case((cls.appeal_reason.isnot(None), 'appealed'),
+                    (cls.admin_decision == 'pending', 'pending'),
+                    else_='resolved')
+
+    @hybrid_property
+    def is_open(self):
+        """True while the flag or its appeal awaits an admin."""
+        return self.admin_decision == 'pending' or self.appeal_decision == 'pending'
+
+    @is_open.expression
+    def is_open(cls):
+        return (cls.admin_decision == 'pending') | (cls.appeal_decision == 'pending')
 
     def process_admin_decision(self):
         """Process the admin decision on the flagged review and update the review visibility."""
         if self.admin_decision == 'approve':
-            self.review.is_visible = False
+            self.review.set_visibility(False)
         elif self.admin_decision == 'deny':
-            self.review.is_visible = True
+            self.review.set_visibility(True)
 
     def __repr__(self):
         return f'<FlaggedReview {self.id} for Review {self.review_id}>'
 
+db.Index('ix_flagged_reviews_review_id', FlaggedReview.review_id)
+db.Index('ix_flagged_reviews_user_id', FlaggedReview.user_id)
+db.Index('ix_flagged_reviews_admin_decision', FlaggedReview.admin_decision, FlaggedReview.flag_timestamp)
+db.Index('ix_flagged_reviews_pending', FlaggedReview.flag_timestamp, FlaggedReview.id,
+         postgresql_where=FlaggedReview.admin_decision == 'pending',
+         sqlite_where=FlaggedReview.admin_decision == 'pending')
+db.Index('ix_flagged_reviews_appeal_pending', FlaggedReview.appeal_timestamp, FlaggedReview.id,
+         postgresql_where=FlaggedReview.appeal_decision == 'pending',
+         sqlite_where=FlaggedReview.appeal_decision == 'pending')
+db.Index('ix_flagged_reviews_claimed_by', FlaggedReview.claimed_by, FlaggedReview.claim_expires_at)
+db.Index('ix_flagged_reviews_claim_expires_at', FlaggedReview.claim_expires_at)
+db.Index('ix_flagged_reviews_unclaimed', FlaggedReview.flag_timestamp, FlaggedReview.id,
+         postgresql_where=(FlaggedReview.admin_decision == 'pending') & FlaggedReview.claimed_by.is_(None),
+         sqlite_where=(FlaggedReview.admin_decision == 'pending') & FlaggedReview.claimed_by.is_(None))
+db.Index('ix_flagged_reviews_appeal_unclaimed', FlaggedReview.appeal_timestamp, FlaggedReview.id,
+         postgresql_where=(FlaggedReview.appeal_decision == 'pending') & FlaggedReview.claimed_by.is_(None),
+         sqlite_where=(FlaggedReview.appeal_decision == 'pending') & FlaggedReview.claimed_by.is_(None))
+
+
+def upsert_counters(model, keys, rows, replace=False):
+    """Add (or with replace=True, assign) each row's value to a counter table in one statement.
+
+    Missing counter rows are created, so counters need no seeding.
+    """
+    dialect = db.engine.dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(model.__table__).values(rows)
+    value = statement.excluded.value if replace else model.__table__.c.value + statement.excluded.value
+    db.session.execute(statement.on_conflict_do_update(index_elements=keys, set_={'value': value}))
+
+
+class SiteStat(db.Model):
+    """Site-wide counters kept in step by the write routes."""
+
+    __tablename__ = 'site_stats'
+
+    COUNTERS = ('users', 'businesses', 'reviews', 'pending_flags', 'pending_appeals')
+
+    name = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    @classmethod
+    def adjust(cls, **deltas):
+        """Atomically add deltas (numbers or scalar subqueries) to named counters."""
+        rows = [{'name': name, 'value': delta} for name, delta in deltas.items() if not isinstance(delta, int) or delta]
+        if rows:
+            upsert_counters(cls, ['name'], rows)
+
+    @classmethod
+    def totals(cls):
+        values = dict(db.session.query(cls.name, cls.value))
+        return {name: values.get(name, 0) for name in cls.COUNTERS}
+
+    @classmethod
+    def reconcile(cls):
+        """Recount every counter from the source tables."""
+        db.session.flush()
+        counts = {
+            'users': db.session.query(func.count(User.id)),
+            'businesses': db.session.query(func.count(Business.id)),
+            'reviews': db.session.query(func.count(Review.id)),
+            'pending_flags': db.session.query(func.count(FlaggedReview.id))
+                                       .filter(FlaggedReview.admin_decision == 'pending'),
+            'pending_appeals': db.session.query(func.count(FlaggedReview.id))
+                                         .filter(FlaggedReview.appeal_decision == 'pending'),
+        }
+        upsert_counters(cls, ['name'], [{'name': name, 'value': query.scalar_subquery()}
+                                        for name, query in counts.items()], replace=True)
+
+
+class DailyStat(db.Model):
+    """Per-day counts of new reviews, votes and flags."""
+
+    __tablename__ = 'daily_stats'
+
+    SERIES = ('reviews', 'votes', 'flags')
+
+    day = db.Column(db.Date, primary_key=True)
+    name = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def record(cls, name, amount=1, day=None):
+        """Add to today's (UTC) count for a series."""
+        upsert_counters(cls, ['day', 'name'], [{'day': day or datetime.utcnow().date(), 'name': name,
+                                                'value': amount}])
+
+    @classmethod
+    def series(cls, days=14, today=None):
+        """Return (days, {name: [value per day]}) for the trailing window, oldest first."""
+        today = today or datetime.utcnow().date()
+        window = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        values = {(day, name): value for day, name, value in
+                  db.session.query(cls.day, cls.name, cls.value).filter(cls.day >= window[0])}
+        return window, {name: [values.get((day, name), 0) for day in window] for name in cls.SERIES}
+
+    @classmethod
+    def reconcile(cls, days=30, today=None):
+        """Rebuild the trailing window of daily counts from the source tables."""
+        db.session.flush()
+        today = today or datetime.utcnow().date()
+        start = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+        sources = [
+            ('reviews', Review.created_at, []),
+            ('votes', Interaction.created_at, [Interaction.interaction_type.in_(('up', 'down'))]),
+            ('flags', FlaggedReview.flag_timestamp, []),
+        ]
+        cls.query.filter(cls.day >= start.date()).delete(synchronize_session=False)
+        for name, created, conditions in sources:
+            counts = db.session.query(func.date(created), literal(name), func.count()) \
+                               .filter(created >= start, *conditions).group_by(func.date(created))
+            db.session.execute(cls.__table__.insert().from_select(['day', 'name', 'value'], counts))
+
+
+def discount_pending_flags(condition):
+    """Take flags matching a condition, about to be deleted, out of the pending and open case counters."""
+    def pending(column):
+        return db.session.query(func.count(FlaggedReview.id)) \
+                         .filter(condition, column == 'pending').scalar_subquery()
+    SiteStat.adjust(pending_flags=-pending(FlaggedReview.admin_decision),
+                    pending_appeals=-pending(FlaggedReview.appeal_decision))
+
+    open_flags = db.session.query(func.count(FlaggedReview.id)).select_from(FlaggedReview).join(Review).join(Business) \
+                           .filter(condition, FlaggedReview.is_open, Business.user_id == User.id).scalar_subquery()
+    owner_ids = db.session.query(Business.user_id).join(Review).join(FlaggedReview) \
+                          .filter(condition, FlaggedReview.is_open)
+    User.query.filter(User.id.in_(owner_ids)).update({User.open_cases: User.open_cases - open_flags},
+                                                     synchronize_session=False)
+
+
+def delete_reviews(review_ids):
+    """Bulk delete the reviews selected by a subquery, with their flags and votes."""
+    flagged = FlaggedReview.review_id.in_(review_ids)
+    discount_pending_flags(flagged)
+    FlaggedReview.query.filter(flagged).delete(synchronize_session=False)
+    Interaction.query.filter(Interaction.review_id.in_(review_ids)).delete(synchronize_session=False)
+    deleted = Review.query.filter(Review.id.in_(review_ids)).delete(synchronize_session=False)
+    SiteStat.adjust(reviews=-deleted)
+
+
+def delete_businesses(business_ids):
+    """Bulk delete businesses and everything attached to them.
+
+    ``business_ids`` may be a list or a subquery. The statement count does not
+    depend on how many businesses, reviews or votes are removed.
+    """
+    delete_reviews(db.session.query(Review.id).filter(Review.business_id.in_(business_ids)))
+    Interaction.query.filter(Interaction.business_id.in_(business_ids)).delete(synchronize_session=False)
+    OpeningHours.query.filter(OpeningHours.business_id.in_(business_ids)).delete(synchronize_session=False)
+    deleted = Business.query.filter(Business.id.in_(business_ids)).delete(synchronize_session=False)
+    SiteStat.adjust(businesses=-deleted)
+
+
+def delete_user_account(user_id):
+    """Bulk delete a user with their businesses, reviews, votes and flags.
+
+    The rating totals of businesses they reviewed and the vote counters of
+    reviews they voted on are reduced by their share first, so the stored
+    aggregates stay correct without a full rebuild.
+    """
+    own_review = (Review.business_id == Business.id) & (Review.user_id == user_id) & (Review.is_visible == True)
+    reviewed_ids = db.session.query(Review.business_id).filter(Review.user_id == user_id, Review.is_visible == True)
+    Business.query.filter(Business.id.in_(reviewed_ids)).update({
+        Business.review_count: Business.review_count
+            - db.session.query(func.count(Review.id)).filter(own_review).scalar_subquery(),
+        Business.rating_sum: Business.rating_sum
+            - db.session.query(func.coalesce(func.sum(Review.rating), 0)).filter(own_review).scalar_subquery()
+    }, synchronize_session=False)
+
+    def own_votes(vote_type):
+        return db.session.query(func.count(Interaction.id)) \
+                         .filter(Interaction.review_id == Review.id, Interaction.user_id == user_id,
+                                 Interaction.interaction_type == vote_type) \
+                         .scalar_subquery()
+    voted_ids = db.session.query(Interaction.review_id).filter(Interaction.user_id == user_id)
+    Review.query.filter(Review.id.in_(voted_ids)).update({
+        Review.up_count: Review.up_count - own_votes('up'),
+        Review.down_count: Review.down_count - own_votes('down'),
+        Review.helpfulness: helpfulness_expression(Review.up_count - own_votes('up'),
+                                                   Review.down_count - own_votes('down'))
+    }, synchronize_session=False)
+
+    delete_businesses(db.session.query(Business.id).filter(Business.user_id == user_id))
+    delete_reviews(db.session.query(Review.id).filter(Review.user_id == user_id))
+    Interaction.query.filter(Interaction.user_id == user_id).delete(synchronize_session=False)
+    discount_pending_flags(FlaggedReview.user_id == user_id)
+    FlaggedReview.query.filter(FlaggedReview.user_id == user_id).delete(synchronize_session=False)
+    deleted = User.query.filter(User.id == user_id).delete(synchronize_session=False)
+    SiteStat.adjust(users=-deleted)
+
+
 def connect_db(app):
     """Connect to database."""
     db.app = app
     db.init_app(app)
+
+
+def dispose_engines(app):
+    """Replace the connection pools of an app's engines without closing the parent's connections."""
+    for connector in get_state(app).connectors.values():
+        if connector._engine is not None:
+            connector._engine.dispose(close=False)
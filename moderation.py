@@ -0,0 +1,97 @@
+"""Claim/lease work queues for the admin moderation pages.
+
+Pending flags and pending appeals are two queues over ``flagged_reviews``.
+The "Claim next batch" button of a queue page claims a batch of unclaimed
+items for the moderator with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+moderators working in parallel get disjoint batches without waiting on each
+other. Merely viewing a queue or a decision form claims and locks nothing. A claim is a lease: if the
+moderator walks away it expires and the next claim sweeps the items back
+into the queue. Deciding an item clears its claim and its pending status
+takes it out of the queue.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from models import db, FlaggedReview, Review
+from pagination import paginate
+
+QUEUES = {
+    'flags': (FlaggedReview.admin_decision, FlaggedReview.flag_timestamp),
+    'appeals': (FlaggedReview.appeal_decision, FlaggedReview.appeal_timestamp),
+}
+
+
+def claim_batch(queue, admin_id, size, lease_seconds):
+    """Renew the moderator's live claims and top them up to `size` items.
+
+    Returns the number of items now held.
+    """
+    status, timestamp = QUEUES[queue]
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=lease_seconds)
+
+    held = FlaggedReview.query.filter(
+        status == 'pending', FlaggedReview.claimed_by == admin_id, FlaggedReview.claim_expires_at > now
+    ).update({FlaggedReview.claim_expires_at: expires}, synchronize_session=False)
+    if held >= size:
+        return held
+
+    expired = db.session.query(FlaggedReview.id).filter(FlaggedReview.claim_expires_at <= now) \
+                        .with_for_update(skip_locked=True)
+    FlaggedReview.query.filter(FlaggedReview.id.in_(expired)).update({
+        FlaggedReview.claimed_by: None,
+        FlaggedReview.claim_expires_at: None
+    }, synchronize_session=False)
+
+    free = db.session.query(FlaggedReview.id).filter(status == 'pending', FlaggedReview.claimed_by.is_(None)) \
+                     .order_by(timestamp, FlaggedReview.id).limit(size - held).with_for_update(skip_locked=True)
+    claimed = FlaggedReview.query.filter(FlaggedReview.id.in_(free)).update({
+        FlaggedReview.claimed_by: admin_id,
+        FlaggedReview.claim_expires_at: expires
+    }, synchronize_session=False)
+    return held + claimed
+
+
+def claimed_items(queue, admin_id, cursor, per_page):
+    """A page of the moderator's live claims with the review, reviewer and business loaded."""
+    status, timestamp = QUEUES[queue]
+    query = FlaggedReview.query.options(
+        joinedload(FlaggedReview.review).joinedload(Review.user),
+        joinedload(FlaggedReview.review).joinedload(Review.business)
+    ).filter(
+        status == 'pending', FlaggedReview.claimed_by == admin_id,
+        FlaggedReview.claim_expires_at > datetime.utcnow()
+    )
+    return paginate(query, [timestamp, FlaggedReview.id], cursor, per_page)
+
+
+def item_for_decision(queue, flagged_review_id, admin_id, lock=False):
+    """Load a queue item to decide. Returns (item, error message or None).
+
+    Recording a decision passes ``lock``: the row lock makes two concurrent
+    decisions on the same item run one after the other, so the second sees
+    the first one's decision.
+    """
+    status, _ = QUEUES[queue]
+    query = FlaggedReview.query.filter_by(id=flagged_review_id)
+    flagged_review = (query.with_for_update() if lock else query).first_or_404()
+    if getattr(flagged_review, status.key) != 'pending':
+        return flagged_review, 'This item has already been decided.'
+    if (flagged_review.claimed_by not in (None, admin_id)
+            and flagged_review.claim_expires_at > datetime.utcnow()):
+        return flagged_review, 'This item is claimed by another moderator.'
+    return flagged_review, None
+
+
+def release(flagged_review):
+    """Clear the claim on an item that has been decided."""
+    flagged_review.claimed_by = None
+    flagged_review.claim_expires_at = None
+
+
+def release_claims(queue, admin_id):
+    """Hand all of a moderator's claims in a queue back."""
+    status, _ = QUEUES[queue]
+    return FlaggedReview.query.filter(status == 'pending', FlaggedReview.claimed_by == admin_id).update({
+        FlaggedReview.claimed_by: None,
+        FlaggedReview.claim_expires_at: None
+    }, synchronize_session=False)
@@ -0,0 +1,293 @@
+"""Rendered-page cache for anonymous visitors.
+
+Anonymous GETs of business details and search results get byte-identical
+HTML, so the rendered body is stored in a pluggable backend. Each cache key
+embeds version tokens (one for the site, one for the directory search and
+one per business). Write routes bump the versions they affect, which
+retires every stale page at once without having to find and delete them.
+
+The version tokens live in the backend, so they are only as shared as it is.
+With the default ``memory`` backend each process has its own: a write
+handled by one gunicorn worker doesn't retire the pages cached by the
+others, which keep serving them for up to ``PAGE_CACHE_TIMEOUT``. Use the
+``filesystem`` backend (one host) or ``redis`` (several) when pages must
+change everywhere as soon as the data does.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, g, request, session
+from flask_login import current_user
+
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + timeout if timeout else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileSystemBackend:
+    """Cache shared by every worker on a host, one file per key.
+
+    A file holds two pickles, the expiry time and then the value, so a sweep
+    reads only the first. Bumped versions leave their pages behind, so every
+    ``sweep_every`` writes a worker deletes the expired files, then the least
+    recently written ones beyond ``max_entries``.
+    """
+
+    def __init__(self, directory, max_entries=1024, sweep_every=100):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                expires_at = pickle.load(handle)
+                if expires_at is not None and expires_at < time.time():
+                    self._remove(path)
+                    return None
+                return pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + timeout if timeout else None
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as handle:
+            pickle.dump(expires_at, handle)
+            pickle.dump(value, handle)
+        os.replace(temp_path, self._path(key))
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            self.sweep()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        """Delete expired entries, then the least recently written beyond max_entries."""
+        now = time.time()
+        kept = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as handle:
+                    expires_at = pickle.load(handle)
+                written_at = os.stat(path).st_mtime
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue  # deleted by another worker, or a temporary file still being written
+            if expires_at is not None and expires_at < now:
+                self._remove(path)
+            else:
+                kept.append((written_at, path))
+        kept.sort()
+        for _, path in kept[:max(len(kept) - self.max_entries, 0)]:
+            self._remove(path)
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+    def __len__(self):
+        return len(os.listdir(self.directory))
+
+
+class RedisBackend:
+    """Cache shared across hosts through any Redis-protocol server."""
+
+    def __init__(self, url, prefix='validvouch:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PAGE_CACHE_BACKEND='redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + '*'))
+
+
+def create_backend(kind, app, namespace, max_entries=None):
+    """Build the cache backend named by a *_BACKEND config value, or None if disabled.
+
+    ``max_entries`` bounds a memory or filesystem backend (PAGE_CACHE_MAX_ENTRIES by default).
+    """
+    if kind == 'memory':
+        return MemoryBackend(max_entries or app.config['PAGE_CACHE_MAX_ENTRIES'])
+    if kind == 'filesystem':
+        return FileSystemBackend(os.path.join(app.config['PAGE_CACHE_DIR'], namespace),
+                                 max_entries or app.config['PAGE_CACHE_MAX_ENTRIES'])
+    if kind == 'redis':
+        return RedisBackend(app.config['PAGE_CACHE_REDIS_URL'], prefix=f'validvouch:{namespace}:')
+    if kind:
+        raise ValueError(f'Unknown cache backend: {kind}')
+    return None
+
+
+class PageCache:
+    """Flask extension wrapping a backend with version keys and hit/miss counters."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = 300
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PAGE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('PAGE_CACHE_TIMEOUT', 300)
+        app.config.setdefault('PAGE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('PAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'validvouch-cache'))
+        app.config.setdefault('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        self.backend = create_backend(app.config['PAGE_CACHE_BACKEND'], app, 'page')
+        self.timeout = app.config['PAGE_CACHE_TIMEOUT']
+        app.extensions['page_cache'] = self
+
+    def version(self, name):
+        """Current version token for a namespace, created on first use."""
+        key = f'version:{name}'
+        token = self.backend.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            self.backend.set(key, token)
+        return token
+
+    def bump(self, *names):
+        """Retire every page cached under the given namespaces."""
+        if self.backend is None:
+            return
+        for name in names:
+            self.backend.set(f'version:{name}', uuid.uuid4().hex)
+
+    def bump_business(self, business_id, directory=True):
+        """Retire a business's pages and, unless told otherwise, search results."""
+        self.bump(f'business:{business_id}', *(['directory'] if directory else []))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'entries': len(self.backend) if self.backend else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def cached(self, *namespaces, unless=None):
+        """Cache a view's anonymous GET responses under the given version namespaces.
+
+        Namespaces are format strings filled from the view arguments, for
+        example ``'business:{business_id}'``. The 'site' namespace is always
+        included. ``unless`` is an optional callable that returns True for
+        requests whose page depends on something other than the data, such as
+        the clock.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if (self.backend is None or request.method != 'GET'
+                        or current_user.is_authenticated or session.get('_flashes')
+                        or (unless is not None and unless())):
+                    return view(*args, **kwargs)
+
+                versions = [self.version('site')] + [self.version(name.format(**kwargs)) for name in namespaces]
+                key = f"page:{request.endpoint}:{'.'.join(versions)}:{request.full_path}"
+                cached = self.backend.get(key)
+                if cached is not None:
+                    self.hits += 1
+                    body, mimetype = cached
+                    response = Response(body, mimetype=mimetype)
+                    response.headers['X-Page-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                response = view(*args, **kwargs)
+                if isinstance(response, str):
+                    response = Response(response)
+                if (response.status_code == 200 and not response.direct_passthrough
+                        and 'Set-Cookie' not in response.headers and not session.modified
+                        and not g.get('replica_lagging')):
+                    self.backend.set(key, (response.get_data(), response.mimetype), self.timeout)
+                    response.headers['X-Page-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
@@ -0,0 +1,205 @@
+"""Keyset (cursor) pagination shared by every list page.
+
+A page is fetched with ``WHERE (key, id) > (last_key, last_id) ... LIMIT n``
+instead of OFFSET, so every page costs one index range scan no matter how deep
+the reader goes. The position is handed to the client as an opaque cursor.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request, url_for
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.sql import operators
+
+
+class Page:
+    """One page of results plus the cursor for the page after it."""
+
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'n': str(value)}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'n' in value:
+            return Decimal(value['n'])
+    return value
+
+
+def encode_cursor(values):
+    """Encode the sort key values of a row as an opaque URL-safe token."""
+    payload = json.dumps([_dump_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor back into key values, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    try:
+        return [_load_value(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_ordering(clause):
+    """Return (expression, descending) for a column or an .asc()/.desc() clause."""
+    modifier = getattr(clause, 'modifier', None)
+    if modifier is operators.desc_op:
+        return clause.element, True
+    if modifier is operators.asc_op:
+        return clause.element, False
+    return clause, False
+
+
+def keyset_condition(keys, values):
+    """Build the WHERE clause selecting rows strictly after the given key values."""
+    expressions = [expression for expression, _ in keys]
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        row = tuple_(*expressions)
+        return row < tuple_(*values) if directions.pop() else row > tuple_(*values)
+
+    clauses = []
+    for index, (expression, descending) in enumerate(keys):
+        equal = [keys[i][0] == values[i] for i in range(index)]
+        step = expression < values[index] if descending else expression > values[index]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def paginate(query, ordering, cursor=None, per_page=25):
+    """Return one Page of a query ordered by the given clauses.
+
+    The last ordering clause must be unique (normally the primary key) so every
+    row has a distinct position.
+    """
+    keys = [_split_ordering(clause) for clause in ordering]
+    values = decode_cursor(cursor, len(keys))
+    if values is not None:
+        query = query.filter(keyset_condition(keys, values))
+
+    labels = [expression.label(f'_page_key_{index}') for index, (expression, _) in enumerate(keys)]
+    rows = query.add_columns(*labels).order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][-len(keys):])
+    return Page([row[0] for row in rows], next_cursor)
+
+
+def paginate_partitions(query, partition, ordering, cursors, per_page=25):
+    """Return a Page for each partition of a query, all fetched in one statement.
+
+    ``partition`` is an expression naming the partition of each row and
+    ``cursors`` maps every wanted partition value to its own cursor (or None).
+    Rows are numbered per partition by a window function, so each partition
+    contributes at most ``per_page + 1`` rows. The query's first entity must
+    have a single-column primary key.
+    """
+    keys = [_split_ordering(clause) for clause in ordering]
+    conditions = []
+    for value, cursor in cursors.items():
+        values = decode_cursor(cursor, len(keys))
+        conditions.append(partition == value if values is None
+                          else and_(partition == value, keyset_condition(keys, values)))
+    query = query.filter(or_(*conditions))
+
+    primary_key = query.column_descriptions[0]['entity'].__mapper__.primary_key[0]
+    position = func.row_number().over(partition_by=partition, order_by=ordering)
+    numbered = query.with_entities(primary_key.label('id'), position.label('position')).subquery()
+    first_rows = select(numbered.c.id).where(numbered.c.position <= per_page + 1)
+
+    labels = [expression.label(f'_page_key_{index}') for index, (expression, _) in enumerate(keys)]
+    rows = query.filter(primary_key.in_(first_rows)) \
+                .add_columns(partition.label('_page_partition'), *labels).order_by(*ordering).all()
+
+    grouped = {value: [] for value in cursors}
+    for row in rows:
+        grouped[row._mapping['_page_partition']].append(row)
+    pages = {}
+    for value, group in grouped.items():
+        next_cursor = None
+        if len(group) > per_page:
+            group = group[:per_page]
+            next_cursor = encode_cursor(group[-1][-len(keys):])
+        pages[value] = Page([row[0] for row in group], next_cursor)
+    return pages
+
+
+def sort_keys(query, ordering):
+    """A query selecting only the sort key values of each row, in order, for paginate_keys."""
+    return query.with_entities(*[expression for expression, _ in map(_split_ordering, ordering)]).order_by(*ordering)
+
+
+def paginate_keys(query, ordering, keys, cursor=None, per_page=25):
+    """Return one Page of a query whose rows' sort keys were already fetched, loading only that page's rows.
+
+    ``keys`` holds the sort key values of every row in order, as selected by
+    ``sort_keys``. Cursors are the same as paginate's, so a reader can move
+    between the two. A cursor whose row is no longer among the keys (it was
+    written since) is continued by paginate itself, from the same position.
+    """
+    values = decode_cursor(cursor, len(ordering))
+    start = 0
+    if values is not None:
+        try:
+            start = keys.index(tuple(values)) + 1
+        except ValueError:
+            return paginate(query, ordering, cursor, per_page)
+    page_keys = keys[start:start + per_page]
+
+    model = query.column_descriptions[0]['entity']
+    primary_key = model.__mapper__.primary_key[0]
+    page_ids = [key[-1] for key in page_keys]
+    rows = {getattr(row, primary_key.key): row for row in model.query.filter(primary_key.in_(page_ids))} \
+        if page_ids else {}
+    items = [rows[row_id] for row_id in page_ids if row_id in rows]
+    next_cursor = encode_cursor(page_keys[-1]) if start + per_page < len(keys) else None
+    return Page(items, next_cursor)
+
+
+def page_url(cursor, param='cursor'):
+    """URL for the current page with one cursor query parameter replaced."""
+    args = request.args.to_dict()
+    args[param] = cursor
+    args.update(request.view_args or {})
+    return url_for(request.endpoint, **args)
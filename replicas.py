@@ -0,0 +1,155 @@
+"""Read-replica routing.
+
+When ``SQLALCHEMY_BINDS`` has a ``REPLICA_BIND`` entry, the plain SELECTs of
+GET and HEAD requests run on that engine and everything else runs on the
+primary. The following stay on the primary:
+
+* writes, locking reads and raw SQL;
+* every later statement of a session that has written, flushed or locked, so
+  a view reads back its own changes;
+* the requests of a browser whose previous request wrote, for
+  ``REPLICA_STICKY_SECONDS``. A POST that redirects to a page sees its own
+  write there.
+
+The replica's lag is checked at most once per ``REPLICA_LAG_CHECK_SECONDS``.
+Reads fall back to the primary while the lag exceeds
+``REPLICA_MAX_LAG_SECONDS`` or the replica can't be reached. Pages read from
+a replica that is behind at all are not put in the page cache.
+"""
+import re
+import threading
+import time
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import TextClause
+
+STICKY_KEY = '_primary_until'
+
+RAW_SELECT = re.compile(r'\s*SELECT\b(?!.*\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b)', re.IGNORECASE | re.DOTALL)
+
+# Zero when the replica has replayed everything it received, else the age of the last replayed transaction.
+# A server that is not in recovery is its own replica: lag 0.
+LAG_SQL = text("""
+    SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+""")
+
+
+class ReplicaRouter:
+    """Flask extension holding the routing settings and the replica's last measured lag."""
+
+    def __init__(self, app=None):
+        self._lag = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPLICA_BIND', 'replica')
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5)
+        app.config.setdefault('REPLICA_LAG_CHECK_SECONDS', 1)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+        app.after_request(self._remember_write)
+        app.extensions['replica_router'] = self
+
+    @staticmethod
+    def enabled(app):
+        return app.config['REPLICA_BIND'] in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+    def replica_engine(self, app):
+        return get_state(app).db.get_engine(app, bind=app.config['REPLICA_BIND'])
+
+    def lag(self, app):
+        """The replica's lag in seconds, measured at most once per REPLICA_LAG_CHECK_SECONDS; None if unreachable."""
+        engine = self.replica_engine(app)
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self._lag.get(engine, (None, None))
+            if checked_at is not None and now - checked_at < app.config['REPLICA_LAG_CHECK_SECONDS']:
+                return lag
+        try:
+            with engine.connect() as connection:
+                lag = float(connection.execute(LAG_SQL).scalar())
+        except DBAPIError:
+            lag = None
+        with self._lock:
+            self._lag[engine] = (now, lag)
+        return lag
+
+    def set_lag(self, app, lag):
+        """Record a lag measurement, as the periodic check would."""
+        with self._lock:
+            self._lag[self.replica_engine(app)] = (time.monotonic(), lag)
+
+    def use_replica(self, app):
+        """Whether this request may read from the replica at all."""
+        if not (self.enabled(app) and has_request_context() and request.method in ('GET', 'HEAD')):
+            return False
+        if session.get(STICKY_KEY, 0) > time.time():
+            return False
+        lag = self.lag(app)
+        if lag is None or lag > app.config['REPLICA_MAX_LAG_SECONDS']:
+            return False
+        if lag > 0:
+            g.replica_lagging = True
+        return True
+
+    @staticmethod
+    def _remember_write(response):
+        g.pop('replica_lagging', None)
+        if g.pop('wrote_to_primary', False):
+            session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
+
+
+def plain_read(clause):
+    """Whether a statement may run on the replica: a SELECT that takes no row locks."""
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+def may_write(mapper, clause):
+    """Whether a statement asking for a bind can change or lock rows.
+
+    A flush asks with a mapper and no clause. A bare ``get_bind()`` or
+    ``connection()``, asking with neither, only looks at the engine (its
+    dialect, say) and writes nothing by itself.
+    """
+    if clause is None:
+        return mapper is not None
+    if isinstance(clause, TextClause):
+        return RAW_SELECT.match(clause.text) is None
+    return not plain_read(clause)
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends plain SELECTs to the replica when replica_router allows it."""
+
+    def __init__(self, db, **options):
+        self.pinned_to_primary = False
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if not self.pinned_to_primary:
+            if plain_read(clause) and replica_router.use_replica(self.app):
+                return replica_router.replica_engine(self.app)
+            if may_write(mapper, clause) and replica_router.enabled(self.app):
+                # Keep this session, and this browser, on the primary
+                self.pinned_to_primary = True
+                if has_request_context():
+                    g.wrote_to_primary = True
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with RoutingSession as the session class."""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+replica_router = ReplicaRouter()
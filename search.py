@@ -0,0 +1,152 @@
+"""Full-text search over the business directory.
+
+PostgreSQL keeps a generated ``search_vector`` tsvector column on ``businesses``
+with a GIN index, plus a pg_trgm index on ``business_name`` for typo-tolerant
+matching when that extension is installed. SQLite keeps an FTS5 table in step
+with ``businesses`` through triggers. Any other database falls back to ILIKE.
+"""
+import re
+from sqlalchemy import DDL, Float, cast, event, func, literal_column, or_, table, column, text
+from models import db, Business
+
+SEARCH_CONFIG = 'english'
+
+POSTGRES_DDL = [
+    f"""ALTER TABLE businesses ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(business_name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(business_category, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(business_city, '')), 'C') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(business_description, '')), 'D')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_businesses_search_vector ON businesses USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_businesses_city_prefix ON businesses (lower(business_city) text_pattern_ops)",
+]
+
+POSTGRES_TRIGRAM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_businesses_name_trgm ON businesses USING GIN (business_name gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS businesses_fts USING fts5(
+        business_name, business_category, business_city, business_description,
+        content='businesses', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS businesses_fts_insert AFTER INSERT ON businesses BEGIN
+        INSERT INTO businesses_fts(rowid, business_name, business_category, business_city, business_description)
+        VALUES (new.id, new.business_name, new.business_category, new.business_city, new.business_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS businesses_fts_delete AFTER DELETE ON businesses BEGIN
+        INSERT INTO businesses_fts(businesses_fts, rowid, business_name, business_category, business_city, business_description)
+        VALUES ('delete', old.id, old.business_name, old.business_category, old.business_city, old.business_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS businesses_fts_update AFTER UPDATE ON businesses BEGIN
+        INSERT INTO businesses_fts(businesses_fts, rowid, business_name, business_category, business_city, business_description)
+        VALUES ('delete', old.id, old.business_name, old.business_category, old.business_city, old.business_description);
+        INSERT INTO businesses_fts(rowid, business_name, business_category, business_city, business_description)
+        VALUES (new.id, new.business_name, new.business_category, new.business_city, new.business_description);
+    END""",
+]
+
+SQLITE_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS businesses_fts_insert",
+    "DROP TRIGGER IF EXISTS businesses_fts_delete",
+    "DROP TRIGGER IF EXISTS businesses_fts_update",
+    "DROP TABLE IF EXISTS businesses_fts",
+]
+
+search_vector = literal_column('businesses.search_vector')
+businesses_fts = table('businesses_fts', column('rowid'), column('rank'))
+
+_trigram_installed = {}
+
+
+def trigram_available(connection):
+    """Return True if the pg_trgm extension can be installed on this server."""
+    return connection.execute(
+        text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).first() is not None
+
+
+def trigram_installed(connection):
+    """Return True if pg_trgm is installed in this database, caching the answer per URL."""
+    key = str(connection.engine.url)
+    if key not in _trigram_installed:
+        _trigram_installed[key] = connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first() is not None
+    return _trigram_installed[key]
+
+
+def install_search_ddl(target, connection, **kw):
+    """Create the dialect-specific search column, indexes and triggers."""
+    if connection.dialect.name == 'postgresql':
+        statements = POSTGRES_DDL + (POSTGRES_TRIGRAM_DDL if trigram_available(connection) else [])
+        _trigram_installed.pop(str(connection.engine.url), None)
+    elif connection.dialect.name == 'sqlite':
+        statements = SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        connection.execute(DDL(statement))
+
+
+def drop_search_ddl(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        for statement in SQLITE_DROP_DDL:
+            connection.execute(DDL(statement))
+
+
+event.listen(Business.__table__, 'after_create', install_search_ddl)
+event.listen(Business.__table__, 'before_drop', drop_search_ddl)
+
+
+def search_terms(value):
+    """Split user input into lower-cased word tokens safe to embed in a query."""
+    return re.findall(r'\w+', value.lower())
+
+
+def _bind_arguments(query):
+    """Bind the query's engine as its own SELECT would, the replica's for a routed read."""
+    return dict(clause=query.statement)
+
+
+def _dialect_name(query):
+    return query.session.get_bind(**_bind_arguments(query)).dialect.name
+
+
+def match_text(query, value):
+    """Filter a Business query by free text, returning the query and a rank expression.
+
+    Every word must match (as a prefix) somewhere in the name, category, city or
+    description. Higher ranks are more relevant. The rank is None when the
+    input contains no searchable words or the database has no text index.
+    """
+    terms = search_terms(value)
+    if not terms:
+        return query, None
+
+    dialect = _dialect_name(query)
+    if dialect == 'postgresql':
+        ts_query = func.to_tsquery(SEARCH_CONFIG, ' & '.join(f'{term}:*' for term in terms))
+        rank = func.ts_rank(search_vector, ts_query)
+        condition = search_vector.op('@@')(ts_query)
+        if trigram_installed(query.session.connection(bind_arguments=_bind_arguments(query))):
+            condition = or_(condition, Business.business_name.op('%')(value))
+            rank = rank + func.similarity(Business.business_name, value)
+        # Compare ranks as double precision so they round-trip through page cursors
+        return query.filter(condition), cast(rank, Float)
+
+    if dialect == 'sqlite':
+        fts_query = ' '.join(f'"{term}"*' for term in terms)
+        query = query.join(businesses_fts, businesses_fts.c.rowid == Business.id) \
+                     .filter(literal_column('businesses_fts').op('MATCH')(fts_query))
+        return query, -businesses_fts.c.rank
+
+    return query.filter(Business.business_name.ilike(f"%{value}%")), None
+
+
+def match_city(query, value):
+    """Filter a Business query to cities starting with the given text."""
+    prefix = value.strip().lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return query.filter(func.lower(Business.business_city).like(f"{prefix}%", escape='\\'))
@@ -0,0 +1,89 @@
+"""Cache of ordered search results.
+
+Popular searches (a category in a state, say) used to re-run the full search
+query for every visitor and every page. The sort keys of a search's results,
+ending in their ids, are now stored in order under a canonical key built from
+its normalized form fields, so equal searches share an entry however they
+were typed. Each page then loads only its own rows by primary key, and hands
+out the same cursors as keyset pagination.
+
+Keys embed the page cache's 'site' and 'directory' version tokens, the
+generation that every business and review write already bumps, so a write
+retires all cached results at once. Searches with more than
+``SEARCH_CACHE_MAX_IDS`` results are not cached and page through the query
+itself. The memory backend evicts the least recently used entries beyond
+``SEARCH_CACHE_MAX_ENTRIES``.
+"""
+from urllib.parse import urlencode
+from page_cache import create_backend, page_cache
+
+TOO_MANY = False  # stored for searches with more results than SEARCH_CACHE_MAX_IDS
+
+
+class SearchCache:
+    """Flask extension with a backend of result sort key lists and hit counters."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = 300
+        self.max_ids = 1000
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_CACHE_BACKEND', 'memory')
+        app.config.setdefault('SEARCH_CACHE_TIMEOUT', 300)
+        app.config.setdefault('SEARCH_CACHE_MAX_ENTRIES', 512)
+        app.config.setdefault('SEARCH_CACHE_MAX_IDS', 1000)
+        self.backend = create_backend(app.config['SEARCH_CACHE_BACKEND'], app, 'search',
+                                      app.config['SEARCH_CACHE_MAX_ENTRIES'])
+        if page_cache.backend is None:
+            self.backend = None  # the generations live in the page cache's backend
+        self.timeout = app.config['SEARCH_CACHE_TIMEOUT']
+        self.max_ids = app.config['SEARCH_CACHE_MAX_IDS']
+        app.extensions['search_cache'] = self
+
+    @staticmethod
+    def key(args):
+        """Cache key for canonical search arguments under the current directory generation."""
+        versions = page_cache.version('site'), page_cache.version('directory')
+        return f"search:{'.'.join(versions)}:{urlencode(sorted(args.items()))}"
+
+    def keys(self, args, key_query):
+        """The ordered sort keys of a search's results, or None if it has too many results.
+
+        ``key_query`` selects the sort keys in result order; it runs only on a miss.
+        """
+        if self.backend is None:
+            return None
+        key = self.key(args)
+        keys = self.backend.get(key)
+        if keys is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            keys = [tuple(row) for row in key_query.limit(self.max_ids + 1)]
+            if len(keys) > self.max_ids:
+                keys = TOO_MANY
+            self.backend.set(key, keys, self.timeout)
+        return keys if keys is not TOO_MANY else None
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'entries': len(self.backend) if self.backend else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+search_cache = SearchCache()
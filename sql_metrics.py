@@ -0,0 +1,178 @@
+"""Per-request SQL instrumentation.
+
+Cursor events count the statements of each request, add up their database
+time and remember the slowest one (normalized, so literals and expanded IN
+lists don't make every statement unique). Each response gets a
+``Server-Timing`` header and one JSON log line. Per-endpoint histograms of
+request time, DB time and statement counts are served to admins by
+``/admin/sql-metrics``.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('validvouch.sql')
+
+TIME_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM_RE = re.compile(r'%\([^)]*\)s|%s|\?|(?<!:):\w+')
+_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize(statement):
+    """Collapse a statement to its shape: literals and parameters become ?, IN lists (?)."""
+    statement = _STRING_RE.sub('?', statement)
+    statement = _PARAM_RE.sub('?', statement)
+    statement = _NUMBER_RE.sub('?', statement)
+    statement = _LIST_RE.sub('(?)', statement)
+    return _SPACE_RE.sub(' ', statement).strip()
+
+
+class Histogram:
+    """Counts of observations per upper bound, the last bucket open-ended."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def to_dict(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return dict(zip(labels, self.counts))
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.max_statements = 0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+        self.request_ms = Histogram(TIME_BUCKETS_MS)
+        self.db_ms = Histogram(TIME_BUCKETS_MS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+
+    def record(self, request_ms, stats):
+        self.requests += 1
+        self.max_statements = max(self.max_statements, stats['count'])
+        self.request_ms.observe(request_ms)
+        self.db_ms.observe(stats['db_ms'])
+        self.statements.observe(stats['count'])
+        if stats['slowest_ms'] > self.slowest_ms:
+            self.slowest_ms, self.slowest_statement = stats['slowest_ms'], stats['slowest']
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'mean_statements': round(self.statements.total / self.requests, 2),
+            'max_statements': self.max_statements,
+            'mean_db_ms': round(self.db_ms.total / self.requests, 2),
+            'mean_request_ms': round(self.request_ms.total / self.requests, 2),
+            'slowest_ms': round(self.slowest_ms, 2),
+            'slowest_statement': self.slowest_statement,
+            'request_ms': self.request_ms.to_dict(),
+            'db_ms': self.db_ms.to_dict(),
+            'statements': self.statements.to_dict(),
+        }
+
+
+class SQLMetrics:
+    """Flask extension timing every statement issued while a request is handled."""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.server_timing = True
+        self.log = True
+        self.endpoints = {}
+        self._lock = threading.Lock()
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_METRICS_ENABLED', True)
+        app.config.setdefault('SQL_METRICS_SERVER_TIMING', True)
+        app.config.setdefault('SQL_METRICS_LOG', True)
+        self.enabled = app.config['SQL_METRICS_ENABLED']
+        self.server_timing = app.config['SQL_METRICS_SERVER_TIMING']
+        self.log = app.config['SQL_METRICS_LOG']
+
+        # Engines are created lazily (and one per bind), so listen on the class
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        app.extensions['sql_metrics'] = self
+
+    def _start_request(self):
+        if self.enabled:
+            g._sql_metrics = {'started': time.perf_counter(), 'count': 0, 'db_ms': 0.0,
+                              'slowest_ms': 0.0, 'slowest': None}
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['_sql_metrics_start'] = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('_sql_metrics_start', None)
+        if started is None or not has_request_context():
+            return
+        stats = g.get('_sql_metrics')
+        if stats is None:
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        stats['count'] += 1
+        stats['db_ms'] += elapsed
+        if elapsed > stats['slowest_ms']:
+            stats['slowest_ms'], stats['slowest'] = elapsed, statement
+
+    def _end_request(self, response):
+        stats = g.pop('_sql_metrics', None)
+        if stats is None:
+            return response
+        request_ms = (time.perf_counter() - stats['started']) * 1000
+        if stats['slowest'] is not None:
+            stats['slowest'] = normalize(stats['slowest'])
+        endpoint = request.endpoint or 'unmatched'
+
+        with self._lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).record(request_ms, stats)
+
+        if self.server_timing:
+            response.headers.add('Server-Timing', f'db;dur={stats["db_ms"]:.2f};desc="{stats["count"]} queries"')
+            response.headers.add('Server-Timing', f'app;dur={request_ms:.2f}')
+        if self.log:
+            logger.info(json.dumps({
+                'method': request.method, 'path': request.path, 'endpoint': endpoint,
+                'status': response.status_code, 'duration_ms': round(request_ms, 2),
+                'db_ms': round(stats['db_ms'], 2), 'statements': stats['count'],
+                'slowest_ms': round(stats['slowest_ms'], 2), 'slowest_statement': stats['slowest'],
+            }))
+        return response
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())}
+
+
+sql_metrics = SQLMetrics()
@@ -0,0 +1,92 @@
+import itertools
+import unittest
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import event
+from app import app, db, User, Business, Review
+from config import TestConfig
+from page_cache import page_cache
+from user_cache import user_cache
+from favorites import favorites_cache
+from typeahead import typeahead
+from search_cache import search_cache
+
+
+class AppTestCase(unittest.TestCase):
+    """Base test case that provides a fresh schema and small model factories."""
+
+    phone_numbers = itertools.count(5550000000)
+    password_hash = None
+
+    @classmethod
+    def setUpClass(cls):
+        app.config.from_object(TestConfig)
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        page_cache.clear()
+        user_cache.clear()
+        favorites_cache.clear()
+        typeahead.invalidate()
+        search_cache.clear()
+
+        self.owner = self.make_user('owner')
+        self.reviewer = self.make_user('reviewer')
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_user(self, name, is_admin=False):
+        user = User(first_name=name, last_name='User', dob=date(1990, 1, 1), address='1 Main St',
+                    city='Testville', state='CA', zip='90001',
+                    phone_number=str(next(self.phone_numbers)),
+                    email=f'{name}@example.com', is_admin=is_admin)
+        if AppTestCase.password_hash is None:
+            user.set_password('password')
+            AppTestCase.password_hash = user.password_hash
+        user.password_hash = AppTestCase.password_hash
+        db.session.add(user)
+        db.session.flush()
+        return user
+
+    def make_business(self, name, **fields):
+        values = dict(business_name=name, business_category='Fitness', business_address='2 Main St',
+                      business_city='Testville', business_state='CA', business_zip='90001',
+                      business_description='A business', business_hours='Monday: 6:0 - 18:0',
+                      time_zone='UTC-08:00', user_id=self.owner.id)
+        values.update(fields)
+        business = Business(**values)
+        db.session.add(business)
+        db.session.commit()
+        return business
+
+    def add_review(self, business, rating, user=None):
+        review = Review(content='Review', rating=rating, user_id=(user or self.reviewer).id,
+                        business_id=business.id)
+        db.session.add(review)
+        Business.adjust_rating_totals(business.id, rating, 1)
+        db.session.commit()
+        return review
+
+    def login(self, user):
+        return self.client.post('/login', data=dict(email=user.email, password='password'))
+
+    @contextmanager
+    def count_statements(self):
+        """Collect the SQL statements issued inside the block."""
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
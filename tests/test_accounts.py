@@ -0,0 +1,45 @@
+import unittest
+from sqlalchemy.exc import IntegrityError
+from app import db, User
+from base import AppTestCase
+
+
+class EmailCaseTests(AppTestCase):
+
+    def signup(self, email, phone_number):
+        return self.client.post('/signup', data=dict(
+            first_name='Bob', last_name='User', dob='1990-01-01', address='1 Main St', city='Testville',
+            state='CA', zip='90001', phone_number=phone_number, email=email,
+            password='password', confirm_password='password'), follow_redirects=True)
+
+    def test_one_account_per_address_in_any_case(self):
+        self.signup('Bob@Example.com', '5551230000')
+        self.assertEqual(User.query.filter_by(phone_number='5551230000').one().email, 'bob@example.com')
+
+        response = self.signup('BOB@example.com', '5551230001')
+        self.assertIn(b'already exists', response.data)
+        self.assertEqual(User.query.filter(User.email.ilike('bob@example.com')).count(), 1)
+
+        response = self.client.post('/login', data=dict(email='bOb@EXAMPLE.com', password='password'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_profile_edits_check_and_store_lower_case(self):
+        self.login(self.reviewer)
+        data = dict(first_name='reviewer', last_name='User', dob='1990-01-01', address='1 Main St',
+                    city='Testville', state='CA', zip='90001', email='Owner@Example.com')
+        response = self.client.post('/edit-profile', data=data)
+        self.assertIn(b'Email already in use.', response.data)
+
+        data['email'] = 'New.Address@Example.com'
+        self.client.post('/edit-profile', data=data)
+        self.assertEqual(db.session.get(User, self.reviewer.id).email, 'new.address@example.com')
+
+    def test_index_rejects_addresses_differing_in_case(self):
+        with self.assertRaises(IntegrityError):
+            db.session.execute(User.__table__.update().where(User.id == self.reviewer.id)
+                               .values(email='OWNER@example.com'))
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
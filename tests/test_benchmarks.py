@@ -0,0 +1,76 @@
+import unittest
+from app import app, db, User, Business, Review, Interaction, FlaggedReview
+from benchmarks import dataset, routes
+from base import AppTestCase
+
+
+class BenchmarkTests(AppTestCase):
+
+    spec = dataset.DatasetSpec(users=30, businesses=6, owners=3, reviews_per_business=5, votes_per_review=2,
+                               favorites_per_user=2, flag_ratio=0.5, seed=7)
+
+    def snapshot(self):
+        return ([(r.business_id, r.user_id, r.rating) for r in Review.query.order_by(Review.id)],
+                [(f.review_id, f.admin_decision) for f in FlaggedReview.query.order_by(FlaggedReview.id)])
+
+    def test_dataset_is_deterministic_with_consistent_aggregates(self):
+        dataset.generate(self.spec, self.password_hash)
+        first = self.snapshot()
+        dataset.generate(self.spec, self.password_hash)
+        self.assertEqual(self.snapshot(), first)
+
+        self.assertEqual((User.query.count(), Business.query.count(), Review.query.count()), (30, 6, 30))
+        business = Business.query.get(1)
+        ratings = [r.rating for r in Review.query.filter_by(business_id=1)]
+        self.assertEqual((business.review_count, business.rating_sum), (len(ratings), sum(ratings)))
+        review = Review.query.get(1)
+        self.assertEqual(review.up_count, Interaction.query.filter_by(review_id=1, interaction_type='up').count())
+        self.assertTrue(FlaggedReview.query.count())
+
+    def test_harness_measures_routes_and_detects_regressions(self):
+        dataset.generate(self.spec, self.password_hash)
+        db.session.remove()
+        results = routes.run(app, db, self.spec, iterations=2, warmup=0, only='business_details')
+        self.assertEqual(set(results), {'business_details', 'business_details_signed_in'})
+        result = results['business_details']
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['statements'], 0)
+        self.assertGreater(result['peak_kib'], 0)
+
+        self.assertEqual(routes.compare(results, results, 0.25, 2.0), [])
+        worse = {name: dict(result, statements=result['statements'] + 1, p95_ms=result['p95_ms'] * 3 + 5)
+                 for name, result in results.items()}
+        regressions = routes.compare(worse, results, 0.25, 2.0)
+        self.assertEqual(len(regressions), 4)
+
+    def test_every_route_is_benchmarked_and_does_its_work(self):
+        adapter = app.url_map.bind('localhost')
+        covered = {adapter.match(route.url.split('?')[0].format(fixture_business_id=1, fixture_review_id=1,
+                                                               fixture_flag_id=1, fixture_user_id=1,
+                                                               business_id=1, review_id=1),
+                                 method=route.method)[0] for route in routes.ROUTES}
+        endpoints = {rule.endpoint for rule in app.url_map.iter_rules()} - {'static'}
+        self.assertEqual(endpoints - covered, set())
+
+        dataset.generate(self.spec, self.password_hash)
+        db.session.remove()
+        results = routes.run(app, db, self.spec, iterations=1, warmup=0)
+        statuses = {route.name: results[route.name]['status'] for route in routes.ROUTES}
+        expected = {route.name: 302 if route.method == 'POST' or route.name == 'logout' else 200
+                    for route in routes.ROUTES}
+        self.assertEqual(statuses, expected)
+
+        # Each write route ran twice (once timed, once for memory), and redirected because it did its work
+        db.session.remove()
+        self.assertEqual(Review.query.filter_by(content='Posted by the benchmark').count(), 2)
+        self.assertEqual(Review.query.filter_by(content='Edited by the benchmark').count(), 2)
+        self.assertEqual(FlaggedReview.query.filter_by(flag_reason='Made up by a competitor').count(), 2)
+        self.assertEqual(FlaggedReview.query.filter_by(appeal_reason='Please look at this again').count(), 2)
+        self.assertEqual(FlaggedReview.query.filter_by(admin_notes='Checked by the benchmark').count(), 4)
+        self.assertEqual(Business.query.filter(Business.business_name.like('New %')).count(), 2)
+        self.assertEqual(User.query.filter(User.email.like('new%')).count(), 2)
+        self.assertEqual(User.query.filter(User.email.like('fixture%')).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
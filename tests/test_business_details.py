@@ -0,0 +1,55 @@
+import unittest
+from app import app, db, Interaction, FlaggedReview
+from base import AppTestCase
+
+ANONYMOUS_QUERY_BUDGET = 3
+AUTHENTICATED_QUERY_BUDGET = 7
+
+
+class BusinessDetailsQueryBudgetTests(AppTestCase):
+
+    def seed_reviews(self, business, count):
+        for i in range(count):
+            review = self.add_review(business, 1 + i % 5, user=self.make_user(f'{business.business_name}{i}'))
+            db.session.add(Interaction(user_id=self.reviewer.id, review_id=review.id, interaction_type='up'))
+            db.session.add(FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                                         flag_reason='Suspicious review', admin_decision='pending'))
+        db.session.commit()
+
+    def statements_for(self, url):
+        with self.count_statements() as statements:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+
+    def test_query_count_does_not_grow_with_reviews(self):
+        small = self.make_business('Small')
+        large = self.make_business('Large')
+        self.seed_reviews(small, 2)
+        self.seed_reviews(large, 20)
+        small_url, large_url = f'/business-details/{small.id}', f'/business-details/{large.id}'
+
+        anonymous = self.statements_for(large_url)
+        self.assertLessEqual(anonymous, ANONYMOUS_QUERY_BUDGET)
+        self.assertEqual(self.statements_for(small_url), anonymous)
+
+        self.login(self.owner)
+        self.client.get(small_url)  # load the cached favorites set
+        authenticated = self.statements_for(large_url)
+        self.assertLessEqual(authenticated, AUTHENTICATED_QUERY_BUDGET)
+        self.assertEqual(self.statements_for(small_url), authenticated)
+        self.assertEqual(self.statements_for(f'{large_url}/reviews?filter_by=highest'), authenticated)
+
+    def test_flag_buttons_hidden_for_already_flagged_reviews(self):
+        business = self.make_business('Gym')
+        self.seed_reviews(business, 1)
+        unflagged = self.add_review(business, 3)
+        self.login(self.owner)
+
+        response = self.client.get(f'/business-details/{business.id}')
+        self.assertEqual(response.data.count(b'Flag Review'), 1)
+        self.assertIn(f'/flag-review/{unflagged.id}'.encode(), response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
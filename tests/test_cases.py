@@ -0,0 +1,110 @@
+import unittest
+from datetime import datetime
+from app import app, db, User, FlaggedReview
+from models import delete_user_account
+from base import AppTestCase
+
+
+class MyCasesTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_admin=True)
+        self.business = self.make_business('Gym')
+        self.other = self.make_business('Cafe', user_id=self.reviewer.id)
+        db.session.commit()
+
+    def flag(self, content, minute, business=None, **fields):
+        review = self.add_review(business or self.business, 1, user=self.make_user(f'author{minute}'))
+        review.content = content
+        values = dict(admin_decision='pending', flag_timestamp=datetime(2024, 1, 1, 0, minute))
+        values.update(fields)
+        flag = FlaggedReview(review_id=review.id, user_id=(business or self.business).user_id,
+                             flag_reason='Suspicious review', **values)
+        db.session.add(flag)
+        db.session.commit()
+        return flag
+
+    def open_cases(self, user):
+        db.session.expire_all()
+        return db.session.get(User, user.id).open_cases
+
+    def test_cases_are_grouped_and_paged_by_one_query(self):
+        for minute in range(3):
+            self.flag(f'Pending {minute}', minute)
+        self.flag('Resolved approve', 10, admin_decision='approve')
+        self.flag('Resolved deny', 11, admin_decision='deny')
+        self.flag('Appealed', 12, admin_decision='deny', appeal_reason='Please look again', appeal_decision='pending',
+                  appeal_timestamp=datetime(2024, 1, 2))
+        self.flag('Not mine', 13, business=self.other)
+        self.login(self.owner)
+
+        app.config['PAGE_SIZE'] = 2
+        try:
+            db.session.remove()
+            with self.count_statements() as statements:
+                body = self.client.get('/my-cases').data.decode()
+            self.assertEqual(len([s for s in statements if 'flagged_reviews' in s]), 1)
+            for content in ('Pending 2', 'Pending 1', 'Resolved deny', 'Resolved approve', 'Appealed'):
+                self.assertIn(content, body)
+            self.assertNotIn('Pending 0', body)
+            self.assertNotIn('Not mine', body)
+            self.assertEqual(body.count('Next page'), 1)
+
+            cursor = body.split('href="/my-cases?pending=')[1].split('"')[0]
+            body = self.client.get(f'/my-cases?pending={cursor}').data.decode()
+            self.assertIn('Pending 0', body)
+            self.assertNotIn('Pending 1', body)
+            self.assertIn('Resolved deny', body)
+        finally:
+            app.config['PAGE_SIZE'] = 25
+
+    def test_owner_without_businesses_is_sent_to_the_profile(self):
+        self.login(self.make_user('newcomer'))
+        response = self.client.get('/my-cases', follow_redirects=True)
+        self.assertIn(b'You do not have any businesses registered.', response.data)
+
+    def test_open_case_counter_follows_flags_and_appeals(self):
+        review = self.add_review(self.business, 1)
+        self.login(self.owner)
+        self.client.post(f'/flag-review/{review.id}', data=dict(reason='This review is not genuine'))
+        self.assertEqual(self.open_cases(self.owner), 1)
+        self.assertIn(b'<span class="badge bg-danger">1</span>', self.client.get('/profile').data)
+
+        flag_id = FlaggedReview.query.one().id
+        self.client.get('/logout')
+        self.login(self.admin)
+        self.client.post(f'/admin/review-decision/{flag_id}', data=dict(decision='deny', notes='Looks genuine'))
+        self.assertEqual(self.open_cases(self.owner), 0)
+
+        self.client.get('/logout')
+        self.login(self.owner)
+        self.assertNotIn(b'badge bg-danger', self.client.get('/profile').data)
+        self.client.post(f'/appeal-flagged-review/{flag_id}', data=dict(appeal_reason='Please look again'))
+        self.assertEqual(self.open_cases(self.owner), 1)
+
+        self.client.get('/logout')
+        self.login(self.admin)
+        self.client.post(f'/admin/process-appeal/{flag_id}', data=dict(decision='approve', notes='Removed'))
+        self.assertEqual(self.open_cases(self.owner), 0)
+
+    def test_deleting_flagged_reviews_and_reconciling_keep_the_counter(self):
+        self.flag('Pending', 0)
+        flag = self.flag('Other pending', 1)
+        self.flag('Resolved', 2, admin_decision='approve')
+        User.adjust_open_cases(self.owner.id, 2)
+        db.session.commit()
+
+        delete_user_account(flag.review.user_id)
+        db.session.commit()
+        self.assertEqual(self.open_cases(self.owner), 1)
+
+        User.query.update({User.open_cases: 7})
+        User.refresh_open_cases()
+        db.session.commit()
+        self.assertEqual(self.open_cases(self.owner), 1)
+        self.assertEqual(self.open_cases(self.reviewer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from app import app, db, User, Business, Review, Interaction, FlaggedReview
+from user_cache import user_cache
+from base import AppTestCase
+
+
+class BulkDeleteTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_admin=True)
+        db.session.commit()
+
+    def seed_user(self, name, count):
+        """A user who owns and reviews `count` businesses and votes on the reviews of others."""
+        user = self.make_user(name)
+        target = self.make_business(f'{name} target')
+        others = self.add_review(target, 5)
+        for i in range(count):
+            owned = self.make_business(f'{name} owned {i}', user_id=user.id)
+            self.add_review(owned, 3)
+            reviewed = self.make_business(f'{name} reviewed {i}')
+            review = self.add_review(reviewed, 4, user=user)
+            db.session.add(FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                                         flag_reason='Suspicious review', admin_decision='pending'))
+            db.session.add(Interaction(user_id=self.reviewer.id, review_id=review.id, interaction_type='up'))
+        db.session.add(Interaction(user_id=user.id, review_id=others.id, interaction_type='down'))
+        db.session.add(Interaction(user_id=user.id, business_id=target.id, interaction_type='favorite'))
+        Review.adjust_vote_counts(others.id, 0, 1)
+        db.session.commit()
+        return user, target, others
+
+    def statements_for(self, callback):
+        db.session.expire_all()
+        user_cache.clear()
+        with self.count_statements() as statements:
+            response = callback()
+        self.assertEqual(response.status_code, 302)
+        return len(statements)
+
+    def test_admin_delete_user_is_constant_and_keeps_aggregates(self):
+        small, _, _ = self.seed_user('small', 1)
+        large, target, others = self.seed_user('large', 8)
+        small_id, large_id, target_id, others_id = small.id, large.id, target.id, others.id
+        self.login(self.admin)
+
+        few = self.statements_for(lambda: self.client.post(f'/admin/delete-user/{small_id}'))
+        many = self.statements_for(lambda: self.client.post(f'/admin/delete-user/{large_id}'))
+        self.assertEqual(few, many)
+
+        db.session.expire_all()
+        self.assertIsNone(User.query.get(large_id))
+        self.assertEqual(Business.query.filter(Business.business_name.like('large owned%')).count(), 0)
+        self.assertEqual(Review.query.filter_by(user_id=large_id).count(), 0)
+        self.assertEqual(Review.query.get(others_id).down_count, 0)
+        self.assertEqual(Business.query.get(target_id).review_count, 1)
+        reviewed = Business.query.filter(Business.business_name.like('large reviewed%')).all()
+        self.assertEqual({(b.review_count, b.rating_sum) for b in reviewed}, {(0, 0)})
+
+    def test_business_delete_paths_are_constant(self):
+        small = self.make_business('Small')
+        large = self.make_business('Large')
+        for business, count in ((small, 1), (large, 10)):
+            for i in range(count):
+                review = self.add_review(business, 4, user=self.make_user(f'{business.business_name}{i}'))
+                db.session.add(Interaction(user_id=self.reviewer.id, review_id=review.id, interaction_type='up'))
+                db.session.add(FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                                             flag_reason='Suspicious review', admin_decision='pending'))
+        db.session.commit()
+        small_id, large_id = small.id, large.id
+
+        self.login(self.admin)
+        few = self.statements_for(lambda: self.client.post(f'/admin/delete-business/{small_id}'))
+        self.login(self.owner)
+        many = self.statements_for(lambda: self.client.post(f'/confirm_delete_business/{large_id}', data={'password': 'password'}))
+        self.assertEqual(few, many)
+        self.assertEqual(Business.query.count(), 0)
+        self.assertEqual(Review.query.count(), 0)
+        self.assertEqual(FlaggedReview.query.count(), 0)
+
+    def test_self_delete_removes_reviews(self):
+        business = self.make_business('Gym')
+        self.add_review(business, 4)
+        reviewer_id = self.reviewer.id
+        self.login(self.reviewer)
+
+        response = self.client.post('/delete-user', data={'password': 'password'})
+        self.assertEqual(response.status_code, 302)
+        db.session.expire_all()
+        self.assertIsNone(User.query.get(reviewer_id))
+        self.assertEqual(Business.query.get(business.id).review_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import unittest
+from app import app, db, Interaction
+from base import AppTestCase
+
+
+class ExportTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_admin=True)
+        self.gym = self.make_business('Gym', business_state='CA')
+        self.cafe = self.make_business('Cafe', business_state='NY', business_category='Automotive')
+        self.review = self.add_review(self.gym, 5)
+        self.add_review(self.cafe, 2)
+        hidden = self.add_review(self.cafe, 1, user=self.admin)
+        hidden.is_visible = False
+        db.session.add(Interaction(user_id=self.owner.id, review_id=self.review.id, interaction_type='up'))
+        db.session.add(Interaction(user_id=self.admin.id, review_id=self.review.id, interaction_type='down'))
+        db.session.commit()
+        self.login(self.admin)
+
+    def ndjson(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertTrue(response.is_streamed)
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_businesses_follow_search_filters(self):
+        rows = self.ndjson('/admin/export/businesses.ndjson?business_state=CA')
+        self.assertEqual([row['business_name'] for row in rows], ['Gym'])
+        self.assertEqual(rows[0]['review_count'], 1)
+
+        self.assertEqual(len(self.ndjson('/admin/export/businesses.ndjson')), 2)
+        self.assertEqual(self.client.get('/admin/export/businesses.ndjson?min_rating=9').status_code, 400)
+
+    def test_reviews_include_vote_counts_from_one_query(self):
+        with self.count_statements() as statements:
+            rows = self.ndjson('/admin/export/reviews.ndjson')
+        self.assertEqual(len([s for s in statements if 'reviews' in s]), 1)
+        self.assertEqual([(row['business_name'], row['rating']) for row in rows], [('Gym', 5), ('Cafe', 2)])
+        self.assertEqual((rows[0]['up_votes'], rows[0]['down_votes']), (1, 1))
+
+        rows = self.ndjson(f'/admin/export/reviews.ndjson?business_id={self.cafe.id}')
+        self.assertEqual([row['rating'] for row in rows], [2])
+        rows = self.ndjson('/admin/export/reviews.ndjson?search_business_category=Automotive')
+        self.assertEqual([row['business_name'] for row in rows], ['Cafe'])
+
+    def test_csv_export(self):
+        response = self.client.get('/admin/export/reviews.csv')
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([(row['rating'], row['up_votes']) for row in rows], [('5', '1'), ('2', '0')])
+
+    def test_export_requires_admin(self):
+        self.client.get('/logout')
+        self.login(self.reviewer)
+        response = self.client.get('/admin/export/businesses.ndjson')
+        self.assertEqual(response.status_code, 302)
+
+    def test_cli_export(self):
+        result = app.test_cli_runner().invoke(args=['export', 'businesses', '--format', 'csv',
+                                                    '--filter', 'business_state=NY'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        rows = list(csv.DictReader(io.StringIO(result.output)))
+        self.assertEqual([row['business_name'] for row in rows], ['Cafe'])
+
+
+if __name__ == '__main__':
+    unittest.main()
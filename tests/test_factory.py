@@ -0,0 +1,69 @@
+import os
+import unittest
+from flask_sqlalchemy import get_state
+import app as app_module
+from app import create_app, db
+from config import TestConfig
+from forms import SearchBusinessForm
+from geo import zip_centroid
+
+
+class AppFactoryTests(unittest.TestCase):
+
+    def test_factory_builds_an_app_without_touching_the_database(self):
+        app = create_app(dict(SQLALCHEMY_DATABASE_URI='postgresql:///no_such_database', WTF_CSRF_ENABLED=False))
+        self.assertEqual(get_state(app).connectors, {})
+
+        endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+        self.assertTrue({'index', 'login', 'business_details', 'admin.dashboard'} <= endpoints)
+        self.assertIn('import', app.cli.commands)
+        self.assertIn('sqlalchemy', app.extensions)
+        self.assertIs(app.login_manager, app_module.login_manager)
+
+        # The index needs no database, so the first response works against a missing one
+        self.assertEqual(app.test_client().get('/').status_code, 200)
+        self.assertEqual(get_state(app).connectors, {})
+
+    def test_serves_without_near_zip_search_when_the_zip_table_is_unreadable(self):
+        with self.assertLogs('validvouch.geo', 'WARNING') as logs:
+            app = create_app(dict(SQLALCHEMY_DATABASE_URI='postgresql:///no_such_database', WTF_CSRF_ENABLED=False,
+                                  ZIP_CENTROIDS_PATH='/no/such/gazetteer.txt'))
+            self.assertEqual(app.test_client().get('/').status_code, 200)
+            with app.test_request_context(method='POST', data=dict(near_zip='90001', sort_by='distance')):
+                form = SearchBusinessForm()
+                self.assertTrue(form.validate())
+                self.assertEqual(form.near_zip.data, '')
+                self.assertIsNone(zip_centroid('90001'))
+        self.assertEqual(len(logs.records), 1)
+
+    def test_config_classes_and_overrides(self):
+        app = create_app(TestConfig)
+        self.assertTrue(app.config['TESTING'])
+        self.assertEqual(app.config['SQLALCHEMY_DATABASE_URI'], 'postgresql:///test_db')
+        self.assertEqual(app.config['PAGE_SIZE'], 25)
+        self.assertFalse(app.config['DEBUG_TOOLBAR'])
+        self.assertNotIn('debugtoolbar', app.extensions)
+
+    def test_pools_are_replaced_after_fork(self):
+        app = create_app(TestConfig)
+        with app.app_context():
+            engine = db.get_engine(app)
+            engine.connect().close()
+            pool = engine.pool
+            self.assertEqual(pool.checkedin(), 1)
+
+            pid = os.fork()
+            if pid == 0:
+                os._exit(0 if engine.pool is not pool and engine.pool.checkedin() == 0 else 1)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+            self.assertIs(engine.pool, pool)
+
+            # What the fork hook does, in-process
+            app_module._dispose_engines_after_fork()
+            self.assertIsNot(engine.pool, pool)
+            self.assertEqual(engine.pool.checkedin(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
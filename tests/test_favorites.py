@@ -0,0 +1,70 @@
+import unittest
+from app import app, Interaction
+from favorites import favorites_cache
+from base import AppTestCase
+
+
+class FavoritesTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.gyms = [self.make_business(f'Gym {i}', business_category='Fitness') for i in range(3)]
+        self.cafe = self.make_business('Cafe', business_category='Restaurants')
+        self.gym_ids = [gym.id for gym in self.gyms]
+        self.cafe_id = self.cafe.id
+        self.login(self.reviewer)
+
+    def like(self, business_id):
+        return self.client.post(f'/like-business/{business_id}')
+
+    @staticmethod
+    def favorite_lookups(statements):
+        return [statement for statement in statements if 'interactions.business_id' in statement]
+
+    def test_liked_page_counts_categories_and_lists_the_selected_one(self):
+        for business_id in self.gym_ids[:2] + [self.cafe_id]:
+            self.like(business_id)
+
+        body = self.client.get('/liked-businesses').data.decode()
+        self.assertIn('Fitness (2)', body)
+        self.assertIn('Restaurants (1)', body)
+        self.assertIn('Gym 1', body)
+        self.assertIn('Cafe', body)
+
+        body = self.client.get('/liked-businesses?category=Restaurants').data.decode()
+        self.assertIn('Fitness (2)', body)
+        self.assertIn('Cafe', body)
+        self.assertNotIn('Gym 0', body)
+
+        body = self.client.get('/liked-businesses?category=Automotive').data.decode()
+        self.assertIn('No liked businesses in this category.', body)
+
+    def test_search_results_badge_liked_businesses_from_the_cached_set(self):
+        self.like(self.gym_ids[1])
+        url = '/search_results?search_business_name=Gym'
+        self.client.get(url)
+
+        with self.count_statements() as statements:
+            body = self.client.get(url).data.decode()
+        self.assertFalse(self.favorite_lookups(statements))
+        self.assertEqual(body.count('>Liked<'), 1)
+        self.assertLess(body.index('Gym 1'), body.index('>Liked<'))
+        self.assertGreaterEqual(favorites_cache.stats()['hits'], 1)
+
+        self.client.post(f'/unlike-business/{self.gym_ids[1]}')
+        self.assertNotIn('>Liked<', self.client.get(url).data.decode())
+
+    def test_details_page_reads_the_liked_state_from_the_set(self):
+        url = f'/business-details/{self.gym_ids[0]}'
+        self.assertIn(b'Like This Business', self.client.get(url).data)
+        self.like(self.gym_ids[0])
+        self.assertIn(b'Unlike', self.client.get(url).data)
+
+        with self.count_statements() as statements:
+            self.client.get(url)
+        self.assertFalse(self.favorite_lookups(statements))
+        self.assertEqual(Interaction.query.filter_by(interaction_type='favorite').count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from app import app, create_app, db, Business
+from business_helpers import perform_search
+from config import TestConfig
+from forms import SearchBusinessForm
+from geo import bounding_box, distance_expression, distance_miles, zip_centroid
+from base import AppTestCase
+
+DOWNTOWN_LA = (34.0655, -118.2405)
+
+
+class GeoTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app_context = create_app(TestConfig).app_context()
+        self.app_context.push()
+        self.addCleanup(self.app_context.pop)
+
+    def test_zip_centroids_come_from_the_bundled_table(self):
+        self.assertEqual(zip_centroid('90012'), DOWNTOWN_LA)
+        self.assertEqual(zip_centroid(' 90012 '), DOWNTOWN_LA)
+        self.assertIsNotNone(zip_centroid('59001'))  # not just big cities
+        self.assertIsNone(zip_centroid('00000'))
+        self.assertIsNone(zip_centroid(None))
+
+    def test_bounding_box_holds_the_circle(self):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(DOWNTOWN_LA, 25)
+        for corner in ((min_lat, DOWNTOWN_LA[1]), (max_lat, DOWNTOWN_LA[1])):
+            self.assertAlmostEqual(distance_miles(DOWNTOWN_LA, corner), 25, places=3)
+        self.assertGreater(distance_miles(DOWNTOWN_LA, (DOWNTOWN_LA[0], max_lon)), 25)
+        self.assertEqual(bounding_box((89.9, 0), 50)[2:], (-180.0, 180.0))
+
+
+class NearbySearchTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_business('Watts Gym', business_zip='90001')
+        self.make_business('Downtown Gym', business_zip='90012')
+        self.make_business('Beach Gym', business_zip='90401')
+        self.make_business('Harbor Gym', business_zip='92101')
+        self.make_business('Nowhere Gym', business_zip='00000')
+
+    def search(self, **data):
+        with app.test_request_context(method='POST', data=data):
+            return [b.business_name for b in perform_search(SearchBusinessForm())]
+
+    def test_businesses_are_geocoded_when_written(self):
+        business = Business.query.filter_by(business_name='Downtown Gym').one()
+        self.assertEqual((business.latitude, business.longitude), DOWNTOWN_LA)
+        self.assertIsNone(Business.query.filter_by(business_name='Nowhere Gym').one().latitude)
+
+        business.business_zip = '92101'
+        db.session.commit()
+        self.assertEqual((business.latitude, business.longitude), zip_centroid('92101'))
+
+    def test_radius_filter_and_distance_sort(self):
+        self.assertEqual(self.search(near_zip='90012', within_miles='10', sort_by='distance'),
+                         ['Downtown Gym', 'Watts Gym'])
+        self.assertEqual(self.search(near_zip='90012', within_miles='25', sort_by='distance'),
+                         ['Downtown Gym', 'Watts Gym', 'Beach Gym'])
+        self.assertEqual(len(self.search(near_zip='90012', within_miles='100')), 3)
+        self.assertEqual(len(self.search(near_zip='90012', within_miles='50', search_business_name='Harbor')), 0)
+
+        response = self.client.get('/search_results?near_zip=90012&within_miles=25&sort_by=distance')
+        self.assertIn(b'0.0 mi', response.data)
+        response = self.client.get('/search_results?near_zip=00000')
+        self.assertIn(b'No results found', response.data)
+
+    def test_sql_distance_matches_geopy(self):
+        distance = distance_expression(Business.latitude, Business.longitude, DOWNTOWN_LA)
+        for latitude, longitude, miles in db.session.query(Business.latitude, Business.longitude, distance) \
+                                                    .filter(Business.latitude.isnot(None)):
+            self.assertAlmostEqual(miles, distance_miles(DOWNTOWN_LA, (latitude, longitude)), places=6)
+
+    def test_refresh_coordinates_recomputes_every_business(self):
+        Business.query.update({Business.latitude: 0.0, Business.longitude: 0.0})
+        self.assertEqual(Business.refresh_coordinates(), 4)
+        db.session.commit()
+        db.session.expire_all()
+        located = {b.business_name: b.latitude for b in Business.query}
+        self.assertEqual(located['Watts Gym'], zip_centroid('90001')[0])
+        self.assertIsNone(located['Nowhere Gym'])
+
+
+if __name__ == '__main__':
+    unittest.main()
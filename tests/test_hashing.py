@@ -0,0 +1,54 @@
+import unittest
+from app import app, create_app, db, User
+from config import TestConfig
+from hashing import password_hasher
+from base import AppTestCase
+
+
+class PasswordHashingTests(AppTestCase):
+
+    def test_login_upgrades_hash_with_different_cost(self):
+        self.reviewer.password_hash = password_hasher.bcrypt.generate_password_hash('password', 4).decode('utf-8')
+        db.session.commit()
+        self.assertTrue(self.reviewer.password_needs_rehash())
+
+        response = self.login(self.reviewer)
+        self.assertEqual(response.status_code, 302)
+        user = User.query.get(self.reviewer.id)
+        self.assertFalse(user.password_needs_rehash())
+        self.assertTrue(user.check_password('password'))
+
+    def test_saturated_hashing_returns_503(self):
+        taken = 0
+        while password_hasher.slots.acquire(blocking=False):
+            taken += 1
+        try:
+            response = self.login(self.reviewer)
+        finally:
+            for _ in range(taken):
+                password_hasher.slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(self.login(self.reviewer).status_code, 302)
+
+    def test_cost_comes_from_the_app_config(self):
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        try:
+            pw_hash = password_hasher.hash('password')
+            self.assertTrue(pw_hash.startswith('$2b$05$'))
+            self.assertFalse(password_hasher.needs_rehash(pw_hash))
+            self.assertTrue(self.reviewer.password_needs_rehash())
+        finally:
+            app.config['BCRYPT_LOG_ROUNDS'] = TestConfig.BCRYPT_LOG_ROUNDS
+
+    def test_new_apps_shut_down_the_previous_pool(self):
+        executor = password_hasher.executor
+        create_app(TestConfig)
+        self.assertIsNot(password_hasher.executor, executor)
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)
+        self.assertTrue(password_hasher.check(self.reviewer.password_hash, 'password'))
+
+
+if __name__ == "__main__":
+    unittest.main()
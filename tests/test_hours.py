@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+from app import app, db, Business
+from models import OpeningHours
+from business_helpers import perform_search, open_now_condition
+from forms import SearchBusinessForm
+from hours import week_ranges, utc_offset_minutes, MINUTES_PER_WEEK
+from base import AppTestCase
+
+WEEKDAYS = 'Monday: 9:0 - 17:0, Tuesday: 9:0 - 17:0, Saturday: Closed, Sunday: 22:0 - 2:0'
+
+
+class HoursParsingTests(unittest.TestCase):
+
+    def test_week_ranges_split_at_week_end(self):
+        self.assertEqual(week_ranges(WEEKDAYS), [
+            (540, 1020), (1440 + 540, 1440 + 1020), (6 * 1440 + 1320, MINUTES_PER_WEEK), (0, 120)
+        ])
+        self.assertEqual(week_ranges('Monday: Closed'), [])
+        self.assertEqual(week_ranges('not hours'), [])
+
+    def test_utc_offset_minutes(self):
+        self.assertEqual(utc_offset_minutes('UTC-08:00'), -480)
+        self.assertEqual(utc_offset_minutes('UTC+05:30'), 330)
+        self.assertEqual(utc_offset_minutes('Mars/Olympus'), 0)
+
+
+class OpenHoursSearchTests(AppTestCase):
+
+    def search(self, **data):
+        with app.test_request_context(method='POST', data=data):
+            return [b.business_name for b in perform_search(SearchBusinessForm())]
+
+    def test_hours_rows_follow_business_hours(self):
+        business = self.make_business('Gym', business_hours=WEEKDAYS, time_zone='UTC+01:00')
+        self.assertEqual(OpeningHours.query.filter_by(business_id=business.id, utc_offset=60).count(), 4)
+
+        business.business_hours = 'Monday: Closed'
+        db.session.commit()
+        self.assertEqual(OpeningHours.query.filter_by(business_id=business.id).count(), 0)
+
+    def test_open_at_uses_business_local_time(self):
+        self.make_business('Day', business_hours='Monday: 9:0 - 17:0, Tuesday: 9:0 - 17:0')
+        self.make_business('Late', business_hours='Sunday: 20:0 - 4:0')
+
+        self.assertEqual(self.search(open_at='at', open_day='Mon', open_hour='10', open_minute='0'), ['Day'])
+        self.assertEqual(self.search(open_at='at', open_day='Mon', open_hour='1', open_minute='0'), ['Late'])
+        self.assertEqual(self.search(open_at='at', open_day='Sat', open_hour='10', open_minute='0'), [])
+        self.assertEqual(len(self.search(open_at='', open_day='Sat')), 2)
+
+    def test_open_now_respects_time_zone(self):
+        self.make_business('Berlin', business_hours='Monday: 9:0 - 17:0', time_zone='UTC+01:00')
+        self.make_business('Seattle', business_hours='Monday: 9:0 - 17:0', time_zone='UTC-08:00')
+
+        def open_at(now):
+            return [b.business_name for b in Business.query.filter(open_now_condition(now))]
+
+        # Monday 10:00 UTC is 11:00 in Berlin and 02:00 in Seattle
+        self.assertEqual(open_at(datetime(2024, 1, 1, 10, 0)), ['Berlin'])
+        self.assertEqual(open_at(datetime(2024, 1, 1, 18, 0)), ['Seattle'])
+
+    def test_formatted_hours_are_memoized(self):
+        Business.format_business_hours.cache_clear()
+        Business.format_business_hours(WEEKDAYS)
+        Business.format_business_hours(WEEKDAYS)
+        self.assertEqual(Business.format_business_hours.cache_info().hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import unittest
+from app import app, db, User, Business, Review
+from models import OpeningHours, SiteStat
+from base import AppTestCase
+
+USERS_CSV = """first_name,last_name,dob,address,city,state,zip,phone_number,email,password
+Ann,Lee,1990-02-03,1 Elm St,Austin,TX,73301,5551110001,ann@example.com,secret1
+Bob,Ray,1985-07-08,2 Elm St,Austin,TX,73301,5551110002,bob@example.com,secret2
+Ann,Again,1990-02-03,1 Elm St,Austin,TX,73301,5551110003,ANN@example.com,secret3
+Own,Er,1980-01-01,3 Elm St,Austin,TX,73301,5551110004,owner@example.com,secret4
+Bad,Date,not-a-date,4 Elm St,Austin,TX,73301,5551110005,bad@example.com,secret5
+"""
+
+
+class BulkImportTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner_id = self.owner.id
+        self.files = []
+
+    def tearDown(self):
+        for path in self.files:
+            os.unlink(path)
+        super().tearDown()
+
+    def run_import(self, kind, content, suffix, *options):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as file:
+            file.write(content)
+        self.files.append(path)
+        result = app.test_cli_runner().invoke(args=['import', kind, path, '--rounds', '4', *options])
+        self.assertEqual(result.exit_code, 0, result.output)
+        db.session.expire_all()
+        return result.output
+
+    def business_records(self, count, start=0, **fields):
+        return ''.join(json.dumps(dict(
+            business_name=f'Shop {start + i}', business_category='Automotive', business_address='5 Oak St',
+            business_city='Austin', business_state='TX', business_zip='73301',
+            business_description='Repairs', time_zone='UTC-05:00', owner_email='owner@example.com',
+            monday='9:00 - 17:30', tuesday='Closed', saturday='22:00-2:00', **fields)) + '\n'
+            for i in range(count))
+
+    def test_users_are_validated_and_deduplicated(self):
+        output = self.run_import('users', USERS_CSV, '.csv')
+        self.assertIn('Imported 2 users; skipped 2 duplicates and 1 invalid records.', output)
+        self.assertIn('Record 5: dob', output)
+
+        ann = User.query.filter_by(email='ann@example.com').one()
+        self.assertTrue(ann.check_password('secret1'))
+        self.assertTrue(ann.password_needs_rehash())
+        self.assertEqual(SiteStat.totals()['users'], 4)
+
+    def test_businesses_parse_hours_with_copy_and_executemany(self):
+        for copy_option, start in (('--copy', 0), ('--no-copy', 3)):
+            self.run_import('businesses', self.business_records(3, start), '.ndjson', copy_option)
+
+        businesses = Business.query.order_by(Business.business_name).all()
+        self.assertEqual(len(businesses), 6)
+        self.assertEqual(businesses[0].business_hours,
+                         'Monday: 9:0 - 17:30, Tuesday: Closed, Wednesday: Closed, Thursday: Closed, '
+                         'Friday: Closed, Saturday: 22:0 - 2:0, Sunday: Closed')
+        self.assertEqual({b.user_id for b in businesses}, {self.owner_id})
+        self.assertEqual({b.business_phone for b in businesses}, {None})
+        self.assertEqual(OpeningHours.query.count(), 12)
+        self.assertEqual(SiteStat.totals()['businesses'], 6)
+
+        output = self.run_import('businesses', self.business_records(2), '.ndjson')
+        self.assertIn('Imported 0 businesses; skipped 2 duplicates', output)
+
+    def test_stored_hours_format_and_invalid_rows(self):
+        records = self.business_records(1, business_hours='Monday: 6:0 - 18:0, Friday: 7:15 - 9:45')
+        records += json.dumps(dict(json.loads(records), business_name='Odd', monday='9:10 - 17:00')) + '\n'
+        records += json.dumps(dict(json.loads(records.splitlines()[0]), business_name='Nobody',
+                                   owner_email='missing@example.com')) + '\n'
+        output = self.run_import('businesses', records, '.ndjson')
+        self.assertIn('Imported 1 businesses', output)
+        self.assertIn('Record 2: monday_hours_open', output)
+        self.assertIn('Record 3: owner_email', output)
+        self.assertEqual(Business.query.one().business_hours.split(', ')[4], 'Friday: 7:15 - 9:45')
+
+    def test_reviews_rebuild_aggregates(self):
+        gym_id = self.make_business('Gym').id
+        reviewers = [self.make_user(f'critic{i}') for i in range(3)]
+        db.session.commit()
+        records = [dict(email=user.email, business_name='Gym', rating=rating, content='Solid',
+                        created_at='2024-03-01T10:00:00') for user, rating in zip(reviewers, (5, 4, 2))]
+        records.append(dict(records[0], rating=1))
+        records.append(dict(email='owner@example.com', business_name='Gym', rating=5, content='Mine'))
+        self.assertNotIn(b'Solid', self.client.get(f'/business-details/{gym_id}').data)  # now cached
+        output = self.run_import('reviews', ''.join(json.dumps(r) + '\n' for r in records), '.ndjson')
+        self.assertIn('Imported 3 reviews; skipped 1 duplicates and 1 invalid records.', output)
+
+        gym = Business.query.get(gym_id)
+        self.assertEqual((gym.review_count, gym.rating_sum), (3, 11))
+        self.assertEqual(SiteStat.totals()['reviews'], 3)
+        self.assertEqual(Review.query.filter_by(business_id=gym_id).first().created_at.year, 2024)
+        self.assertIn(b'Solid', self.client.get(f'/business-details/{gym_id}').data)
+
+    def test_statements_do_not_grow_with_batch_size(self):
+        counts = []
+        for count in (2, 20):
+            Business.query.delete()
+            db.session.commit()
+            with self.count_statements() as statements:
+                self.run_import('businesses', self.business_records(count), '.ndjson')
+            counts.append(len(statements))
+        self.assertEqual(Business.query.count(), 20)
+        self.assertEqual(counts[0], counts[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
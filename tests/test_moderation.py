@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import app, db, FlaggedReview
+from moderation import claim_batch
+from base import AppTestCase
+
+
+class ModerationQueueTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.batch_size = app.config['MODERATION_BATCH_SIZE']
+        app.config['MODERATION_BATCH_SIZE'] = 2
+        self.first = self.make_user('first', is_admin=True)
+        self.second = self.make_user('second', is_admin=True)
+        self.flag_ids = []
+        for i in range(5):
+            review = self.add_review(self.make_business(f'Gym {i}'), 1)
+            flag = FlaggedReview(review_id=review.id, user_id=self.owner.id, flag_reason='Suspicious review',
+                                 admin_decision='pending', flag_timestamp=datetime(2024, 1, 1, 0, i))
+            db.session.add(flag)
+            db.session.flush()
+            self.flag_ids.append(flag.id)
+        db.session.commit()
+
+    def tearDown(self):
+        app.config['MODERATION_BATCH_SIZE'] = self.batch_size
+        super().tearDown()
+
+    def claims(self, user):
+        db.session.expire_all()
+        return [flag.id for flag in FlaggedReview.query.filter_by(claimed_by=user.id).order_by(FlaggedReview.id)]
+
+    def as_admin(self, user):
+        self.client.get('/logout')
+        self.login(user)
+
+    def claim(self, queue='flags'):
+        return self.client.post(f'/admin/claim-batch/{queue}', follow_redirects=True)
+
+    def test_moderators_get_disjoint_batches(self):
+        self.as_admin(self.first)
+        self.claim()
+        self.as_admin(self.second)
+        response = self.claim()
+        self.assertEqual(response.data.count(b'Make Decision'), 2)
+
+        self.assertEqual(self.claims(self.first), self.flag_ids[:2])
+        self.assertEqual(self.claims(self.second), self.flag_ids[2:4])
+
+        # Claiming again renews the same batch rather than taking more
+        self.as_admin(self.first)
+        self.claim()
+        self.assertEqual(self.claims(self.first), self.flag_ids[:2])
+
+    def test_viewing_claims_and_locks_nothing(self):
+        self.as_admin(self.first)
+        with self.count_statements() as statements:
+            response = self.client.get('/admin/flagged-reviews')
+            self.client.get('/admin/appeals')
+            self.client.get(f'/admin/review-decision/{self.flag_ids[0]}')
+        self.assertNotIn(b'Make Decision', response.data)
+        self.assertEqual(self.claims(self.first), [])
+        self.assertFalse([statement for statement in statements
+                          if 'FOR UPDATE' in statement or not statement.lstrip().upper().startswith('SELECT')])
+
+    def test_claimed_item_cannot_be_decided_by_another_moderator(self):
+        self.as_admin(self.first)
+        self.claim()
+        flag_id = self.flag_ids[0]
+
+        self.as_admin(self.second)
+        response = self.client.post(f'/admin/review-decision/{flag_id}', data=dict(decision='approve', notes='No'),
+                                    follow_redirects=True)
+        self.assertIn(b'claimed by another moderator', response.data)
+        self.claim()
+
+        self.as_admin(self.first)
+        self.client.post(f'/admin/review-decision/{flag_id}', data=dict(decision='approve', notes='Fake'))
+        db.session.expire_all()
+        flag = FlaggedReview.query.get(flag_id)
+        self.assertEqual((flag.admin_decision, flag.claimed_by), ('approve', None))
+
+        # Decided items leave the queue, and the next claim tops the batch up past the second moderator's claims
+        response = self.client.post(f'/admin/review-decision/{flag_id}', data=dict(decision='deny', notes='Again'),
+                                    follow_redirects=True)
+        self.assertIn(b'already been decided', response.data)
+        self.assertEqual(self.claims(self.first), [self.flag_ids[1]])
+        self.claim()
+        self.assertEqual(self.claims(self.first), [self.flag_ids[1], self.flag_ids[4]])
+
+    def test_expired_leases_return_to_the_queue(self):
+        claim_batch('flags', self.first.id, 2, lease_seconds=60)
+        FlaggedReview.query.filter(FlaggedReview.id == self.flag_ids[0]).update(
+            {FlaggedReview.claim_expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+        claim_batch('flags', self.second.id, 2, lease_seconds=60)
+        db.session.commit()
+        self.assertEqual(self.claims(self.second), [self.flag_ids[0], self.flag_ids[2]])
+
+    def test_rows_locked_by_another_moderator_are_skipped(self):
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        try:
+            connection.execute(text('SELECT id FROM flagged_reviews WHERE id = :id FOR UPDATE'),
+                               {'id': self.flag_ids[0]})
+            claim_batch('flags', self.first.id, 2, lease_seconds=60)
+            db.session.commit()
+        finally:
+            transaction.rollback()
+            connection.close()
+        self.assertEqual(self.claims(self.first), self.flag_ids[1:3])
+
+    def test_queue_page_eager_loads_reviews(self):
+        app.config['MODERATION_BATCH_SIZE'] = 1
+        self.as_admin(self.first)
+        self.claim()
+        with self.count_statements() as one:
+            self.client.get('/admin/flagged-reviews')
+
+        app.config['MODERATION_BATCH_SIZE'] = 4
+        self.claim()
+        with self.count_statements() as four:
+            response = self.client.get('/admin/flagged-reviews')
+        self.assertEqual(len(one), len(four))
+        self.assertEqual(response.data.count(b'Make Decision'), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
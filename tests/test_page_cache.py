@@ -0,0 +1,133 @@
+import tempfile
+import time
+import unittest
+from app import app, db, Review
+from page_cache import page_cache, MemoryBackend, FileSystemBackend
+from base import AppTestCase
+
+
+class PageCacheTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.anonymous = app.test_client()
+
+    def get(self, url):
+        with self.count_statements() as statements:
+            response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(statements)
+
+    def test_anonymous_details_served_from_cache_until_vote(self):
+        business = self.make_business('Gym')
+        review = self.add_review(business, 4)
+        url = f'/business-details/{business.id}'
+
+        response, _ = self.get(url)
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        response, statements = self.get(url)
+        self.assertEqual(response.headers['X-Page-Cache'], 'HIT')
+        self.assertEqual(statements, 0)
+        self.assertIn(b'Upvotes: 0', response.data)
+
+        app.config['REVIEW_VOTE_COUNTERS'] = True
+        try:
+            self.login(self.owner)
+            self.client.post(f'/vote-review/{review.id}/up')
+            response, _ = self.get(url)
+        finally:
+            app.config['REVIEW_VOTE_COUNTERS'] = False
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        self.assertIn(b'Upvotes: 1', response.data)
+
+    def test_authenticated_pages_are_not_cached(self):
+        business = self.make_business('Gym')
+        self.login(self.reviewer)
+        self.client.get(f'/business-details/{business.id}')
+        response = self.client.get(f'/business-details/{business.id}')
+        self.assertNotIn('X-Page-Cache', response.headers)
+        self.assertEqual(page_cache.stats()['entries'], 0)
+
+    def test_search_redirects_to_cacheable_url(self):
+        self.make_business('Alpha Gym')
+        response = self.anonymous.post('/', data={'search_business_name': ' alpha ', 'sort_by': 'relevance'})
+        self.assertEqual(response.status_code, 302)
+        url = response.headers['Location']
+        self.assertIn('search_business_name=alpha', url)
+
+        response, _ = self.get(url)
+        self.assertIn(b'Alpha Gym', response.data)
+        self.assertEqual(self.get(url)[0].headers['X-Page-Cache'], 'HIT')
+
+        self.make_business('Alpha Yoga')
+        page_cache.bump('directory')
+        response, _ = self.get(url)
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        self.assertIn(b'Alpha Yoga', response.data)
+
+    def test_moderation_invalidates_business_page(self):
+        business = self.make_business('Gym')
+        review = self.add_review(business, 4)
+        review.content = 'Hidden soon'
+        db.session.commit()
+        self.assertIn(b'Hidden soon', self.get(f'/business-details/{business.id}')[0].data)
+
+        admin = self.make_user('admin', is_admin=True)
+        flagged = self.make_flag(review)
+        self.login(admin)
+        self.client.post(f'/admin/review-decision/{flagged}', data={'decision': 'approve', 'notes': 'Spam'})
+        self.assertFalse(Review.query.get(review.id).is_visible)
+        self.assertNotIn(b'Hidden soon', self.get(f'/business-details/{business.id}')[0].data)
+
+        stats = self.client.get('/admin/page-cache').get_json()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 2))
+
+    def make_flag(self, review):
+        from models import FlaggedReview
+        flag = FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                             flag_reason='Suspicious review', admin_decision='pending')
+        db.session.add(flag)
+        db.session.commit()
+        return flag.id
+
+
+class PageCacheBackendTests(unittest.TestCase):
+
+    def test_memory_backend_evicts_least_recently_used_and_expired(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (1, None, 3))
+
+        backend.set('d', 4, timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.get('d'))
+
+    def test_filesystem_backend_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = FileSystemBackend(directory)
+            backend.set('page:key', (b'<html>', 'text/html'), timeout=60)
+            self.assertEqual(backend.get('page:key'), (b'<html>', 'text/html'))
+            self.assertEqual(len(backend), 1)
+            backend.clear()
+            self.assertIsNone(backend.get('page:key'))
+
+    def test_filesystem_backend_deletes_expired_and_excess_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = FileSystemBackend(directory, max_entries=3, sweep_every=4)
+            backend.set('expired', 1, timeout=0.01)
+            time.sleep(0.02)
+            self.assertIsNone(backend.get('expired'))
+            self.assertEqual(len(backend), 0)
+
+            for i in range(7):  # the last write sweeps
+                backend.set(f'page:{i}', i, timeout=60)
+                time.sleep(0.01)  # distinct modification times
+            self.assertEqual(len(backend), 3)
+            self.assertEqual([backend.get(f'page:{i}') for i in range(4, 7)], [4, 5, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app import app, db, Business, Review
+from business_helpers import perform_search
+from forms import SearchBusinessForm
+from pagination import encode_cursor, decode_cursor, paginate
+from base import AppTestCase
+
+
+class PaginationTests(AppTestCase):
+
+    def test_cursor_round_trip(self):
+        values = [datetime(2024, 5, 1, 12, 30), Decimal('3.5'), 7]
+        self.assertEqual(decode_cursor(encode_cursor(values), 3), values)
+        self.assertIsNone(decode_cursor('not-a-cursor', 3))
+        self.assertIsNone(decode_cursor(encode_cursor([1]), 3))
+
+    def test_search_pages_cover_every_row_once(self):
+        for i in range(7):
+            business = self.make_business(f'Business {i}')
+            self.add_review(business, 5 if i % 2 else 3)
+
+        seen, cursor = [], None
+        while True:
+            with app.test_request_context(method='POST', data={'sort_by': 'highest'}):
+                page = perform_search(SearchBusinessForm(), cursor, per_page=3)
+            seen.extend(business.business_name for business in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        ratings = [Business.query.filter_by(business_name=name).one().rating_average for name in seen]
+        self.assertEqual(ratings, sorted(ratings, reverse=True))
+
+    def test_ties_at_repeating_averages_page_cleanly(self):
+        # 13/3 has no exact decimal form, so the cursor must carry the same double the query compares
+        for name in ('Tied A', 'Tied B', 'Tied C'):
+            business = self.make_business(name)
+            for i, rating in enumerate((5, 4, 4)):
+                self.add_review(business, rating, user=self.make_user(f'tie{business.id}x{i}'))
+        self.add_review(self.make_business('Lower'), 2)
+
+        for ordering in ([Business.rating_average.desc(), Business.id.desc()],
+                         [Business.rating_average.asc(), Business.id.asc()]):
+            seen, cursor = [], None
+            while True:
+                page = paginate(Business.query, ordering, cursor, per_page=1)
+                seen.extend(business.id for business in page)
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            expected = [business.id for business in Business.query.order_by(*ordering)]
+            self.assertEqual(seen, expected)
+
+    def test_filter_reviews_pages_by_date(self):
+        business = self.make_business('Gym')
+        start = datetime(2024, 1, 1)
+        for i in range(5):
+            review = self.add_review(business, 4, user=self.make_user(f'reviewer{i}'))
+            review.content = f'Review number {i}'
+            review.created_at = start + timedelta(days=i)
+        db.session.commit()
+
+        app.config['PAGE_SIZE'] = 2
+        try:
+            response = self.client.get(f'/business-details/{business.id}/reviews?filter_by=newest')
+            self.assertIn(b'Review number 4', response.data)
+            self.assertIn(b'Review number 3', response.data)
+            self.assertNotIn(b'Review number 2', response.data)
+            self.assertIn(b'Next page', response.data)
+        finally:
+            app.config['PAGE_SIZE'] = 25
+
+
+if __name__ == "__main__":
+    unittest.main()
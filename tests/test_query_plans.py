@@ -0,0 +1,177 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+from app import app, db, Business, Interaction, FlaggedReview
+from models import OpeningHours
+from base import AppTestCase
+
+HOT_TABLES = {'users', 'businesses', 'reviews', 'interactions', 'flagged_reviews', 'opening_hours'}
+
+
+def full_scans(plan, found=None, partial_indexes=(), locking=False):
+    """Collect scans on hot tables that read the whole relation instead of an index range.
+
+    Under a row lock PostgreSQL re-checks a partial index's predicate as a
+    Filter, so an ordered walk of a partial index there is not a full scan.
+    """
+    found = [] if found is None else found
+    relation = plan.get('Relation Name')
+    if relation in HOT_TABLES:
+        if plan['Node Type'] == 'Seq Scan':
+            found.append(f"Seq Scan on {relation}")
+        elif plan['Node Type'] in ('Index Scan', 'Index Only Scan') \
+                and 'Index Cond' not in plan and 'Filter' in plan \
+                and not (locking and plan['Index Name'] in partial_indexes):
+            found.append(f"Filtered full index scan on {relation} using {plan['Index Name']}")
+    for child in plan.get('Plans', []):
+        full_scans(child, found, partial_indexes, plan['Node Type'] == 'LockRows')
+    return found
+
+
+def index_names(plan, found=None):
+    """Collect the names of every index a plan reads."""
+    found = set() if found is None else found
+    if 'Index Name' in plan:
+        found.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        index_names(child, found)
+    return found
+
+
+class QueryPlanTests(AppTestCase):
+    """Run each hot route on seeded data and EXPLAIN every statement it issues.
+
+    Sequential scans and hash/merge joins are disabled while explaining, so the
+    planner only reads a whole table when no index can serve the lookup.
+    """
+
+    def setUp(self):
+        super().setUp()
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('query plan checks need PostgreSQL')
+
+        self.admin = self.make_user('admin', is_admin=True)
+        other_owner = self.make_user('other_owner')
+        users = [self.make_user(f'user{i}') for i in range(30)]
+        self.businesses = [self.make_business(f'Business {i}', user_id=(self.owner if i < 2 else other_owner).id)
+                           for i in range(20)]
+        start = datetime(2024, 1, 1)
+        for b_index, business in enumerate(self.businesses):
+            for user in users[b_index % 5::5]:
+                review = self.add_review(business, 1 + (user.id + b_index) % 5, user=user)
+                review.created_at = start + timedelta(hours=review.id)
+                db.session.add(Interaction(user_id=self.owner.id, review_id=review.id,
+                                           interaction_type='up' if review.id % 3 else 'down'))
+                if review.id % 4 == 0:
+                    db.session.add(FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                                                 flag_reason='Suspicious review', admin_decision='pending'))
+                if review.id % 7 == 0:
+                    db.session.add(FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                                                 flag_reason='Suspicious review', admin_decision='deny',
+                                                 appeal_reason='Please look again', appeal_decision='pending',
+                                                 appeal_timestamp=start))
+            db.session.add(Interaction(user_id=users[0].id, business_id=business.id, interaction_type='favorite'))
+        self.review_id = review.id
+        db.session.commit()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+    def capture(self, callback):
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            callback()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return statements
+
+    def assert_no_full_scans(self, statements):
+        """Fail on any full scan of a hot table and return the indexes the plans used."""
+        used = set()
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT indexrelid::regclass::text FROM pg_index WHERE indpred IS NOT NULL')
+            partial_indexes = {name for name, in cursor.fetchall()}
+            for setting in ('enable_seqscan', 'enable_hashjoin', 'enable_mergejoin'):
+                cursor.execute(f'SET {setting} = off')
+            for statement, parameters in statements:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+                plan = cursor.fetchone()[0]
+                plan = plan if isinstance(plan, list) else json.loads(plan)
+                scans = full_scans(plan[0]['Plan'], partial_indexes=partial_indexes)
+                self.assertFalse(scans, f"{scans} in:\n{statement}")
+                index_names(plan[0]['Plan'], used)
+        finally:
+            connection.rollback()
+            connection.close()
+        return used
+
+    def test_owner_routes_use_indexes(self):
+        business_id = self.businesses[1].id
+        self.login(self.owner)
+
+        def visit():
+            self.client.get(f'/business-details/{business_id}')
+            self.client.get(f'/business-details/{business_id}/reviews?filter_by=highest')
+            self.client.get(f'/business-details/{business_id}/reviews?filter_by=helpful')
+            self.client.get('/my-cases')
+            self.client.post(f'/vote-review/{self.review_id}/down')
+
+        self.assert_no_full_scans(self.capture(visit))
+
+    def test_login_and_favorites_use_indexes(self):
+        def visit():
+            self.client.post('/login', data=dict(email='USER0@example.com', password='password'))
+            self.client.get('/liked-businesses')
+
+        self.assert_no_full_scans(self.capture(visit))
+
+    def test_admin_queues_use_indexes(self):
+        self.login(self.admin)
+
+        def visit():
+            self.client.post('/admin/claim-batch/flags')
+            self.client.post('/admin/claim-batch/appeals')
+            self.client.get('/admin/flagged-reviews')
+            self.client.get('/admin/appeals')
+            self.client.get('/admin/users')
+
+        self.assert_no_full_scans(self.capture(visit))
+
+    def test_open_hours_search_uses_indexes(self):
+        # Many businesses with a week of hours each, so an index beats probing every business
+        businesses = db.session.execute(Business.__table__.insert().returning(Business.id), [
+            dict(business_name=f'Shop {i}', business_category='Fitness', business_address='2 Main St',
+                 business_city='Testville', business_state='CA', business_zip='90001',
+                 business_description='A shop', business_hours='', time_zone='UTC+01:00',
+                 user_id=self.owner.id, created_at=datetime(2024, 1, 1), latitude=33.9731, longitude=-118.2479)
+            for i in range(500)
+        ]).scalars().all()
+        offsets = (-480, -300, 60, 330, 540)
+        db.session.execute(OpeningHours.__table__.insert(), [
+            dict(business_id=business_id, start_minute=day * 1440 + 540, end_minute=day * 1440 + 1020,
+                 utc_offset=offsets[business_id % len(offsets)])
+            for business_id in businesses for day in range(7)
+        ])
+        db.session.commit()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+        def visit():
+            self.client.get('/search_results?open_at=now')
+            self.client.get('/search_results?open_at=at&open_day=Tue&open_hour=9&open_minute=30')
+            self.client.get('/search_results?near_zip=90001&within_miles=25&sort_by=distance')
+
+        used = self.assert_no_full_scans(self.capture(visit))
+        self.assertLessEqual({'ix_opening_hours_offset_window', 'ix_opening_hours_window', 'ix_businesses_location'}, used)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from app import app, db, Business
+from business_helpers import perform_search
+from forms import SearchBusinessForm
+from base import AppTestCase
+
+
+class RatingTotalsTests(AppTestCase):
+
+    def search(self, **data):
+        with app.test_request_context(method='POST', data=data):
+            return perform_search(SearchBusinessForm())
+
+    def test_visibility_flip_updates_totals(self):
+        business = self.make_business('Gym')
+        review = self.add_review(business, 4)
+        self.add_review(business, 2, user=self.make_user('second'))
+
+        db.session.refresh(business)
+        self.assertEqual((business.review_count, business.rating_sum), (2, 6))
+        self.assertEqual(business.average_rating(), 3)
+
+        review.set_visibility(False)
+        db.session.commit()
+        db.session.refresh(business)
+        self.assertEqual((business.review_count, business.rating_sum), (1, 2))
+
+        Business.query.filter_by(id=business.id).update({Business.review_count: 0, Business.rating_sum: 0})
+        Business.refresh_rating_totals()
+        db.session.commit()
+        db.session.refresh(business)
+        self.assertEqual((business.review_count, business.rating_sum), (1, 2))
+
+    def test_search_filters_and_sorts_in_sql(self):
+        high = self.make_business('High')
+        low = self.make_business('Low')
+        busy = self.make_business('Busy')
+        self.add_review(high, 5)
+        self.add_review(low, 1)
+        self.add_review(busy, 3)
+        self.add_review(busy, 4, user=self.make_user('second'))
+
+        names = [b.business_name for b in self.search(sort_by='highest')]
+        self.assertEqual(names, ['High', 'Busy', 'Low'])
+        names = [b.business_name for b in self.search(sort_by='most_reviews')]
+        self.assertEqual(names[0], 'Busy')
+        names = [b.business_name for b in self.search(min_rating='3', sort_by='lowest')]
+        self.assertEqual(names, ['Busy', 'High'])
+
+
+if __name__ == "__main__":
+    unittest.main()
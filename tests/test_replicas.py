@@ -0,0 +1,106 @@
+import unittest
+from flask import g, session
+from sqlalchemy import select, text, update
+from app import app, db, User, Business, Review
+from replicas import replica_router, STICKY_KEY
+from base import AppTestCase
+
+# A second database stands in for the replica. Rows are copied into it by hand and then made to
+# differ, so a page shows which database served it.
+REPLICA_URI = 'postgresql:///test_replica'
+
+
+class ReplicaRoutingTests(AppTestCase):
+
+    def setUp(self):
+        self.binds = app.config.get('SQLALCHEMY_BINDS')
+        app.config['SQLALCHEMY_BINDS'] = {'replica': REPLICA_URI}
+        super().setUp()
+        self.replica = replica_router.replica_engine(app)
+        db.Model.metadata.create_all(self.replica)
+        replica_router.set_lag(app, 0)
+
+        self.business_id = self.make_business('Gym').id
+        with self.replica.begin() as connection:
+            for table in (User.__table__, Business.__table__):
+                rows = [dict(row._mapping) for row in db.session.execute(select(table))]
+                connection.execute(table.insert(), rows)
+            connection.execute(update(Business.__table__).values(business_name='Stale Gym'))
+        self.login(self.reviewer)
+
+    def tearDown(self):
+        db.session.remove()
+        db.Model.metadata.drop_all(self.replica)
+        self.replica.dispose()
+        app.config['SQLALCHEMY_BINDS'] = self.binds
+        super().tearDown()
+
+    def details(self):
+        db.session.remove()  # a fresh session per request, as outside the tests
+        return self.client.get(f'/business-details/{self.business_id}').data
+
+    def test_get_requests_read_from_the_replica(self):
+        self.assertIn(b'Stale Gym', self.details())
+
+    def test_reads_after_a_write_stick_to_the_primary(self):
+        db.session.remove()
+        response = self.client.post(f'/leave-review/{self.business_id}', data=dict(
+            content='Great place', rating=5, proof_of_purchase='y'), follow_redirects=True)
+        self.assertNotIn(b'Stale Gym', response.data)
+        self.assertIn(b'Great place', response.data)
+        self.assertIn(b'Great place', self.details())
+
+        with self.client.session_transaction() as browser:
+            browser[STICKY_KEY] = 0
+        self.assertIn(b'Stale Gym', self.details())
+
+    def test_text_searches_read_from_the_replica(self):
+        db.session.remove()
+        response = self.client.get('/search_results?search_business_name=Gym')
+        self.assertIn(b'Stale Gym', response.data)
+        with self.client.session_transaction() as browser:
+            self.assertNotIn(STICKY_KEY, browser)
+        self.assertIn(b'Stale Gym', self.details())
+
+    def test_lagging_or_unreachable_replica_falls_back_to_the_primary(self):
+        replica_router.set_lag(app, app.config['REPLICA_MAX_LAG_SECONDS'] + 1)
+        self.assertNotIn(b'Stale Gym', self.details())
+        replica_router.set_lag(app, None)
+        self.assertNotIn(b'Stale Gym', self.details())
+        replica_router.set_lag(app, 0)
+        self.assertIn(b'Stale Gym', self.details())
+
+    def test_a_session_that_wrote_reads_from_the_primary(self):
+        db.session.remove()
+        with app.test_request_context('/'):
+            reads = select(Review.__table__)
+            self.assertIs(db.session.get_bind(clause=reads), self.replica)
+            db.session.get_bind()
+            db.session.connection()
+            db.session.execute(text('SELECT 1'))
+            self.assertIs(db.session.get_bind(clause=reads), self.replica)
+            self.assertNotIn('wrote_to_primary', g)
+            db.session.execute(update(Review.__table__).values(rating=Review.rating))
+            self.assertIsNot(db.session.get_bind(clause=reads), self.replica)
+            db.session.remove()
+
+        with app.test_request_context('/'):
+            self.assertIsNot(db.session.get_bind(clause=reads.with_for_update()), self.replica)
+            db.session.remove()
+
+        with app.test_request_context('/'):
+            db.session.add(Review(content='Flushed', rating=4, user_id=self.reviewer.id,
+                                  business_id=self.business_id))
+            db.session.flush()
+            self.assertIsNot(db.session.get_bind(clause=reads), self.replica)
+            self.assertTrue(g.wrote_to_primary)
+            db.session.remove()
+
+        with app.test_request_context('/', method='POST'):
+            self.assertIsNot(db.session.get_bind(clause=select(Review.__table__)), self.replica)
+            self.assertNotIn(STICKY_KEY, session)
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import app, db, Business
+from business_helpers import perform_search
+from forms import SearchBusinessForm
+from search import match_text
+from base import AppTestCase
+
+
+class SearchTests(AppTestCase):
+
+    def search(self, **data):
+        with app.test_request_context(method='POST', data=data):
+            return [b.business_name for b in perform_search(SearchBusinessForm())]
+
+    def test_relevance_ranks_name_matches_first(self):
+        self.make_business('Pizza Palace', business_category='Food & Dining')
+        self.make_business('Corner Gym', business_description='Pizza party every Friday after spin class')
+        self.make_business('Book Nook', business_category='Shopping & Retail')
+
+        self.assertEqual(self.search(search_business_name='pizz', sort_by='relevance'),
+                         ['Pizza Palace', 'Corner Gym'])
+        self.assertEqual(self.search(search_business_name='food'), ['Pizza Palace'])
+
+    def test_city_matches_by_prefix(self):
+        self.make_business('Uptown', business_city='San Diego')
+        self.make_business('Downtown', business_city='Santa Fe')
+        self.make_business('Midtown', business_city='Austin')
+
+        self.assertEqual(sorted(self.search(search_business_city='san')), ['Downtown', 'Uptown'])
+        self.assertEqual(self.search(search_business_city='San D'), ['Uptown'])
+
+    def test_sqlite_fts_fallback(self):
+        engine = create_engine('sqlite://')
+        db.Model.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add_all([
+                Business(business_name='Pizza Palace', business_category='Food & Dining',
+                         business_address='1 Main St', business_city='Austin', business_state='TX',
+                         business_zip='73301', business_description='Wood-fired pies',
+                         business_hours='Monday: Closed', time_zone='UTC-05:00', user_id=1),
+                Business(business_name='Corner Gym', business_category='Fitness',
+                         business_address='2 Main St', business_city='Austin', business_state='TX',
+                         business_zip='73301', business_description='Weights and pizza Fridays',
+                         business_hours='Monday: Closed', time_zone='UTC-05:00', user_id=1),
+            ])
+            session.commit()
+
+            query, rank = match_text(session.query(Business), 'pizza')
+            self.assertEqual(len(query.all()), 2)
+            query, rank = match_text(session.query(Business), 'wood fired')
+            self.assertEqual([b.business_name for b in query.order_by(rank.desc())], ['Pizza Palace'])
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
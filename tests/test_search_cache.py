@@ -0,0 +1,118 @@
+import unittest
+from app import app, db
+from business_helpers import perform_search
+from forms import SearchBusinessForm
+from page_cache import page_cache, MemoryBackend
+from search_cache import search_cache
+from base import AppTestCase
+
+
+class SearchCacheTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.make_business(f'Pizza Place {i}', business_category='Food & Dining', business_city='San Diego')
+        self.make_business('Corner Gym')
+
+    def search(self, cursor=None, per_page=25, **data):
+        with app.test_request_context(method='POST', data=data):
+            return perform_search(SearchBusinessForm(), cursor, per_page)
+
+    def names(self, **data):
+        return [business.business_name for business in self.search(**data)]
+
+    def test_equal_searches_share_one_entry(self):
+        expected = self.names(search_business_name='Pizza', search_business_city='San Diego')
+        self.assertEqual(len(expected), 5)
+        with self.count_statements() as statements:
+            again = self.names(search_business_name='  pizza ', search_business_city='SAN  diego',
+                               sort_by='relevance')
+        self.assertEqual(again, expected)
+        self.assertEqual(len(statements), 1)
+        self.assertIn('businesses.id IN', statements[0])
+        self.assertEqual(search_cache.stats()['hits'], 1)
+        self.assertEqual(search_cache.stats()['misses'], 1)
+
+        self.names(search_business_name='Pizza', sort_by='highest')
+        self.assertEqual(search_cache.stats()['entries'], 2)
+
+    def test_pages_load_only_their_rows(self):
+        seen, cursor = [], None
+        while True:
+            page = self.search(cursor, per_page=2, search_business_category='Food & Dining', sort_by='most_reviews')
+            self.assertLessEqual(len(page), 2)
+            seen.extend(business.business_name for business in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen), [f'Pizza Place {i}' for i in range(5)])
+        self.assertEqual(search_cache.stats()['misses'], 1)
+
+    def test_cursors_survive_writes_between_pages(self):
+        data = dict(search_business_category='Food & Dining', sort_by='most_reviews')
+        expected = self.names(**data)
+        first = self.search(per_page=2, **data)
+        self.assertEqual([business.business_name for business in first], expected[:2])
+
+        # The cursor's own row is gone from the new results, so keyset pagination carries on from it
+        db.session.delete(first.items[-1])
+        db.session.commit()
+        page_cache.bump('directory')
+        second = self.search(first.next_cursor, per_page=2, **data)
+        self.assertEqual([business.business_name for business in second], expected[2:4])
+
+        # Growing past SEARCH_CACHE_MAX_IDS, and back, keeps the reader's place too
+        max_ids = search_cache.max_ids
+        search_cache.max_ids = 2
+        try:
+            page_cache.bump('directory')
+            third = self.search(first.next_cursor, per_page=1, **data)
+        finally:
+            search_cache.max_ids = max_ids
+        self.assertEqual([business.business_name for business in third], expected[2:3])
+        page_cache.bump('directory')
+        fourth = self.search(third.next_cursor, per_page=2, **data)
+        self.assertEqual([business.business_name for business in fourth], expected[3:5])
+        self.assertFalse(fourth.has_next)
+        self.assertEqual(search_cache.stats()['misses'], 4)
+
+    def test_directory_writes_retire_cached_results(self):
+        self.assertEqual(len(self.names(search_business_category='Food & Dining')), 5)
+        self.make_business('Pizza Place 5', business_category='Food & Dining')
+        self.assertEqual(len(self.names(search_business_category='Food & Dining')), 5)
+
+        page_cache.bump('directory')
+        self.assertEqual(len(self.names(search_business_category='Food & Dining')), 6)
+
+    def test_large_results_and_open_now_bypass_the_cache(self):
+        max_ids = search_cache.max_ids
+        search_cache.max_ids = 3
+        try:
+            self.assertEqual(len(self.names(search_business_category='Food & Dining')), 5)
+            self.assertEqual(len(self.names(search_business_category='Food & Dining')), 5)
+            page = self.search(per_page=2, search_business_category='Food & Dining')
+            self.assertTrue(page.has_next)
+            self.assertEqual(len(self.search(page.next_cursor, per_page=2,
+                                             search_business_category='Food & Dining')), 2)
+        finally:
+            search_cache.max_ids = max_ids
+        self.names(open_at='now')
+        self.assertEqual(search_cache.stats()['hits'], 3)  # the remembered "too many" skips the id query
+        self.assertEqual(search_cache.stats()['misses'], 1)
+
+    def test_memory_is_bounded_by_lru_eviction(self):
+        backend = search_cache.backend
+        search_cache.backend = MemoryBackend(max_entries=2)
+        try:
+            for name in ('Pizza', 'Gym', 'Corner'):
+                self.names(search_business_name=name)
+            self.assertEqual(search_cache.stats()['entries'], 2)
+            self.names(search_business_name='Pizza')
+            self.assertEqual(search_cache.stats()['misses'], 4)
+        finally:
+            search_cache.backend = backend
+
+
+if __name__ == '__main__':
+    unittest.main()
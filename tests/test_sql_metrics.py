@@ -0,0 +1,66 @@
+import json
+import unittest
+from app import app, db
+from page_cache import page_cache
+from sql_metrics import sql_metrics, normalize
+from base import AppTestCase
+
+
+class SQLMetricsTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        sql_metrics.reset()
+        app.config['PAGE_CACHE_BACKEND'] = None
+        page_cache.init_app(app)
+
+    def tearDown(self):
+        app.config['PAGE_CACHE_BACKEND'] = 'memory'
+        page_cache.init_app(app)
+        super().tearDown()
+
+    def test_requests_get_server_timing_and_a_log_line(self):
+        business = self.make_business('Gym')
+        self.add_review(business, 4)
+        business_id = business.id
+        db.session.remove()
+
+        with self.count_statements() as statements, self.assertLogs('validvouch.sql', 'INFO') as logs:
+            response = self.client.get(f'/business-details/{business_id}')
+        timings = response.headers.getlist('Server-Timing')
+        self.assertTrue(timings[0].startswith('db;dur='))
+        self.assertIn(f'desc="{len(statements)} queries"', timings[0])
+        self.assertTrue(timings[1].startswith('app;dur='))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['endpoint'], line['status'], line['statements']),
+                         ('business_details', 200, len(statements)))
+        self.assertNotIn('%(', line['slowest_statement'])
+
+    def test_admin_metrics_aggregate_per_endpoint(self):
+        business = self.make_business('Gym')
+        for _ in range(3):
+            self.client.get(f'/business-details/{business.id}')
+
+        self.login(self.reviewer)
+        self.assertEqual(self.client.get('/admin/sql-metrics').status_code, 302)
+
+        admin = self.make_user('admin', is_admin=True)
+        db.session.commit()
+        self.client.get('/logout')
+        self.login(admin)
+        metrics = self.client.get('/admin/sql-metrics').get_json()
+        details = metrics['business_details']
+        self.assertEqual(details['requests'], 3)
+        self.assertEqual(sum(details['statements'].values()), 3)
+        self.assertGreater(details['max_statements'], 0)
+
+    def test_normalize_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize("SELECT * FROM reviews\n WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND content = 'it''s' LIMIT 25"),
+            'SELECT * FROM reviews WHERE id IN (?) AND content = ? LIMIT ?')
+        self.assertEqual(normalize('SELECT x::text FROM t WHERE a = :a'), 'SELECT x::text FROM t WHERE a = ?')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime, timedelta
+from app import app, db, Review, FlaggedReview
+from models import SiteStat, DailyStat
+from base import AppTestCase
+
+
+class DashboardStatsTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_admin=True)
+        self.business = self.make_business('Gym')
+        SiteStat.reconcile()
+        DailyStat.reconcile()
+        db.session.commit()
+
+    def recounted(self):
+        """Counters as the reconcile job would compute them."""
+        counters = SiteStat.totals()
+        SiteStat.reconcile()
+        db.session.commit()
+        return counters, SiteStat.totals()
+
+    def test_write_routes_keep_counters_in_step(self):
+        business_id = self.business.id
+        self.login(self.reviewer)
+        self.client.post(f'/leave-review/{business_id}', data=dict(content='Great place', rating='5', proof_of_purchase='y'))
+        review_id = Review.query.filter_by(business_id=business_id).one().id
+        self.client.get('/logout')
+
+        self.login(self.owner)
+        self.client.post(f'/vote-review/{review_id}/up')
+        self.client.post(f'/flag-review/{review_id}', data=dict(reason='This review looks fake'))
+        flag_id = FlaggedReview.query.one().id
+        self.client.get('/logout')
+
+        self.login(self.admin)
+        self.client.post(f'/admin/review-decision/{flag_id}', data=dict(decision='deny', notes='Looks fine'))
+        self.client.get('/logout')
+
+        self.login(self.owner)
+        self.client.post(f'/appeal-flagged-review/{flag_id}', data=dict(appeal_reason='Please look again'))
+        db.session.expire_all()
+        counters, expected = self.recounted()
+        self.assertEqual(counters, expected)
+        self.assertEqual((counters['reviews'], counters['pending_flags'], counters['pending_appeals']), (1, 0, 1))
+
+        _, series = DailyStat.series(1)
+        self.assertEqual(series, {'reviews': [1], 'votes': [1], 'flags': [1]})
+
+    def test_deletes_discount_counters(self):
+        review = self.add_review(self.business, 4)
+        db.session.add(FlaggedReview(review_id=review.id, user_id=self.owner.id,
+                                     flag_reason='Suspicious review', admin_decision='pending'))
+        SiteStat.reconcile()
+        db.session.commit()
+        owner_id = self.owner.id
+
+        self.login(self.admin)
+        self.client.post(f'/admin/delete-user/{owner_id}')
+        counters, expected = self.recounted()
+        self.assertEqual(counters, expected)
+        self.assertEqual((counters['businesses'], counters['reviews'], counters['pending_flags']), (0, 0, 0))
+
+    def test_reconcile_corrects_drift(self):
+        old = self.add_review(self.business, 3)
+        old.created_at = datetime.utcnow() - timedelta(days=2)
+        self.add_review(self.business, 5, user=self.owner)
+        SiteStat.adjust(reviews=40, users=-1)
+        DailyStat.record('votes', 7)
+        db.session.commit()
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['reconcile-stats', '--days', '7'])
+        self.assertIn('reconciled', result.output)
+
+        db.session.expire_all()
+        self.assertEqual(SiteStat.totals()['reviews'], 2)
+        self.assertEqual(SiteStat.totals()['users'], 3)
+        _, series = DailyStat.series(3)
+        self.assertEqual(series['reviews'], [1, 0, 1])
+        self.assertEqual(series['votes'], [0, 0, 0])
+
+    def test_dashboard_is_constant_time(self):
+        self.login(self.admin)
+        self.client.get('/admin/dashboard')
+        db.session.expire_all()  # both measured requests load the admin the same way
+        with self.count_statements() as statements:
+            response = self.client.get('/admin/dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count(', ' '.join(statements).lower())
+
+        for i in range(5):
+            self.add_review(self.make_business(f'Gym {i}'), 4)
+        db.session.expire_all()
+        with self.count_statements() as more:
+            self.client.get('/admin/dashboard')
+        self.assertEqual(len(statements), len(more))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from app import app, db, Business
+from typeahead import typeahead
+from base import AppTestCase
+
+
+class TypeaheadTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pizza = self.make_business('Pizza Palace', business_city='San Diego', business_category='Food & Dining')
+        self.pier = self.make_business('Pier Pub', business_city='San Jose', business_category='Food & Dining')
+        self.gym = self.make_business('Pilates Studio', business_city='Santa Fe')
+        for rating in (5, 4):
+            self.add_review(self.pier, rating, user=self.make_user(f'fan{rating}'))
+        self.add_review(self.gym, 3)
+
+    def texts(self, query, **kwargs):
+        return [(suggestion['kind'], suggestion['text']) for suggestion in typeahead.suggest(query, **kwargs)]
+
+    def test_prefix_matches_rank_by_review_count(self):
+        self.assertEqual(self.texts('pi'), [('business', 'Pier Pub'), ('business', 'Pilates Studio'),
+                                            ('business', 'Pizza Palace')])
+        self.assertEqual(self.texts('  SAN '), [('city', 'San Jose'), ('city', 'Santa Fe'), ('city', 'San Diego')])
+        self.assertEqual(self.texts('san j'), [('city', 'San Jose')])
+        self.assertEqual(self.texts('food'), [('category', 'Food & Dining')])
+        self.assertEqual(self.texts('pi', limit=1), [('business', 'Pier Pub')])
+        self.assertEqual(self.texts(''), [])
+
+        with self.count_statements() as statements:
+            self.texts('pi')
+            self.texts('pizza')
+        self.assertEqual(statements, [])
+
+    def test_remembered_prefixes_are_bounded(self):
+        max_prefixes = typeahead.max_prefixes
+        typeahead.max_prefixes = 2
+        try:
+            for query in ('pie', 'pil', 'piz', 'zzzz', 'pizza place x'):
+                self.texts(query)
+            self.assertEqual(list(typeahead._top), ['pil', 'piz'])
+            self.texts('pil')
+            self.texts('san j')
+            self.assertEqual(list(typeahead._top), ['pil', 'san j'])
+            self.assertEqual(self.texts('pie'), [('business', 'Pier Pub')])
+        finally:
+            typeahead.max_prefixes = max_prefixes
+
+    def test_endpoint_returns_json(self):
+        data = self.client.get('/typeahead?q=Pie&limit=5').get_json()
+        self.assertEqual(data['query'], 'Pie')
+        self.assertEqual(data['suggestions'], [{'text': 'Pier Pub', 'kind': 'business', 'review_count': 2,
+                                                'id': self.pier.id}])
+
+    def test_writes_update_the_index_in_place(self):
+        self.assertEqual(self.texts('pizza'), [('business', 'Pizza Palace')])
+
+        calzone = self.make_business('Calzone Corner', business_city='Santa Fe')
+        typeahead.update_business(calzone)
+        self.pizza.business_name = 'Pizzeria Uno'
+        self.pizza.business_city = 'Oakland'
+        db.session.commit()
+        typeahead.update_business(self.pizza)
+        with self.count_statements() as statements:
+            self.assertEqual(self.texts('cal'), [('business', 'Calzone Corner')])
+            self.assertEqual(self.texts('pizz'), [('business', 'Pizzeria Uno')])
+            self.assertEqual(self.texts('san d'), [])
+            self.assertEqual(self.texts('oak'), [('city', 'Oakland')])
+        self.assertEqual(statements, [])
+
+        gym_id = self.gym.id
+        self.login(self.owner)
+        self.client.post(f'/confirm_delete_business/{gym_id}', data=dict(password='password'))
+        self.assertEqual(Business.query.filter_by(id=gym_id).count(), 0)
+        self.assertEqual(self.texts('pil'), [])
+        self.assertEqual(self.texts('santa'), [('city', 'Santa Fe')])
+
+    def test_reloads_after_the_refresh_interval(self):
+        self.texts('pi')
+        db.session.execute(Business.__table__.update().where(Business.id == self.gym.id)
+                           .values(business_name='Yoga Loft'))
+        db.session.commit()
+        self.assertEqual(self.texts('yoga'), [])
+
+        refresh_seconds = typeahead.refresh_seconds
+        typeahead.refresh_seconds = 0
+        try:
+            self.assertEqual(self.texts('yoga'), [('business', 'Yoga Loft')])
+        finally:
+            typeahead.refresh_seconds = refresh_seconds
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+import unittest
+from app import app, create_app, db, User
+from page_cache import FileSystemBackend
+from user_cache import UserCache, user_cache
+from base import AppTestCase
+
+
+class UserCacheTests(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        backend, user_cache.backend = user_cache.backend, FileSystemBackend(self.cache_dir)
+        self.addCleanup(setattr, user_cache, 'backend', backend)
+
+    def requests_statements(self, url):
+        db.session.remove()
+        with self.count_statements() as statements:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [statement for statement in statements if 'FROM users' in statement]
+
+    def test_shared_tier_skips_user_query(self):
+        business = self.make_business('Gym')
+        self.login(self.reviewer)
+        url = f'/business-details/{business.id}'
+
+        self.requests_statements(url)
+        self.assertEqual(self.requests_statements(url), [])
+        stats = user_cache.stats()
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertIsNotNone(stats['hit_ratio'])
+
+    def test_cached_user_loads_other_columns_and_saves_edits(self):
+        self.login(self.reviewer)
+        self.client.get('/profile')
+        response = self.client.post('/edit-profile', data=dict(
+            first_name='Renamed', last_name='User', dob='1990-01-01', address='1 Main St', city='Testville',
+            state='CA', zip='90001', phone_number=self.reviewer.phone_number, email=self.reviewer.email))
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.get('/profile')
+        self.assertIn(b'Renamed', response.data)
+        self.assertEqual(User.query.get(self.reviewer.id).first_name, 'Renamed')
+
+    def test_invalidation_reaches_other_workers(self):
+        self.assertFalse(user_cache.load(self.reviewer.id).is_admin)
+        User.query.filter_by(id=self.reviewer.id).update({User.is_admin: True})
+        db.session.commit()
+
+        # Another worker handles the write, with its own UserCache over the same shared backend
+        other = UserCache()
+        other.backend = FileSystemBackend(self.cache_dir)
+        other.invalidate(self.reviewer.id)
+        db.session.expire_all()
+        self.assertTrue(user_cache.load(self.reviewer.id).is_admin)
+        self.assertEqual(user_cache.stats()['misses'], 2)
+
+    def test_per_process_backend_is_refused(self):
+        with self.assertRaisesRegex(ValueError, 'USER_CACHE_BACKEND'):
+            create_app(dict(USER_CACHE_BACKEND='memory'))
+
+    def test_deleted_user_is_forgotten(self):
+        self.login(self.reviewer)
+        self.client.get('/profile')
+        self.client.post('/delete-user', data={'password': 'password'})
+
+        response = self.client.get('/profile')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/login', response.headers['Location'])
+
+
+if __name__ == "__main__":
+    unittest.main()
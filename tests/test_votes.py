@@ -0,0 +1,97 @@
+import unittest
+from app import app, db, Review, Interaction
+from models import delete_user_account, wilson_lower_bound
+from business_helpers import get_vote_tallies
+from base import AppTestCase
+
+
+class VoteTallyTests(AppTestCase):
+
+    def test_tallies_come_from_one_query(self):
+        business = self.make_business('Gym')
+        first = self.add_review(business, 5)
+        second = self.add_review(business, 3, user=self.make_user('second'))
+        voters = [self.make_user(f'voter{i}') for i in range(3)]
+        for voter, vote_type in zip(voters, ['up', 'up', 'down']):
+            db.session.add(Interaction(user_id=voter.id, review_id=first.id, interaction_type=vote_type))
+        db.session.commit()
+        review_ids = [first.id, second.id]
+
+        with self.count_statements() as statements:
+            tallies = get_vote_tallies(review_ids)
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(tallies[first.id], {'up': 2, 'down': 1})
+        self.assertEqual(tallies[second.id], {'up': 0, 'down': 0})
+
+    def test_vote_review_keeps_counters_in_step(self):
+        business = self.make_business('Gym')
+        review = self.add_review(business, 4)
+        voter = self.make_user('voter')
+        db.session.commit()
+        self.login(voter)
+
+        self.client.post(f'/vote-review/{review.id}/up')
+        self.client.post(f'/vote-review/{review.id}/down')
+        db.session.refresh(review)
+        self.assertEqual((review.up_count, review.down_count), (0, 1))
+
+        self.client.post(f'/vote-review/{review.id}/down')
+        db.session.refresh(review)
+        self.assertEqual((review.up_count, review.down_count), (0, 0))
+
+        db.session.add(Interaction(user_id=voter.id, review_id=review.id, interaction_type='up'))
+        Review.refresh_vote_counts()
+        db.session.commit()
+        db.session.refresh(review)
+        self.assertEqual((review.up_count, review.down_count), (1, 0))
+
+    def test_helpfulness_follows_votes(self):
+        business = self.make_business('Gym')
+        review = self.add_review(business, 4)
+        voters = [self.make_user(f'voter{i}') for i in range(3)]
+        db.session.commit()
+        for voter, vote_type in zip(voters, ['up', 'up', 'down']):
+            self.client.get('/logout')
+            self.login(voter)
+            self.client.post(f'/vote-review/{review.id}/{vote_type}')
+        db.session.refresh(review)
+        self.assertAlmostEqual(review.helpfulness, wilson_lower_bound(2, 1))
+
+        Review.query.update({Review.helpfulness: 0})
+        Review.refresh_vote_counts()
+        db.session.commit()
+        db.session.refresh(review)
+        self.assertAlmostEqual(review.helpfulness, wilson_lower_bound(2, 1))
+
+        # Deleting a voter takes their vote out of the score too
+        delete_user_account(voters[2].id)
+        db.session.commit()
+        db.session.refresh(review)
+        self.assertAlmostEqual(review.helpfulness, wilson_lower_bound(2, 0))
+
+    def test_wilson_lower_bound_favours_more_evidence(self):
+        self.assertEqual(wilson_lower_bound(0, 0), 0)
+        self.assertGreater(wilson_lower_bound(10, 1), wilson_lower_bound(1, 0))
+        self.assertGreater(wilson_lower_bound(1, 0), wilson_lower_bound(0, 1))
+
+    def test_most_helpful_ordering_skips_hidden_reviews(self):
+        business = self.make_business('Gym')
+        reviewers = [self.make_user(f'reviewer{i}') for i in range(3)]
+        reviews = [self.add_review(business, 3, user=reviewer) for reviewer in reviewers]
+        for review, up, down in zip(reviews, (1, 8, 3), (0, 1, 0)):
+            Review.adjust_vote_counts(review.id, up, down)
+        reviews[0].content, reviews[1].content, reviews[2].content = 'One up', 'Eight up', 'Three up'
+        hidden = self.add_review(business, 1)
+        hidden.content = 'Hidden review'
+        hidden.set_visibility(False)
+        db.session.commit()
+
+        body = self.client.get(f'/business-details/{business.id}/reviews?filter_by=helpful').data.decode()
+        self.assertNotIn('Hidden review', body)
+        self.assertLess(body.index('Eight up'), body.index('Three up'))
+        self.assertLess(body.index('Three up'), body.index('One up'))
+
+
+if __name__ == "__main__":
+    unittest.main()
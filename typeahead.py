@@ -0,0 +1,194 @@
+"""In-memory prefix index behind the search form's autocomplete.
+
+Business names, cities and categories are kept in one sorted list of
+lowercased keys, so the keys that start with a prefix are a contiguous slice
+found with two bisections. Suggestions are ranked by review count: a
+business by its own, a city or category by the total of its businesses.
+The top results of every one- and two-letter prefix are ranked when the
+index is loaded, and those of longer prefixes the first time they are asked
+for. Only the ``TYPEAHEAD_MAX_PREFIXES`` most recently used longer prefixes
+are remembered, and prefixes matching nothing never are, so whatever
+visitors type cannot grow the index. Writes merge into the remembered
+rankings, so a lookup is a dict hit.
+
+The index is loaded with one query on first use. The write routes apply
+their changes to it directly. Changes made by other processes, and review
+counts drifting, are picked up by a full reload every
+``TYPEAHEAD_REFRESH_SECONDS``.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from models import db, Business
+
+# Prefixes up to this long are ranked when the index loads; they match the most entries
+WARM_PREFIX_LENGTH = 2
+
+
+class TypeaheadIndex:
+    """Flask extension holding the prefix index of one process."""
+
+    def __init__(self, app=None):
+        self.refresh_seconds = 300
+        self.max_limit = 10
+        self.max_prefixes = 4096
+        self._lock = threading.Lock()
+        self._reset()
+        self._loaded_at = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TYPEAHEAD_REFRESH_SECONDS', 300)
+        app.config.setdefault('TYPEAHEAD_MAX_LIMIT', 10)
+        app.config.setdefault('TYPEAHEAD_MAX_PREFIXES', 4096)
+        self.refresh_seconds = app.config['TYPEAHEAD_REFRESH_SECONDS']
+        self.max_limit = app.config['TYPEAHEAD_MAX_LIMIT']
+        self.max_prefixes = app.config['TYPEAHEAD_MAX_PREFIXES']
+        app.extensions['typeahead'] = self
+
+    def _reset(self):
+        self._keys = []        # sorted (lowercased text, kind, ident)
+        self._entries = {}     # (kind, ident) -> [text, score, business count]
+        self._businesses = {}  # business id -> (name, city, category, review count)
+        self._warm = {}        # short prefix -> its best keys, best first
+        self._top = OrderedDict()  # the same for longer prefixes, least recently used first
+
+    def load(self):
+        """Rebuild the whole index from the businesses table."""
+        rows = db.session.query(Business.id, Business.business_name, Business.business_city,
+                                Business.business_category, Business.review_count).all()
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(*row, keep_sorted=False)
+            self._keys.sort()
+            for prefix in {key[0][:end] for key in self._keys for end in range(1, WARM_PREFIX_LENGTH + 1)}:
+                self._rank(prefix)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Reload the index on its next use, e.g. after a bulk delete."""
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.load()
+
+    def _add_entry(self, kind, ident, text, score, keep_sorted):
+        entry = self._entries.get((kind, ident))
+        key = (text.lower(), kind, ident)
+        if entry is None:
+            self._entries[(kind, ident)] = [text, score, 1]
+            if keep_sorted:
+                insort(self._keys, key)
+            else:
+                self._keys.append(key)
+        else:
+            entry[1] += score
+            entry[2] += 1
+        if keep_sorted:  # a load ranks the prefixes once it has every entry
+            self._promote(key)
+
+    def _remove_entry(self, kind, ident, text, score):
+        entry = self._entries[(kind, ident)]
+        entry[1] -= score
+        entry[2] -= 1
+        key = (text.lower(), kind, ident)
+        if not entry[2]:
+            del self._entries[(kind, ident)]
+            del self._keys[bisect_left(self._keys, key)]
+        self._demote(key)
+
+    def _rank_key(self, key):
+        return -self._entries[key[1], key[2]][1], key
+
+    def _rankings(self, prefix):
+        return self._warm if len(prefix) <= WARM_PREFIX_LENGTH else self._top
+
+    def _rank(self, prefix):
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (prefix + '\uffff',))
+        ranked = heapq.nsmallest(self.max_limit, self._keys[start:end], key=self._rank_key)
+        if ranked:
+            rankings = self._rankings(prefix)
+            rankings[prefix] = ranked
+            if rankings is self._top and len(self._top) > self.max_prefixes:
+                self._top.popitem(last=False)
+        return ranked
+
+    def _promote(self, key):
+        """Merge an entry that is new or scores higher into the rankings of its prefixes."""
+        for end in range(1, len(key[0]) + 1):
+            prefix = key[0][:end]
+            rankings = self._rankings(prefix)
+            ranked = rankings.get(prefix)
+            if ranked is not None:
+                rankings[prefix] = sorted(set(ranked) | {key}, key=self._rank_key)[:self.max_limit]
+
+    def _demote(self, key):
+        """Forget the rankings an entry that scores lower or is gone was part of."""
+        for end in range(1, len(key[0]) + 1):
+            prefix = key[0][:end]
+            rankings = self._rankings(prefix)
+            if key in rankings.get(prefix, ()):
+                del rankings[prefix]
+
+    def _add(self, business_id, name, city, category, review_count, keep_sorted=True):
+        self._businesses[business_id] = (name, city, category, review_count)
+        self._add_entry('business', business_id, name, review_count, keep_sorted)
+        self._add_entry('city', city.lower(), city, review_count, keep_sorted)
+        self._add_entry('category', category, category, review_count, keep_sorted)
+
+    def _remove(self, business_id):
+        name, city, category, review_count = self._businesses.pop(business_id)
+        self._remove_entry('business', business_id, name, review_count)
+        self._remove_entry('city', city.lower(), city, review_count)
+        self._remove_entry('category', category, category, review_count)
+
+    def update_business(self, business):
+        """Add a registered business, or apply an edit to one already indexed."""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            if business.id in self._businesses:
+                self._remove(business.id)
+            self._add(business.id, business.business_name, business.business_city,
+                      business.business_category, business.review_count or 0)
+
+    def remove_businesses(self, business_ids):
+        """Drop deleted businesses from the index."""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            for business_id in business_ids:
+                if business_id in self._businesses:
+                    self._remove(business_id)
+
+    def suggest(self, query, limit=None):
+        """The best entries whose text starts with the query, as dicts for JSON."""
+        prefix = ' '.join(query.split()).lower()
+        limit = min(limit or self.max_limit, self.max_limit)
+        if not prefix or limit < 1:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            rankings = self._rankings(prefix)
+            ranked = rankings.get(prefix)
+            if ranked is None:
+                ranked = self._rank(prefix)
+            elif rankings is self._top:
+                self._top.move_to_end(prefix)
+            return [self._suggestion(kind, ident) for _, kind, ident in ranked[:limit]]
+
+    def _suggestion(self, kind, ident):
+        text, score, _ = self._entries[kind, ident]
+        suggestion = {'text': text, 'kind': kind, 'review_count': score}
+        if kind == 'business':
+            suggestion['id'] = ident
+        return suggestion
+
+
+typeahead = TypeaheadIndex()
@@ -0,0 +1,102 @@
+"""Identity cache behind the Flask-Login user loader.
+
+Every authenticated request used to load its user with a primary-key query.
+Loaded users are now kept for the rest of the request. An optional shared
+tier keeps a slim projection of the columns templates read for a short TTL.
+A hit on the shared tier rebuilds a detached User from the projection and
+merges it into the session without a query. Any other column or
+relationship a route touches is loaded lazily, as for a normal row.
+
+The shared tier must be shared by every process: ``invalidate`` deletes the
+projection only from the backend, so a per-process ``memory`` backend would
+let other gunicorn workers keep authenticating a deleted user, or an admin
+whose rights were revoked, until ``USER_CACHE_TIMEOUT``. It is therefore
+off by default and only accepts ``filesystem`` (one host) or ``redis``
+(several).
+"""
+from flask import g
+from sqlalchemy.orm import make_transient_to_detached
+from models import db, User
+from page_cache import create_backend
+
+USER_PROJECTION = ('id', 'first_name', 'last_name', 'email', 'is_admin', 'open_cases')
+
+
+class UserCache:
+    """Flask extension with a per-request tier, an optional shared tier and hit counters."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = 300
+        self.request_hits = 0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_BACKEND', None)
+        app.config.setdefault('USER_CACHE_TIMEOUT', 300)
+        if app.config['USER_CACHE_BACKEND'] == 'memory':
+            raise ValueError("USER_CACHE_BACKEND must be shared by every worker: use 'filesystem' or 'redis'")
+        self.backend = create_backend(app.config['USER_CACHE_BACKEND'], app, 'user')
+        self.timeout = app.config['USER_CACHE_TIMEOUT']
+        app.teardown_request(self._end_request)
+        app.extensions['user_cache'] = self
+
+    @staticmethod
+    def _end_request(exception=None):
+        g.pop('_loaded_users', None)
+
+    @staticmethod
+    def _key(user_id):
+        return f'user:{user_id}'
+
+    def _attach(self, projection):
+        user = User(**projection)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def load(self, user_id):
+        """Return the User for an id, or None if it no longer exists."""
+        loaded = g.setdefault('_loaded_users', {})
+        if user_id in loaded:
+            self.request_hits += 1
+            return loaded[user_id]
+
+        projection = self.backend.get(self._key(user_id)) if self.backend else None
+        if projection is not None:
+            self.hits += 1
+            user = self._attach(projection)
+        else:
+            self.misses += 1
+            user = User.query.get(user_id)
+            if user is not None and self.backend is not None:
+                self.backend.set(self._key(user_id),
+                                 {column: getattr(user, column) for column in USER_PROJECTION}, self.timeout)
+        loaded[user_id] = user
+        return user
+
+    def invalidate(self, user_id):
+        """Forget a user after their row changes or is deleted."""
+        g.pop('_loaded_users', None)
+        if self.backend is not None:
+            self.backend.delete(self._key(user_id))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+        self.request_hits = self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'request_hits': self.request_hits,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+user_cache = UserCache()